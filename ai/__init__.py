@@ -1,48 +1,47 @@
-from .openrouter_client import OpenRouterClient
-from .analysis_engine import AnalysisEngine
-from .raw_data_analyzer import RawDataAnalyzer
+import importlib
 
-# 按需导入可选组件；若依赖缺失，提供占位符以避免导入失败
+# 按需导入：子模块在首次访问对应名称时才加载（PEP 562）
+# realtime_analysis_engine 依赖 websockets/aiohttp，multi_timeframe_analyzer 会拉起 ccxt，
+# 仅使用单个类的 CLI 不应为其余组件付出导入开销
 
-__all__ = ['OpenRouterClient', 'AnalysisEngine', 'RawDataAnalyzer']
+__all__ = (
+    'OpenRouterClient', 'AnalysisEngine', 'RawDataAnalyzer',
+    'AnalysisContext', 'MultiTimeframeContext', 'SignalStrength', 'ContextPriority',
+    'MultiTimeframeAnalyzer', 'AnalysisScenario', 'MultiTimeframeResult',
+    'RealtimeAnalysisEngine', 'RealtimeConfig', 'AnalysisFrequency', 'MarketCondition',
+)
 
-# analysis_context（通常不引入额外第三方依赖）
-try:
-    from .analysis_context import AnalysisContext, MultiTimeframeContext, SignalStrength, ContextPriority
-    __all__ += ['AnalysisContext', 'MultiTimeframeContext', 'SignalStrength', 'ContextPriority']
-except Exception as _e_ctx:  # 安全降级
-    pass
+_LAZY_EXPORTS = {
+    'OpenRouterClient': '.openrouter_client',
+    'AnalysisEngine': '.analysis_engine',
+    'RawDataAnalyzer': '.raw_data_analyzer',
+    'AnalysisContext': '.analysis_context',
+    'MultiTimeframeContext': '.analysis_context',
+    'SignalStrength': '.analysis_context',
+    'ContextPriority': '.analysis_context',
+    'MultiTimeframeAnalyzer': '.multi_timeframe_analyzer',
+    'AnalysisScenario': '.multi_timeframe_analyzer',
+    'MultiTimeframeResult': '.multi_timeframe_analyzer',
+    'RealtimeAnalysisEngine': '.realtime_analysis_engine',
+    'RealtimeConfig': '.realtime_analysis_engine',
+    'AnalysisFrequency': '.realtime_analysis_engine',
+    'MarketCondition': '.realtime_analysis_engine',
+}
 
-# multi_timeframe_analyzer（可能引入更多内部依赖）
-try:
-    from .multi_timeframe_analyzer import MultiTimeframeAnalyzer, AnalysisScenario, MultiTimeframeResult
-except Exception as _e_mtf:
-    class _UnavailableMTF:
-        def __init__(self, *args, **kwargs):
-            raise ImportError(f"MultiTimeframeAnalyzer unavailable: {_e_mtf}")
-    class MultiTimeframeAnalyzer(_UnavailableMTF):
-        pass
-    class AnalysisScenario:  # 占位枚举
-        pass
-    class MultiTimeframeResult(dict):
-        pass
-finally:
-    __all__ += ['MultiTimeframeAnalyzer', 'AnalysisScenario', 'MultiTimeframeResult']
 
-# realtime_analysis_engine（依赖 websockets/aiohttp 等，可缺失）
-try:
-    from .realtime_analysis_engine import RealtimeAnalysisEngine, RealtimeConfig, AnalysisFrequency, MarketCondition
-except Exception as _e_rt:
-    class _UnavailableRT:
-        def __init__(self, *args, **kwargs):
-            raise ImportError(f"RealtimeAnalysisEngine unavailable: {_e_rt}")
-    class RealtimeAnalysisEngine(_UnavailableRT):
-        pass
-    class RealtimeConfig(dict):
-        pass
-    class AnalysisFrequency:  # 占位枚举
-        pass
-    class MarketCondition:  # 占位枚举
-        pass
-finally:
-    __all__ += ['RealtimeAnalysisEngine', 'RealtimeConfig', 'AnalysisFrequency', 'MarketCondition']
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        module = importlib.import_module(module_name, __name__)
+    except ImportError as e:
+        # 可选依赖缺失时不提供占位类，推迟到首次访问再报错
+        raise AttributeError(f"{name} unavailable: {e}") from e
+    value = getattr(module, name)
+    globals()[name] = value  # 缓存，后续访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return list(__all__)
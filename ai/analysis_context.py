@@ -4,18 +4,58 @@
 提供高级的分析结果整合、历史记录管理和决策支持功能
 """
 
+import heapq
+from bisect import bisect_right
 import json
 import sqlite3
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Deque, Dict, List, Any, Optional, Tuple
 import logging
-from datetime import datetime, timedelta
+import queue
+import re
+from collections import deque
+import time
+import weakref
+from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
-from threading import Lock
+from functools import lru_cache
+from operator import itemgetter
+from threading import Lock, Timer
+from types import MappingProxyType
+
+import numpy as np
+
+try:  # orjson 为可选加速依赖（ccxt 会间接安装），缺失时回退标准库 json
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+def _json_default(obj: Any) -> Any:
+    """标准库 json 的回退序列化，与 orjson 原生支持的类型输出一致"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _json_dumps(obj: Any) -> str:
+    """
+    序列化为紧凑的 UTF-8 JSON 文本（不转义中文）
+    
+    orjson 与标准库两条路径输出一致：numpy 数值/数组、datetime、Enum 值均可序列化，
+    int/float/bool/None 字典键转为字符串
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+
 class ContextPriority(Enum):
     """上下文优先级"""
     CRITICAL = "critical"    # 关键信息
@@ -32,27 +72,69 @@ class SignalStrength(Enum):
     NEUTRAL = "neutral"
     CONFLICTING = "conflicting"
 
+# 模块级只读查找表：避免每次调用重建字典
+_SIGNAL_TO_VALUE = MappingProxyType({
+    SignalStrength.VERY_STRONG: 5.0,
+    SignalStrength.STRONG: 4.0,
+    SignalStrength.MODERATE: 3.0,
+    SignalStrength.WEAK: 2.0,
+    SignalStrength.NEUTRAL: 1.0,
+    SignalStrength.CONFLICTING: 0.5
+})
+
+# 数值 -> 信号强度的分段阈值（value >= 阈值 即进入下一档）
+_VALUE_THRESHOLDS = (1.5, 2.5, 3.5, 4.5)
+_VALUE_SIGNALS = (
+    SignalStrength.NEUTRAL,
+    SignalStrength.WEAK,
+    SignalStrength.MODERATE,
+    SignalStrength.STRONG,
+    SignalStrength.VERY_STRONG,
+)
+
+_SIGNAL_ORDER = tuple(SignalStrength)
+_SIGNAL_INDEX = MappingProxyType({signal: i for i, signal in enumerate(_SIGNAL_ORDER)})
+
+_TIMEFRAME_WEIGHTS = MappingProxyType({
+    '1m': 0.1, '5m': 0.3, '15m': 0.5, '30m': 0.7,
+    '1h': 1.0, '4h': 1.2, '1d': 1.5, '1w': 2.0
+})
+
 @dataclass
 class ContextEvent:
     """上下文事件"""
+    # 手写 __slots__（无默认值字段，兼容 Python 3.8，无需 dataclass(slots=True)）
+    # _iso 为非字段槽位：构造时缓存 ISO 时间串，序列化时不再重复格式化
+    __slots__ = ('timestamp', 'event_type', 'description', 'priority', 'metadata', '_iso')
+    
     timestamp: datetime
     event_type: str
     description: str
     priority: ContextPriority
     metadata: Dict[str, Any]
     
+    def __post_init__(self):
+        self._iso = self.timestamp.isoformat()
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': self._iso,
             'event_type': self.event_type,
             'description': self.description,
             'priority': self.priority.value,
             'metadata': self.metadata
         }
+    
+    def to_tuple(self) -> Tuple[str, str, str, str, Dict[str, Any]]:
+        """紧凑表示，字段顺序与 to_dict 一致"""
+        return (self._iso, self.event_type, self.description, self.priority.value, self.metadata)
 
 @dataclass
 class TimeframeAnalysisContext:
     """单时间框架分析上下文 - Al Brooks专用"""
+    __slots__ = ('timeframe', 'quality_score', 'signal_strength', 'key_insights',
+                 'risk_factors', 'volume_analysis', 'timestamp')
+    
     timeframe: str
     quality_score: float
     signal_strength: SignalStrength
@@ -63,15 +145,15 @@ class TimeframeAnalysisContext:
     
     def get_weight(self) -> float:
         """获取时间框架权重"""
-        timeframe_weights = {
-            '1m': 0.1, '5m': 0.3, '15m': 0.5, '30m': 0.7,
-            '1h': 1.0, '4h': 1.2, '1d': 1.5, '1w': 2.0
-        }
-        return timeframe_weights.get(self.timeframe, 1.0)
+        return _TIMEFRAME_WEIGHTS.get(self.timeframe, 1.0)
 
 @dataclass
 class MultiTimeframeContext:
     """多时间框架分析上下文"""
+    __slots__ = ('symbol', 'analysis_timestamp', 'primary_timeframe', 'timeframe_contexts',
+                 'overall_signal', 'consistency_score', 'confidence_level',
+                 'major_confluence_zones', 'risk_warnings', 'trading_recommendations')
+    
     symbol: str
     analysis_timestamp: datetime
     primary_timeframe: str
@@ -88,145 +170,313 @@ class MultiTimeframeContext:
         if not self.timeframe_contexts:
             return SignalStrength.NEUTRAL, 0.0
             
-        weighted_signals = {}
-        total_weight = 0
-        
-        for tf, context in self.timeframe_contexts.items():
-            weight = context.get_weight()
-            signal = context.signal_strength
-            
-            if signal not in weighted_signals:
-                weighted_signals[signal] = 0
-            weighted_signals[signal] += weight
-            total_weight += weight
+        # 按信号枚举序号累加权重，再取权重最高的信号
+        weighted_signals = np.zeros(len(_SIGNAL_ORDER))
+        for context in self.timeframe_contexts.values():
+            weighted_signals[_SIGNAL_INDEX[context.signal_strength]] += context.get_weight()
         
+        total_weight = weighted_signals.sum()
         if total_weight == 0:
             return SignalStrength.NEUTRAL, 0.0
             
-        # 计算权重最高的信号
-        dominant_signal = max(weighted_signals.items(), key=lambda x: x[1])
-        confidence = dominant_signal[1] / total_weight
+        dominant_index = int(weighted_signals.argmax())
+        confidence = float(weighted_signals[dominant_index] / total_weight)
         
-        return dominant_signal[0], confidence
+        return _SIGNAL_ORDER[dominant_index], confidence
+
+# 预定义 SQL 语句：固定字符串可命中 sqlite3 的语句缓存，避免重复解析
+# v2: timestamp 列改为 INTEGER（epoch 微秒），整数比较替代 ISO 字符串比较
+# v3: 以覆盖索引 idx_history_cover 取代 idx_symbol_timestamp，摘要查询只走索引
+_SCHEMA_VERSION = 3
+
+_SQL_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS analysis_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        timeframes TEXT NOT NULL,
+        overall_signal TEXT,
+        consistency_score REAL,
+        confidence_level REAL,
+        analysis_data TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS context_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        event_type TEXT NOT NULL,
+        description TEXT,
+        priority TEXT,
+        metadata TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_history_cover ON analysis_history"
+    "(symbol, timestamp DESC, overall_signal, consistency_score, confidence_level)",
+    "CREATE INDEX IF NOT EXISTS idx_events_symbol ON context_events(symbol, timestamp DESC)",
+)
+
+_MIGRATED_TABLES = {
+    'analysis_history': "id, symbol, iso_to_us(timestamp), timeframes, overall_signal, "
+                        "consistency_score, confidence_level, analysis_data, created_at",
+    'context_events': "id, symbol, iso_to_us(timestamp), event_type, description, "
+                      "priority, metadata, created_at",
+}
+
+_SQL_INSERT_HISTORY = """
+    INSERT INTO analysis_history 
+    (symbol, timestamp, timeframes, overall_signal, consistency_score, confidence_level, analysis_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_EVENT = """
+    INSERT INTO context_events 
+    (symbol, timestamp, event_type, description, priority, metadata)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_SELECT_RECENT = """
+    SELECT timestamp, overall_signal, consistency_score, confidence_level FROM analysis_history 
+    WHERE symbol = ? AND timestamp >= ?
+    ORDER BY timestamp DESC
+    LIMIT 50
+"""
+
+_SQL_SELECT_RECENT_FULL = """
+    SELECT * FROM analysis_history 
+    WHERE symbol = ? AND timestamp >= ?
+    ORDER BY timestamp DESC
+    LIMIT 50
+"""
+
+def _to_epoch_us(dt: datetime) -> int:
+    """datetime -> epoch 微秒"""
+    return round(dt.timestamp() * 1_000_000)
+
+def _epoch_us_to_iso(epoch_us: int) -> str:
+    """epoch 微秒 -> 本地时间 ISO 字符串（与旧版 TEXT 列格式一致）"""
+    return datetime.fromtimestamp(epoch_us / 1_000_000).isoformat()
+
+def _iso_to_epoch_us(value: Any) -> Any:
+    """迁移旧库时将 ISO 字符串转为 epoch 微秒；无法解析的值原样保留"""
+    try:
+        return _to_epoch_us(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return value
+
+def _write_event_rows(conn: sqlite3.Connection, rows: List[tuple]):
+    """executemany 写入事件行（调用方需持有该连接的锁）"""
+    if not rows:
+        return
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(_SQL_INSERT_EVENT, rows)
+        conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        logger.error(f"❌ 批量保存上下文事件失败: {e}")
+
+def _close_history_db(conn: sqlite3.Connection, lock: Lock, pending: Deque[tuple],
+                      read_pool: "queue.Queue[sqlite3.Connection]"):
+    """写入缓冲中的剩余事件并关闭全部连接（由 weakref.finalize 保证只执行一次）"""
+    with lock:
+        rows = list(pending)
+        pending.clear()
+        _write_event_rows(conn, rows)
+        conn.close()
+    while not read_pool.empty():
+        read_pool.get_nowait().close()
 
 class AnalysisHistoryManager:
     """分析历史管理器"""
     
-    def __init__(self, db_path: str = "logs/analysis_history.db"):
+    def __init__(self, db_path: str = "logs/analysis_history.db", event_batch_size: int = 64,
+                 read_pool_size: int = 4, flush_interval: float = 1.0):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._lock = Lock()
+        self.event_batch_size = event_batch_size
+        self.flush_interval = flush_interval
+        self._pending_events: Deque[tuple] = deque()
+        self._flush_timer: Optional[Timer] = None
+        # 长连接：避免每次读写重新打开 db/-wal/-shm 文件；所有访问由 self._lock 串行化
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA cache_size=-20000")
         self._init_database()
+        
+        # 只读连接池：WAL 模式下读者与写者互不阻塞，查询无需等待写锁
+        self._read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=read_pool_size)
+        read_uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        for _ in range(read_pool_size):
+            reader = sqlite3.connect(read_uri, uri=True, check_same_thread=False)
+            reader.row_factory = sqlite3.Row
+            self._read_pool.put(reader)
+        
+        # 未显式 close() 时，在对象回收或解释器退出（atexit）时写入缓冲事件并关闭连接
+        self._finalizer = weakref.finalize(
+            self, _close_history_db, self._conn, self._lock, self._pending_events, self._read_pool
+        )
     
     def _init_database(self):
-        """初始化数据库"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS analysis_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    timeframes TEXT NOT NULL,
-                    overall_signal TEXT,
-                    consistency_score REAL,
-                    confidence_level REAL,
-                    analysis_data TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        """初始化数据库（已是当前 schema 版本时直接跳过）"""
+        with self._lock:
+            conn = self._conn
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= _SCHEMA_VERSION:
+                return
+            
+            # 仅 v2 之前的旧库（TEXT 时间戳）需要整表迁移
+            legacy_tables = [
+                row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                if row[0] in _MIGRATED_TABLES
+            ] if version < 2 else []
             
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS context_events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    event_type TEXT NOT NULL,
-                    description TEXT,
-                    priority TEXT,
-                    metadata TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 旧库（TEXT 时间戳）先改名，建新表后转换迁移
+                conn.execute("DROP INDEX IF EXISTS idx_symbol_timestamp")
+                conn.execute("DROP INDEX IF EXISTS idx_events_symbol")
+                for table in legacy_tables:
+                    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                for statement in _SQL_SCHEMA:
+                    conn.execute(statement)
+                if legacy_tables:
+                    conn.create_function("iso_to_us", 1, _iso_to_epoch_us)
+                    for table in legacy_tables:
+                        conn.execute(f"INSERT INTO {table} SELECT {_MIGRATED_TABLES[table]} FROM {table}_legacy")
+                        conn.execute(f"DROP TABLE {table}_legacy")
+                    logger.info(f"🔄 分析历史数据库已迁移到 schema v{_SCHEMA_VERSION}: {legacy_tables}")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
             
-            # 创建索引
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_symbol_timestamp ON analysis_history(symbol, timestamp)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_events_symbol ON context_events(symbol, timestamp)")
+            # 更新统计信息，让查询规划器选用覆盖索引
+            conn.execute("ANALYZE analysis_history")
     
     def save_analysis_context(self, context: MultiTimeframeContext):
         """保存分析上下文"""
-        with self._lock:
-            try:
-                with sqlite3.connect(self.db_path) as conn:
-                    timeframes = list(context.timeframe_contexts.keys())
-                    analysis_data = json.dumps({
-                        'timeframe_contexts': {
-                            tf: {
-                                'timeframe': ctx.timeframe,
-                                'quality_score': ctx.quality_score,
-                                'signal_strength': ctx.signal_strength.value,
-                                'key_insights': ctx.key_insights,
-                                'risk_factors': ctx.risk_factors,
-                                'volume_analysis': ctx.volume_analysis
-                            }
-                            for tf, ctx in context.timeframe_contexts.items()
-                        },
-                        'major_confluence_zones': context.major_confluence_zones,
-                        'risk_warnings': context.risk_warnings,
-                        'trading_recommendations': context.trading_recommendations
-                    }, ensure_ascii=False)
-                    
-                    conn.execute("""
-                        INSERT INTO analysis_history 
-                        (symbol, timestamp, timeframes, overall_signal, consistency_score, confidence_level, analysis_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        context.symbol,
-                        context.analysis_timestamp.isoformat(),
-                        json.dumps(timeframes),
-                        context.overall_signal.value,
-                        context.consistency_score,
-                        context.confidence_level,
-                        analysis_data
-                    ))
-                    
-            except Exception as e:
-                logger.error(f"❌ 保存分析上下文失败: {e}")
+        # 组装与序列化都在锁外完成，临界区只保留 SQLite 写入
+        try:
+            timeframe_payload = {}
+            for tf, ctx in context.timeframe_contexts.items():
+                timeframe_payload[tf] = {
+                    'timeframe': ctx.timeframe,
+                    'quality_score': ctx.quality_score,
+                    'signal_strength': ctx.signal_strength.value,
+                    'key_insights': ctx.key_insights,
+                    'risk_factors': ctx.risk_factors,
+                    'volume_analysis': ctx.volume_analysis
+                }
+            analysis_data = _json_dumps({
+                'timeframe_contexts': timeframe_payload,
+                'major_confluence_zones': context.major_confluence_zones,
+                'risk_warnings': context.risk_warnings,
+                'trading_recommendations': context.trading_recommendations
+            })
+            row = (
+                context.symbol,
+                _to_epoch_us(context.analysis_timestamp),
+                _json_dumps(list(timeframe_payload)),
+                context.overall_signal.value,
+                context.consistency_score,
+                context.confidence_level,
+                analysis_data
+            )
+            
+            with self._lock:
+                self._conn.execute(_SQL_INSERT_HISTORY, row)
+                
+        except Exception as e:
+            logger.error(f"❌ 保存分析上下文失败: {e}")
     
     def get_recent_analysis(self, symbol: str, hours: int = 24) -> List[Dict[str, Any]]:
-        """获取最近的分析记录"""
-        since_time = (datetime.now() - timedelta(hours=hours)).isoformat()
-        
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("""
-                SELECT * FROM analysis_history 
-                WHERE symbol = ? AND timestamp >= ?
-                ORDER BY timestamp DESC
-                LIMIT 50
-            """, (symbol, since_time))
-            
-            return [dict(row) for row in cursor.fetchall()]
+        """按时间倒序返回最近的分析摘要（时间、信号、评分）"""
+        return self._fetch_recent(_SQL_SELECT_RECENT, symbol, hours)
+    
+    def get_recent_full(self, symbol: str, hours: int = 24) -> List[Dict[str, Any]]:
+        """同 get_recent_analysis，但包含 analysis_data 等全部列"""
+        return self._fetch_recent(_SQL_SELECT_RECENT_FULL, symbol, hours)
+    
+    def _fetch_recent(self, sql: str, symbol: str, hours: int) -> List[Dict[str, Any]]:
+        since_us = int((time.time() - hours * 3600) * 1_000_000)
+        
+        # 只读连接仅在查询期间占用：先取完全部行并归还连接，再在连接外转换
+        # （若以生成器逐条产出，调用方未迭代完的结果会一直占着连接，连接池耗尽后 get() 永久阻塞）
+        conn = self._read_pool.get()
+        try:
+            rows = conn.execute(sql, (symbol, since_us)).fetchall()
+        finally:
+            self._read_pool.put(conn)
+        
+        records = []
+        for row in rows:
+            record = dict(row)
+            record['timestamp'] = _epoch_us_to_iso(record['timestamp'])
+            records.append(record)
+        return records
+    
+    @staticmethod
+    def _event_row(symbol: str, event: ContextEvent) -> tuple:
+        return (
+            symbol,
+            _to_epoch_us(event.timestamp),
+            event.event_type,
+            event.description,
+            event.priority.value,
+            _json_dumps(event.metadata)
+        )
     
     def save_context_event(self, symbol: str, event: ContextEvent):
         """保存上下文事件"""
         with self._lock:
             try:
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute("""
-                        INSERT INTO context_events 
-                        (symbol, timestamp, event_type, description, priority, metadata)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
-                        symbol,
-                        event.timestamp.isoformat(),
-                        event.event_type,
-                        event.description,
-                        event.priority.value,
-                        json.dumps(event.metadata, ensure_ascii=False)
-                    ))
-                    
+                self._conn.execute(_SQL_INSERT_EVENT, self._event_row(symbol, event))
             except Exception as e:
                 logger.error(f"❌ 保存上下文事件失败: {e}")
+    
+    def queue_context_event(self, symbol: str, event: ContextEvent):
+        """缓冲上下文事件，累计到 event_batch_size 条或等待 flush_interval 秒后批量写入"""
+        row = self._event_row(symbol, event)
+        with self._lock:
+            self._pending_events.append(row)
+            if len(self._pending_events) < self.event_batch_size:
+                if self._flush_timer is None:
+                    self._flush_timer = Timer(self.flush_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+    
+    def flush(self):
+        """在单个事务内批量写入缓冲的上下文事件"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending_events:
+                return
+            rows = list(self._pending_events)
+            self._pending_events.clear()
+            _write_event_rows(self._conn, rows)
+    
+    def close(self):
+        """写入剩余事件并关闭数据库连接（可重复调用）"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self._finalizer()
 
 class ConfluenceAnalyzer:
     """汇聚分析器 - 识别多时间框架的关键汇聚区域"""
@@ -244,42 +494,30 @@ class ConfluenceAnalyzer:
         if len(all_levels) < 2:
             return confluence_zones
             
-        # 按价格排序
-        all_levels.sort(key=lambda x: x['price'])
-        
-        # 查找汇聚区域
-        i = 0
-        while i < len(all_levels):
-            current_group = [all_levels[i]]
-            j = i + 1
-            
-            # 找到价格相近的所有水平
-            while j < len(all_levels):
-                price_diff = abs(all_levels[j]['price'] - current_group[0]['price']) / current_group[0]['price']
-                if price_diff <= self.confluence_threshold:
-                    current_group.append(all_levels[j])
-                    j += 1
-                else:
-                    break
-            
+        # 按价格排序后线性扫描：相邻价位间距超过阈值处即为分组边界
+        prices = np.fromiter((level['price'] for level in all_levels), dtype=np.float64, count=len(all_levels))
+        order = np.argsort(prices, kind='stable')
+        sorted_prices = prices[order]
+        gap_ratio = np.diff(sorted_prices) / sorted_prices[:-1]
+        split_points = np.flatnonzero(gap_ratio > self.confluence_threshold) + 1
+        
+        for group in np.split(order, split_points):
             # 如果有多个时间框架的汇聚，创建汇聚区域
-            if len(current_group) >= 2:
-                confluence_zones.append(self._create_confluence_zone(current_group))
-            
-            i = j if j > i + 1 else i + 1
+            if len(group) >= 2:
+                confluence_zones.append(self._create_confluence_zone([all_levels[i] for i in group]))
         
-        # 按强度排序
-        confluence_zones.sort(key=lambda x: x['strength'], reverse=True)
-        return confluence_zones[:5]  # 返回前5个最强的汇聚区域
+        # 返回前5个最强的汇聚区域
+        return heapq.nlargest(5, confluence_zones, key=itemgetter('strength'))
     
     def _create_confluence_zone(self, levels: List[Dict[str, Any]]) -> Dict[str, Any]:
         """创建汇聚区域"""
-        avg_price = sum(level['price'] for level in levels) / len(levels)
-        total_weight = sum(level['weight'] for level in levels)
-        avg_quality = sum(level['quality'] for level in levels) / len(levels)
+        values = np.array([(level['price'], level['weight'], level['quality']) for level in levels],
+                          dtype=np.float64)
+        avg_price, avg_quality = values[:, [0, 2]].mean(axis=0).tolist()
+        total_weight = float(values[:, 1].sum())
         
-        timeframes_involved = list(set(level['timeframe'] for level in levels))
-        level_types = list(set(level['type'] for level in levels))
+        timeframes_involved = list({level['timeframe'] for level in levels})
+        level_types = list({level['type'] for level in levels})
         
         # 计算强度 (基于权重、时间框架数量和质量)
         strength = total_weight * len(timeframes_involved) * (avg_quality / 100)
@@ -294,6 +532,37 @@ class ConfluenceAnalyzer:
             'levels_count': len(levels)
         }
 
+# 简单的关键词匹配：洞察与风险两张表合并为一个交替正则，分析文本只需扫描一遍
+_INSIGHT_KEYWORDS = (
+    ('突破', '价格突破关键水平'),
+    ('支撑', '发现重要支撑位'),
+    ('阻力', '识别关键阻力位'),
+    ('成交量', '成交量模式分析'),
+    ('趋势', '趋势方向分析'),
+)
+
+_RISK_KEYWORDS = (
+    ('波动', '高波动性风险'),
+    ('流动性', '流动性风险'),
+    ('背离', '技术指标背离风险'),
+    ('不确定', '市场不确定性风险'),
+)
+
+_KEYWORD_RE = re.compile('|'.join(
+    re.escape(keyword) for keyword, _ in _INSIGHT_KEYWORDS + _RISK_KEYWORDS
+))
+
+@lru_cache(maxsize=256)
+def _extract_text_features(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    返回 (洞察描述, 风险描述)，均按表内顺序
+    实时循环中同一分析文本（如命中响应缓存）会反复出现，按文本缓存提取结果
+    """
+    hits = set(_KEYWORD_RE.findall(text))
+    insights = tuple(message for keyword, message in _INSIGHT_KEYWORDS if keyword in hits)
+    risks = tuple(message for keyword, message in _RISK_KEYWORDS if keyword in hits)
+    return insights, risks
+
 class AnalysisContext:
     """
     分析上下文管理器
@@ -307,7 +576,7 @@ class AnalysisContext:
     """
     
     def __init__(self, db_path: str = "logs/analysis_history.db"):
-        self.history_manager = AnalysisHistoryManager(db_path)
+        self.history_manager = AnalysisHistoryManager(db_path, event_batch_size=32)
         self.confluence_analyzer = ConfluenceAnalyzer()
         logger.info("✅ 分析上下文管理器初始化完成")
     
@@ -338,10 +607,11 @@ class AnalysisContext:
             context = self._extract_timeframe_context(timeframe, result, timestamp)
             timeframe_contexts[timeframe] = context
         
-        # 计算整体指标
-        overall_signal = self._calculate_overall_signal(timeframe_contexts)
-        consistency_score = self._calculate_consistency_score(analysis_results)
-        confidence_level = self._calculate_confidence_level(timeframe_contexts, consistency_score)
+        # 计算整体指标（权重/信号值/质量评分只汇总一次）
+        summary = self._summarize_contexts(timeframe_contexts)
+        overall_signal = self._calculate_overall_signal(summary)
+        consistency_score = self._calculate_consistency_score(summary)
+        confidence_level = self._calculate_confidence_level(summary, consistency_score)
         
         # 查找汇聚区域
         confluence_zones = self.confluence_analyzer.find_confluence_zones(timeframe_contexts)
@@ -377,9 +647,10 @@ class AnalysisContext:
         # 从AI分析文本中提取结构化信息（简化版）
         analysis_text = result.get('analysis_text', result.get('analysis', ''))
         
-        # 简单的关键词提取（实际应用中可以使用更复杂的NLP方法）
-        key_insights = self._extract_insights(analysis_text)
-        risk_factors = self._extract_risk_factors(analysis_text)
+        # 简单的关键词提取（实际应用中可以使用更复杂的NLP方法），洞察与风险共用一次扫描
+        insights, risks = _extract_text_features(analysis_text)
+        key_insights = list(insights[:3])  # 最多3个关键洞察
+        risk_factors = list(risks[:2])  # 最多2个风险因素
         
         # 生成信号强度
         quality_score = result.get('quality_score', 50)
@@ -397,39 +668,11 @@ class AnalysisContext:
     
     def _extract_insights(self, text: str) -> List[str]:
         """提取关键洞察"""
-        insights = []
-        
-        # 简单的关键词匹配
-        insight_keywords = [
-            ('突破', '价格突破关键水平'),
-            ('支撑', '发现重要支撑位'),
-            ('阻力', '识别关键阻力位'),
-            ('成交量', '成交量模式分析'),
-            ('趋势', '趋势方向分析')
-        ]
-        
-        for keyword, insight in insight_keywords:
-            if keyword in text:
-                insights.append(insight)
-        
-        return insights[:3]  # 最多3个关键洞察
+        return list(_extract_text_features(text)[0][:3])  # 最多3个关键洞察
     
     def _extract_risk_factors(self, text: str) -> List[str]:
         """提取风险因素"""
-        risks = []
-        
-        risk_keywords = [
-            ('波动', '高波动性风险'),
-            ('流动性', '流动性风险'),
-            ('背离', '技术指标背离风险'),
-            ('不确定', '市场不确定性风险')
-        ]
-        
-        for keyword, risk in risk_keywords:
-            if keyword in text:
-                risks.append(risk)
-        
-        return risks[:2]  # 最多2个风险因素
+        return list(_extract_text_features(text)[1][:2])  # 最多2个风险因素
     
     
     def _determine_signal_strength(self, text: str, quality_score: float) -> SignalStrength:
@@ -443,82 +686,60 @@ class AnalysisContext:
         else:
             return SignalStrength.VERY_STRONG
     
-    def _calculate_overall_signal(self, contexts: Dict[str, TimeframeAnalysisContext]) -> SignalStrength:
-        """计算整体信号强度"""
+    def _summarize_contexts(self, contexts: Dict[str, TimeframeAnalysisContext]) -> Dict[str, float]:
+        """单次遍历汇总各时间框架的权重、信号值和质量评分，供后续指标共用"""
         if not contexts:
-            return SignalStrength.NEUTRAL
-            
-        # 基于质量评分加权平均
-        weighted_sum = 0
-        total_weight = 0
+            return {'count': 0, 'total_weight': 0.0, 'weighted_signal': 0.0,
+                    'avg_quality': 0.0, 'quality_std': 0.0}
         
-        for context in contexts.values():
-            weight = context.get_weight()
-            signal_value = self._signal_to_value(context.signal_strength)
-            weighted_sum += signal_value * weight
-            total_weight += weight
+        stats = np.array([
+            (ctx.get_weight(), _SIGNAL_TO_VALUE.get(ctx.signal_strength, 1.0), ctx.quality_score)
+            for ctx in contexts.values()
+        ], dtype=np.float64)
+        weights, signal_values, quality_scores = stats.T
+        total_weight = float(weights.sum())
         
-        if total_weight == 0:
+        return {
+            'count': len(stats),
+            'total_weight': total_weight,
+            'weighted_signal': float(weights @ signal_values) / total_weight if total_weight else 0.0,
+            'avg_quality': float(quality_scores.mean()),
+            'quality_std': float(quality_scores.std(ddof=1)) if len(stats) > 1 else 0.0,
+        }
+    
+    def _calculate_overall_signal(self, summary: Dict[str, float]) -> SignalStrength:
+        """计算整体信号强度（基于时间框架权重的加权平均）"""
+        if not summary['count'] or summary['total_weight'] == 0:
             return SignalStrength.NEUTRAL
             
-        avg_signal = weighted_sum / total_weight
-        return self._value_to_signal(avg_signal)
+        return self._value_to_signal(summary['weighted_signal'])
     
     def _signal_to_value(self, signal: SignalStrength) -> float:
         """信号强度转数值"""
-        mapping = {
-            SignalStrength.VERY_STRONG: 5.0,
-            SignalStrength.STRONG: 4.0,
-            SignalStrength.MODERATE: 3.0,
-            SignalStrength.WEAK: 2.0,
-            SignalStrength.NEUTRAL: 1.0,
-            SignalStrength.CONFLICTING: 0.5
-        }
-        return mapping.get(signal, 1.0)
+        return _SIGNAL_TO_VALUE.get(signal, 1.0)
     
     def _value_to_signal(self, value: float) -> SignalStrength:
         """数值转信号强度"""
-        if value >= 4.5:
-            return SignalStrength.VERY_STRONG
-        elif value >= 3.5:
-            return SignalStrength.STRONG
-        elif value >= 2.5:
-            return SignalStrength.MODERATE
-        elif value >= 1.5:
-            return SignalStrength.WEAK
-        else:
-            return SignalStrength.NEUTRAL
+        return _VALUE_SIGNALS[bisect_right(_VALUE_THRESHOLDS, value)]
     
-    def _calculate_consistency_score(self, results: Dict[str, Dict[str, Any]]) -> float:
+    def _calculate_consistency_score(self, summary: Dict[str, float]) -> float:
         """计算一致性评分"""
-        successful_results = [r for r in results.values() if r.get('success', False)]
-        
-        if len(successful_results) < 2:
-            return 100.0 if successful_results else 0.0
+        if summary['count'] < 2:
+            return 100.0 if summary['count'] else 0.0
             
-        quality_scores = [r.get('quality_score', 50) for r in successful_results]
-        
-        # 基于质量评分标准差计算一致性
-        import statistics
-        if len(quality_scores) > 1:
-            std_dev = statistics.stdev(quality_scores)
-            consistency = max(0, 100 - (std_dev * 1.5))
-        else:
-            consistency = 100.0
+        # 基于质量评分标准差（样本标准差）计算一致性
+        consistency = max(0, 100 - (summary['quality_std'] * 1.5))
             
         return min(100.0, consistency)
     
-    def _calculate_confidence_level(self, contexts: Dict[str, TimeframeAnalysisContext], consistency_score: float) -> float:
+    def _calculate_confidence_level(self, summary: Dict[str, float], consistency_score: float) -> float:
         """计算信心水平"""
-        if not contexts:
+        if not summary['count']:
             return 0.0
-            
-        avg_quality = sum(ctx.quality_score for ctx in contexts.values()) / len(contexts)
-        timeframe_count = len(contexts)
         
         # 信心水平 = (平均质量 * 0.4) + (一致性 * 0.4) + (时间框架数量奖励 * 0.2)
-        timeframe_bonus = min(20, timeframe_count * 5)  # 每个时间框架+5分，最多20分
-        confidence = (avg_quality * 0.4) + (consistency_score * 0.4) + timeframe_bonus
+        timeframe_bonus = min(20, summary['count'] * 5)  # 每个时间框架+5分，最多20分
+        confidence = (summary['avg_quality'] * 0.4) + (consistency_score * 0.4) + timeframe_bonus
         
         return min(100.0, confidence)
     
@@ -564,8 +785,11 @@ class AnalysisContext:
             
         return recommendations
     
-    def get_analysis_history(self, symbol: str, hours: int = 24) -> List[Dict[str, Any]]:
-        """获取分析历史"""
+    def get_analysis_history(self, symbol: str, hours: int = 24,
+                             include_data: bool = True) -> List[Dict[str, Any]]:
+        """获取分析历史；include_data=False 时只返回信号与评分摘要（索引覆盖查询）"""
+        if include_data:
+            return self.history_manager.get_recent_full(symbol, hours)
         return self.history_manager.get_recent_analysis(symbol, hours)
     
     def add_context_event(self, symbol: str, event_type: str, description: str, 
@@ -580,5 +804,14 @@ class AnalysisContext:
             metadata=metadata or {}
         )
         
-        self.history_manager.save_context_event(symbol, event)
-        logger.info(f"📝 添加上下文事件 - {symbol}: {description}")
\ No newline at end of file
+        # 事件突发时合并写入：满 32 条或 1 秒后统一提交
+        self.history_manager.queue_context_event(symbol, event)
+        logger.info(f"📝 添加上下文事件 - {symbol}: {description}")
+    
+    def flush(self):
+        """立即写入缓冲中的上下文事件"""
+        self.history_manager.flush()
+    
+    def close(self):
+        """写入剩余事件并释放数据库连接"""
+        self.history_manager.close()
@@ -1,11 +1,44 @@
 import pandas as pd
 from typing import Dict, List, Any, Optional
 import logging
-from .openrouter_client import OpenRouterClient
+from .openrouter_client import OpenRouterClient, run_sync
 from formatters import DataFormatter
+from config import Settings
 
 logger = logging.getLogger(__name__)
 
+# 分析提示词模板：数据前后的固定文本与各分析类型的要求
+_PROMPT_HEAD = "请分析以下ETH永续合约的原始OHLCV数据：\n\n"
+_PROMPT_MID = "\n\n请从Al Brooks价格行为分析专业角度进行分析，包括：\n"
+_PROMPT_SUFFIXES = {
+    'simple': """
+1. 价格趋势判断
+2. 成交量特征
+3. 关键支撑阻力位
+4. 简短交易建议
+
+请保持分析简洁明了。""",
+    'enhanced': """
+1. 详细趋势分析（多时间维度）
+2. 成交量模式识别
+3. 价格行为特征分析
+4. 支撑阻力位确认
+5. 市场结构评估
+6. 风险评估和仓位建议
+7. 具体入场出场点位
+
+请提供专业详细的分析报告。""",
+    'complete': """
+1. 价格趋势分析
+2. 成交量分析
+3. 支撑阻力位识别
+4. 市场结构判断
+5. 交易机会识别
+6. 风险提示
+
+请提供完整的专业分析。""",
+}
+
 class AnalysisEngine:
     """
     AI直接分析引擎 - 专注原始数据分析
@@ -16,16 +49,18 @@ class AnalysisEngine:
     3. 支持多种分析类型
     """
     
-    def __init__(self, api_key: Optional[str] = None, enable_validation: bool = False):
+    def __init__(self, api_key: Optional[str] = None, enable_validation: bool = False,
+                 formatter: Optional[DataFormatter] = None):
         """
         初始化分析引擎
         
         Args:
             api_key: OpenRouter API密钥
             enable_validation: 是否启用多模型验证（已简化，暂不支持）
+            formatter: 共享的数据格式化器，传入时复用其格式化缓存
         """
         self.client = OpenRouterClient(api_key)
-        self.formatter = DataFormatter()
+        self.formatter = formatter or DataFormatter()
         logger.info("✅ AI直接分析引擎初始化完成")
     
     def raw_data_analysis(self, 
@@ -43,81 +78,100 @@ class AnalysisEngine:
         Returns:
             分析结果字典
         """
+        if df is None or df.empty:
+            # 空数据直接返回，不再格式化和发起无意义的模型请求
+            logger.warning("⚠️ 数据为空，跳过AI分析")
+            return self._failed_result("数据为空", model, analysis_type)
+        
         try:
             # 格式化数据
-            csv_data = self.formatter.to_csv_format(df, include_volume=True)
+            csv_data = self.formatter.format_cached(df, 'csv', include_volume=True)
             
             # 构建分析提示词
             prompt = self._build_analysis_prompt(analysis_type, csv_data)
             
-            # 调用AI模型
-            response = self.client.generate_response(
-                prompt=prompt,
-                model_name=model
-            )
-            
-            if response.get('success'):
-                return {
-                    'analysis': response.get('analysis', ''),
-                    'model': model,
-                    'analysis_type': analysis_type,
-                    'data_points': len(df),
-                    'success': True
-                }
-            else:
-                return {
-                    'analysis': f'分析失败: {response.get("error", "未知错误")}',
-                    'model': model,
-                    'analysis_type': analysis_type,
-                    'success': False
-                }
+            return self._run_analysis(prompt, model, analysis_type, len(df))
             
         except Exception as e:
             logger.error(f"AI分析失败: {str(e)}")
+            return self._failed_result(str(e), model, analysis_type)
+    
+    async def multi_model_analysis_async(self,
+                                         df: pd.DataFrame,
+                                         models: List[str],
+                                         analysis_type: str = 'complete',
+                                         checkpoint_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        多模型并发分析同一份数据
+        
+        数据与提示词只构建一次；各模型请求作为一个批次提交给客户端并发执行，
+        总耗时约为最慢模型的响应时间而非各模型之和
+        
+        Args:
+            checkpoint_path: 批次检查点文件，中断后重跑时跳过已完成的模型
+        
+        Returns:
+            {模型名: 分析结果字典}
+        """
+        if df is None or df.empty:
+            logger.warning("⚠️ 数据为空，跳过多模型分析")
+            return {model: self._failed_result("数据为空", model, analysis_type) for model in models}
+        
+        csv_data = self.formatter.format_cached(df, 'csv', include_volume=True)
+        prompt = self._build_analysis_prompt(analysis_type, csv_data)
+        
+        try:
+            # 分析模式（simple/complete/enhanced）有各自的超时；其他分析类型用客户端默认超时
+            timeout = Settings.ANALYSIS_MODES.get(analysis_type, {}).get('timeout')
+            responses = await self.client.agenerate_responses_batch(
+                [(prompt, model) for model in models], min(len(models), 8), checkpoint_path, timeout=timeout
+            )
+        except Exception as e:
+            logger.error(f"AI批量分析失败: {e}")
+            return {model: self._failed_result(str(e), model, analysis_type) for model in models}
+        
+        return {
+            model: self._build_result(response, model, analysis_type, len(df))
+            for model, response in zip(models, responses)
+        }
+    
+    def multi_model_analysis(self,
+                             df: pd.DataFrame,
+                             models: List[str],
+                             analysis_type: str = 'complete',
+                             checkpoint_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """multi_model_analysis_async 的同步包装（可在事件循环内调用）"""
+        return run_sync(self.multi_model_analysis_async(df, models, analysis_type, checkpoint_path))
+    
+    def _run_analysis(self, prompt: str, model: str, analysis_type: str, data_points: int) -> Dict[str, Any]:
+        """调用AI模型并整理结果"""
+        response = self.client.generate_response(
+            prompt=prompt,
+            model_name=model
+        )
+        return self._build_result(response, model, analysis_type, data_points)
+    
+    def _build_result(self, response: Dict[str, Any], model: str, analysis_type: str, data_points: int) -> Dict[str, Any]:
+        if response.get('success'):
             return {
-                'analysis': f'分析失败: {str(e)}',
+                'analysis': response.get('analysis', ''),
                 'model': model,
                 'analysis_type': analysis_type,
-                'success': False
+                'data_points': data_points,
+                'success': True
             }
+        return self._failed_result(response.get("error", "未知错误"), model, analysis_type)
+    
+    @staticmethod
+    def _failed_result(error: str, model: str, analysis_type: str) -> Dict[str, Any]:
+        return {
+            'analysis': f'分析失败: {error}',
+            'model': model,
+            'analysis_type': analysis_type,
+            'success': False
+        }
     
     def _build_analysis_prompt(self, analysis_type: str, csv_data: str) -> str:
-        """构建分析提示词"""
-        base_prompt = f"""请分析以下ETH永续合约的原始OHLCV数据：
-
-{csv_data}
-
-请从Al Brooks价格行为分析专业角度进行分析，包括：
-"""
-        
-        if analysis_type == 'simple':
-            return base_prompt + """
-1. 价格趋势判断
-2. 成交量特征
-3. 关键支撑阻力位
-4. 简短交易建议
-
-请保持分析简洁明了。"""
-        
-        elif analysis_type == 'enhanced':
-            return base_prompt + """
-1. 详细趋势分析（多时间维度）
-2. 成交量模式识别
-3. 价格行为特征分析
-4. 支撑阻力位确认
-5. 市场结构评估
-6. 风险评估和仓位建议
-7. 具体入场出场点位
-
-请提供专业详细的分析报告。"""
-        
-        else:  # complete
-            return base_prompt + """
-1. 价格趋势分析
-2. 成交量分析
-3. 支撑阻力位识别
-4. 市场结构判断
-5. 交易机会识别
-6. 风险提示
-
-请提供完整的专业分析。"""
\ No newline at end of file
+        """构建分析提示词（仅数据部分随调用变化，其余为模块级常量）"""
+        suffix = _PROMPT_SUFFIXES.get(analysis_type, _PROMPT_SUFFIXES['complete'])
+        return _PROMPT_HEAD + csv_data + _PROMPT_MID + suffix
@@ -1,16 +1,113 @@
+import math
 from typing import Iterable, Optional
-import pandas as pd
+
+import numpy as np
+
+try:  # optional: compiled EMA fold for array input
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+class StreamingEMA:
+    """Incremental EMA: each ``update`` is one multiply-add, no history kept.
+
+    Matches ``pandas.Series.ewm(span=period, adjust=False).mean()`` — the first
+    finite value seeds the average, later values fold in with
+    ``alpha = 2 / (period + 1)``. Non-finite values are skipped; the average
+    keeps decaying across the gap as pandas does (see ``_gap_weight``).
+    """
+
+    __slots__ = ('alpha', 'value', '_gap')
+
+    def __init__(self, period: int = 20, value: Optional[float] = None):
+        self.alpha = 2.0 / (period + 1)
+        self.value = value
+        self._gap = 0
+
+    def update(self, x: float) -> Optional[float]:
+        x = float(x)
+        if not math.isfinite(x):
+            if self.value is not None:
+                self._gap += 1
+        elif self.value is None:
+            self.value = x
+        else:
+            self.value += _gap_weight(self.alpha, self._gap) * (x - self.value)
+            self._gap = 0
+        return self.value
+
+
+def _gap_weight(alpha: float, gap: int) -> float:
+    """Weight of a new value after ``gap`` skipped bars.
+
+    pandas ``adjust=False`` decays the old average's weight once per bar,
+    missing or not, then renormalises: the new value gets
+    ``alpha / ((1 - alpha) ** (gap + 1) + alpha)``, which is ``alpha`` when
+    nothing was skipped.
+    """
+    return alpha if gap == 0 else alpha / ((1.0 - alpha) ** (gap + 1) + alpha)
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _ema_reduce(values, alpha):
+        # same fold as the pure-Python loop in ``ema`` (gap weight inlined from
+        # ``_gap_weight``); returns NaN if nothing is finite
+        value = np.nan
+        gap = -1
+        for i in range(values.shape[0]):
+            x = values[i]
+            if not np.isfinite(x):
+                if gap >= 0:
+                    gap += 1
+            elif gap < 0:
+                value = x
+                gap = 0
+            else:
+                weight = alpha if gap == 0 else alpha / ((1.0 - alpha) ** (gap + 1) + alpha)
+                value += weight * (x - value)
+                gap = 0
+        return value
+else:
+    _ema_reduce = None
 
 
 def ema(series: Iterable[float], period: int = 20) -> float:
     """Compute EMA using only provided bars and return the last EMA value.
 
-    Accepts any iterable convertible to a pandas Series. Caller is responsible
-    for rounding to instrument tick size.
+    Accepts any iterable of numbers; bars are folded in order without building
+    a pandas Series. NaN/inf bars are skipped the way ``ewm(adjust=False)``
+    skips NaN. Caller is responsible for rounding to instrument tick size.
     """
-    s = pd.Series(list(series), dtype=float)
-    if len(s) < 1:
-        raise ValueError("series must contain at least 1 value")
-    ema_series = s.ewm(span=period, adjust=False).mean()
-    return float(ema_series.iloc[-1])
-
+    # ndarray / pandas Series: fold in compiled code when numba is installed,
+    # otherwise convert to Python floats in one C-level pass instead of boxing
+    # a numpy scalar per element while iterating
+    if isinstance(series, np.ndarray) or hasattr(series, 'to_numpy'):
+        values = (series.astype(np.float64, copy=False) if isinstance(series, np.ndarray)
+                  else series.to_numpy(dtype=np.float64)).ravel()
+        if _ema_reduce is not None:
+            value = float(_ema_reduce(values, 2.0 / (period + 1)))
+            if math.isnan(value):
+                raise ValueError("series must contain at least 1 finite value")
+            return value
+        series = values.tolist()
+    alpha = 2.0 / (period + 1)
+    isfinite = math.isfinite
+    value = None
+    gap = 0
+    for x in series:
+        x = float(x)
+        if not isfinite(x):
+            if value is not None:
+                gap += 1
+        elif value is None:
+            value = x
+        elif gap:
+            value += _gap_weight(alpha, gap) * (x - value)
+            gap = 0
+        else:
+            value += alpha * (x - value)
+    if value is None:
+        raise ValueError("series must contain at least 1 finite value")
+    return value
@@ -4,22 +4,45 @@
 基于现有AI直接分析架构，实现智能多时间框架综合分析
 """
 
+import re
 import time
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
 import logging
 from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
 import concurrent.futures
+from itertools import combinations
 from threading import Lock
+from types import MappingProxyType
 
 from .raw_data_analyzer import RawDataAnalyzer
-from data import BinanceFetcher
-from formatters import DataFormatter
+from config import Settings
+from utils import slotted
+
+if TYPE_CHECKING:
+    from data import BinanceFetcher
 
 logger = logging.getLogger(__name__)
 
+# 文本一致性比较用的方向词：各时间框架的价位本就不同，只比较多空倾向
+_BULLISH_RE = re.compile(r'看多|做多|多头|买入|上涨|向上')
+_BEARISH_RE = re.compile(r'看空|做空|空头|卖出|下跌|跌破|向下')
+# 分句标点；同一分句内方向词之前出现否定词则不计（"不建议做多"）
+_CLAUSE_SPLIT_RE = re.compile(r'[，,。；;！!？?\n]')
+_NEGATION_RE = re.compile(r'不宜|不建议|不要|不应|不可|不能|不会|不再|不看|不做|避免|勿|切忌')
+# 条件分句（"若跌破4300则转为看空"）描述的是假设情形，不代表当前倾向
+_CONDITION_RE = re.compile(r'若|如果|假如|倘若|一旦')
+_CONSEQUENCE_RE = re.compile(r'则|那么')
+
+# 时间框架 -> 秒数（只读常量，避免每次调用重建字典）
+_TIMEFRAME_SECONDS = MappingProxyType({
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '4h': 14400, '1d': 86400, '1w': 604800
+})
+
 class AnalysisScenario(Enum):
     """分析场景类型"""
     INTRADAY_TRADING = "intraday"      # 日内交易
@@ -35,6 +58,7 @@ class VolatilityLevel(Enum):
     HIGH = "high"        # 高波动
     EXTREME = "extreme"  # 极端波动
 
+@slotted
 @dataclass
 class TimeframeConfig:
     """时间框架配置"""
@@ -44,6 +68,7 @@ class TimeframeConfig:
     data_limit: int          # 数据量限制
     weight: float = 1.0      # 权重系数
 
+@slotted
 @dataclass
 class MultiTimeframeResult:
     """多时间周期分析结果"""
@@ -56,10 +81,33 @@ class MultiTimeframeResult:
     confidence_level: float
     execution_time: float
     timestamp: datetime = field(default_factory=datetime.now)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典"""
+        return {
+            'scenario': self.scenario.value,
+            'primary_analysis': self.primary_analysis,
+            'secondary_analyses': self.secondary_analyses,
+            'consistency_score': self.consistency_score,
+            'overall_signal': self.overall_signal,
+            'risk_warnings': self.risk_warnings,
+            'confidence_level': self.confidence_level,
+            'execution_time': self.execution_time,
+            'timestamp': self.timestamp.isoformat()
+        }
 
 class ScenarioDetector:
     """智能场景识别器"""
     
+    # 用户意图 -> 分析场景
+    INTENT_MAPPING = {
+        'trade': AnalysisScenario.INTRADAY_TRADING,
+        'trend': AnalysisScenario.TREND_ANALYSIS,
+        'swing': AnalysisScenario.SWING_TRADING,
+        'position': AnalysisScenario.POSITION_SIZING,
+        'quick': AnalysisScenario.QUICK_CHECK
+    }
+    
     def __init__(self):
         self.volatility_threshold = {
             'high': 2.0,      # ATR倍数
@@ -79,22 +127,18 @@ class ScenarioDetector:
             识别出的分析场景
         """
         if user_intent:
-            intent_mapping = {
-                'trade': AnalysisScenario.INTRADAY_TRADING,
-                'trend': AnalysisScenario.TREND_ANALYSIS,
-                'swing': AnalysisScenario.SWING_TRADING,
-                'position': AnalysisScenario.POSITION_SIZING,
-                'quick': AnalysisScenario.QUICK_CHECK
-            }
-            if user_intent.lower() in intent_mapping:
-                return intent_mapping[user_intent.lower()]
+            scenario = self.INTENT_MAPPING.get(user_intent.lower())
+            if scenario is not None:
+                return scenario
         
         # 自动场景识别
         volatility = self._calculate_volatility(df)
         volume_surge = self._detect_volume_surge(df)
         price_action = self._analyze_price_action(df)
         
-        logger.info(f"场景识别 - 波动率: {volatility.value}, 成交量异常: {volume_surge}, 价格行为: {price_action}")
+        # 实时引擎每个分析周期都会走到这里，用 % 参数延迟格式化，日志级别关闭时不拼接字符串
+        logger.info("场景识别 - 波动率: %s, 成交量异常: %s, 价格行为: %s",
+                    volatility.value, volume_surge, price_action)
         
         # 场景识别逻辑
         if volatility in [VolatilityLevel.HIGH, VolatilityLevel.EXTREME] and volume_surge:
@@ -134,18 +178,18 @@ class ScenarioDetector:
         if len(df) < 20:
             return False
             
-        avg_volume = df['volume'].rolling(20).mean()
-        current_volume = df['volume'].iloc[-1]
-        
-        return current_volume > (avg_volume.iloc[-1] * self.volume_threshold)
+        # 只需最后一根的20期均量，直接对末尾切片求均值
+        volume = df['volume'].to_numpy(dtype=float)
+        return volume[-1] > (volume[-20:].mean() * self.volume_threshold)
     
     def _analyze_price_action(self, df: pd.DataFrame) -> str:
         """分析价格行为模式"""
         if len(df) < 10:
             return 'insufficient_data'
             
-        recent_data = df.tail(10)
-        price_change = (recent_data['close'].iloc[-1] - recent_data['close'].iloc[0]) / recent_data['close'].iloc[0]
+        close = df['close'].to_numpy(dtype=float)
+        first_close = close[-10]
+        price_change = (close[-1] - first_close) / first_close
         
         # 简化的价格行为识别
         if abs(price_change) > 0.05:  # 5%以上变化
@@ -216,22 +260,13 @@ class TimeframeSelector:
         
         # 使用预定义配置
         config = self.SCENARIO_CONFIGS.get(scenario, self.SCENARIO_CONFIGS[AnalysisScenario.QUICK_CHECK])
-        logger.info(f"选择时间框架配置 - 场景: {scenario.value}, 主周期: {config.primary}, 辅助周期: {config.secondary}")
+        logger.info("选择时间框架配置 - 场景: %s, 主周期: %s, 辅助周期: %s",
+                    scenario.value, config.primary, config.secondary)
         return config
     
     def _get_update_frequency(self, timeframe: str) -> int:
         """根据时间框架获取更新频率"""
-        timeframe_to_seconds = {
-            '1m': 60,
-            '5m': 300,
-            '15m': 900,
-            '30m': 1800,
-            '1h': 3600,
-            '4h': 14400,
-            '1d': 86400,
-            '1w': 604800
-        }
-        return timeframe_to_seconds.get(timeframe, 3600)
+        return _TIMEFRAME_SECONDS.get(timeframe, 3600)
 
 class MultiTimeframeAnalyzer:
     """
@@ -247,8 +282,10 @@ class MultiTimeframeAnalyzer:
     def __init__(self, api_key: Optional[str] = None):
         """初始化多时间周期分析器"""
         self.raw_analyzer = RawDataAnalyzer(api_key)
-        self.fetcher = BinanceFetcher()
-        self.formatter = DataFormatter()
+        self._fetcher: Optional['BinanceFetcher'] = None
+        self._fetcher_lock = Lock()
+        # 与原始数据分析器共用同一格式化器（及其格式化缓存）
+        self.formatter = self.raw_analyzer.formatter
         
         self.scenario_detector = ScenarioDetector()
         self.timeframe_selector = TimeframeSelector()
@@ -260,6 +297,20 @@ class MultiTimeframeAnalyzer:
         
         logger.info("✅ 多时间周期AI分析器初始化完成")
     
+    @property
+    def fetcher(self) -> 'BinanceFetcher':
+        """数据获取器，首次取数时才导入 ccxt 并建立实例"""
+        if self._fetcher is None:
+            with self._fetcher_lock:
+                if self._fetcher is None:
+                    from data import BinanceFetcher
+                    self._fetcher = BinanceFetcher()
+        return self._fetcher
+    
+    @fetcher.setter
+    def fetcher(self, fetcher: 'BinanceFetcher'):
+        self._fetcher = fetcher
+    
     def analyze_multi_timeframe(self, 
                                symbol: str = "ETHUSDT",
                                model: str = "gpt5-chat",
@@ -344,9 +395,9 @@ class MultiTimeframeAnalyzer:
                 if time.time() - cache_time < self._cache_expiry:
                     return cached_data
         
-        # 获取新数据
+        # 获取新数据（磁盘缓存增量补拉，重启后不必重新拉取全部K线）
         symbol_for_api = symbol.replace('USDT', '/USDT') if '/' not in symbol else symbol
-        df = self.fetcher.get_ohlcv(symbol_for_api, timeframe, limit)
+        df = self.fetcher.get_ohlcv_incremental(symbol_for_api, timeframe, limit)
         
         # 缓存数据
         with self._cache_lock:
@@ -389,16 +440,33 @@ class MultiTimeframeAnalyzer:
                     'timeframe': timeframe
                 }
         
-        # 使用线程池并行分析
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        # 使用线程池并行分析：先全部提交，再按完成顺序收集
+        # 整体截止时间从提交时刻起算；超时后取消未开始的任务，不等待仍在运行的请求
+        timeout = Settings.VALIDATION_CONFIG.get('timeout_seconds', 120)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        try:
             future_to_timeframe = {
                 executor.submit(analyze_single_timeframe, tf): tf 
                 for tf in all_timeframes
             }
             
-            for future in concurrent.futures.as_completed(future_to_timeframe):
-                timeframe, result = future.result()
-                analyses[timeframe] = result
+            try:
+                for future in concurrent.futures.as_completed(future_to_timeframe, timeout=timeout):
+                    timeframe, result = future.result()
+                    analyses[timeframe] = result
+            except concurrent.futures.TimeoutError:
+                for future, timeframe in future_to_timeframe.items():
+                    if timeframe in analyses:
+                        continue
+                    future.cancel()
+                    logger.error(f"❌ 分析时间框架 {timeframe} 超时 (>{timeout}秒)")
+                    analyses[timeframe] = {
+                        'error': f'分析超时 (>{timeout}秒)',
+                        'success': False,
+                        'timeframe': timeframe
+                    }
+        finally:
+            executor.shutdown(wait=False)
         
         return analyses
     
@@ -409,23 +477,29 @@ class MultiTimeframeAnalyzer:
                            execution_time: float) -> MultiTimeframeResult:
         """整合分析结果"""
         
-        primary_analysis = analyses.get(timeframe_config.primary, {})
-        secondary_analyses = {
-            tf: analysis for tf, analysis in analyses.items() 
-            if tf != timeframe_config.primary
-        }
+        primary_timeframe = timeframe_config.primary
+        primary_analysis = analyses.get(primary_timeframe, {})
+        
+        # 一次遍历同时拆出次要周期结果与成功结果，成功结果供下面各项评估共用
+        secondary_analyses = {}
+        successful_analyses = []
+        for tf, analysis in analyses.items():
+            if tf != primary_timeframe:
+                secondary_analyses[tf] = analysis
+            if analysis.get('success', False):
+                successful_analyses.append(analysis)
         
         # 计算一致性评分
-        consistency_score = self._calculate_consistency_score(analyses)
+        consistency_score = self._calculate_consistency_score(analyses, successful_analyses)
         
         # 生成综合信号
-        overall_signal = self._generate_overall_signal(analyses, consistency_score)
+        overall_signal = self._generate_overall_signal(successful_analyses, consistency_score)
         
         # 识别风险警告
-        risk_warnings = self._identify_risk_warnings(analyses, consistency_score)
+        risk_warnings = self._identify_risk_warnings(analyses, successful_analyses, consistency_score)
         
         # 计算信心水平
-        confidence_level = self._calculate_confidence_level(analyses, consistency_score)
+        confidence_level = self._calculate_confidence_level(analyses, successful_analyses, consistency_score)
         
         return MultiTimeframeResult(
             scenario=scenario,
@@ -438,12 +512,12 @@ class MultiTimeframeAnalyzer:
             execution_time=execution_time
         )
     
-    def _calculate_consistency_score(self, analyses: Dict[str, Dict[str, Any]]) -> float:
+    def _calculate_consistency_score(self, analyses: Dict[str, Dict[str, Any]],
+                                     successful_analyses: List[Dict[str, Any]]) -> float:
         """计算分析一致性评分"""
         if len(analyses) < 2:
             return 100.0
             
-        successful_analyses = [a for a in analyses.values() if a.get('success', False)]
         if len(successful_analyses) < 2:
             return 0.0
         
@@ -451,19 +525,57 @@ class MultiTimeframeAnalyzer:
         quality_scores = [a.get('quality_score', 50) for a in successful_analyses if 'quality_score' in a]
         
         if len(quality_scores) < 2:
-            return 70.0  # 默认中等一致性
+            return self._calculate_text_consistency(successful_analyses)
             
-        # 计算评分标准差，转换为一致性分数
-        import statistics
-        std_dev = statistics.stdev(quality_scores)
+        # 计算评分标准差（样本标准差），转换为一致性分数
+        # statistics.stdev 走精确分数运算，numpy 浮点实现快约一倍，结果仅在末位舍入上可能不同
+        std_dev = float(np.asarray(quality_scores, dtype=np.float64).std(ddof=1))
         consistency = max(0, 100 - (std_dev * 2))  # 标准差越小，一致性越高
         
         return min(100.0, consistency)
     
-    def _generate_overall_signal(self, analyses: Dict[str, Dict[str, Any]], consistency_score: float) -> str:
-        """生成综合交易信号"""
-        successful_analyses = [a for a in analyses.values() if a.get('success', False)]
+    @staticmethod
+    def _calculate_text_consistency(analyses: List[Dict[str, Any]]) -> float:
+        """
+        无质量评分时，按分析文本的多空倾向两两比较估算一致性（0-100）
         
+        倾向由多/空方向词出现次数决定（否定与条件分句中的方向词不计）；
+        同向计1、一方中性计0.5、反向计0，取各对平均。
+        少于两个分析含方向词时无可比内容，保持默认中等一致性70
+        """
+        stances = []
+        for a in analyses:
+            bullish, bearish = MultiTimeframeAnalyzer._count_direction_words(a.get('analysis_text') or '')
+            if bullish or bearish:
+                stances.append((bullish > bearish) - (bullish < bearish))
+        if len(stances) < 2:
+            return 70.0
+        
+        agreements = [1.0 - abs(a - b) / 2 for a, b in combinations(stances, 2)]
+        return sum(agreements) / len(agreements) * 100
+    
+    @staticmethod
+    def _count_direction_words(text: str) -> Tuple[int, int]:
+        """统计表达当前倾向的多/空方向词数量，跳过条件分句及被否定的方向词"""
+        bullish = bearish = 0
+        in_condition = False
+        for clause in _CLAUSE_SPLIT_RE.split(text):
+            if _CONDITION_RE.search(clause):
+                # 结果部分（则/那么）不在本分句时，下一分句仍属于该条件
+                in_condition = not _CONSEQUENCE_RE.search(clause)
+                continue
+            if in_condition:
+                in_condition = False
+                continue
+            
+            negation = _NEGATION_RE.search(clause)
+            negated_until = negation.start() if negation else len(clause)
+            bullish += sum(1 for m in _BULLISH_RE.finditer(clause) if m.start() < negated_until)
+            bearish += sum(1 for m in _BEARISH_RE.finditer(clause) if m.start() < negated_until)
+        return bullish, bearish
+    
+    def _generate_overall_signal(self, successful_analyses: List[Dict[str, Any]], consistency_score: float) -> str:
+        """生成综合交易信号"""
         if not successful_analyses:
             return "NO_SIGNAL"
             
@@ -476,29 +588,30 @@ class MultiTimeframeAnalyzer:
         else:
             return "CONFLICTING_SIGNALS"
     
-    def _identify_risk_warnings(self, analyses: Dict[str, Dict[str, Any]], consistency_score: float) -> List[str]:
+    def _identify_risk_warnings(self, analyses: Dict[str, Dict[str, Any]],
+                                successful_analyses: List[Dict[str, Any]],
+                                consistency_score: float) -> List[str]:
         """识别风险警告"""
         warnings = []
         
         if consistency_score < 50:
             warnings.append("多时间框架信号严重冲突，建议谨慎交易")
             
-        failed_count = sum(1 for a in analyses.values() if not a.get('success', False))
+        failed_count = len(analyses) - len(successful_analyses)
         if failed_count > 0:
             warnings.append(f"{failed_count}个时间框架分析失败")
             
         # 检查数据质量
-        low_quality_count = sum(1 for a in analyses.values() 
-                               if a.get('success', False) and a.get('quality_score', 100) < 60)
+        low_quality_count = sum(1 for a in successful_analyses if a.get('quality_score', 100) < 60)
         if low_quality_count > 0:
             warnings.append(f"{low_quality_count}个时间框架分析质量较低")
             
         return warnings
     
-    def _calculate_confidence_level(self, analyses: Dict[str, Dict[str, Any]], consistency_score: float) -> float:
+    def _calculate_confidence_level(self, analyses: Dict[str, Dict[str, Any]],
+                                    successful_analyses: List[Dict[str, Any]],
+                                    consistency_score: float) -> float:
         """计算整体信心水平"""
-        successful_analyses = [a for a in analyses.values() if a.get('success', False)]
-        
         if not successful_analyses:
             return 0.0
             
@@ -509,6 +622,16 @@ class MultiTimeframeAnalyzer:
         confidence = (success_rate * 40 + consistency_score * 0.4 + avg_quality * 0.2)
         return min(100.0, confidence)
     
+    def close(self):
+        """释放原始数据分析器的线程池"""
+        self.raw_analyzer.close()
+    
+    def __enter__(self) -> 'MultiTimeframeAnalyzer':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def clear_cache(self):
         """清空缓存"""
         with self._cache_lock:
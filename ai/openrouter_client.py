@@ -1,30 +1,230 @@
 import openai
+import asyncio
+import hashlib
 import json
+import os
+import tempfile
+import threading
 import time
-from typing import Dict, List, Any, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import MappingProxyType
+from typing import Awaitable, Callable, Coroutine, Dict, List, Any, Optional, Tuple, Union
 import logging
 from config import Settings
 
 logger = logging.getLogger(__name__)
 
+# LLM响应磁盘缓存目录（由 VALIDATION_CONFIG['enable_response_cache'] 开启）
+RESPONSE_CACHE_DIR = Path('.cache/llm')
+
+# token超限降级候选：(模型, 上下文容量)，按容量从大到小排序
+_MODEL_CAPACITIES = (
+    ('gemini-25-pro', 2097152),
+    ('claude-opus-41', 200000), 
+    ('grok4', 131072),
+    ('gpt5-chat', 128000)
+)
+
+# 各分析类型的响应空间占比（只读常量，避免每次请求重建字典）
+_RESPONSE_RATIOS = MappingProxyType({
+    'general': 0.25,
+    'vpa': 0.35,
+    'technical': 0.30,
+    'pattern': 0.30,
+    'perpetual_vpa': 0.40,  # VPA分析需要更多空间
+    'raw_vpa': 0.35,
+    'complete': 0.30  # 添加complete类型
+})
+
+# 行打包批量请求的说明头：各行独立分析，统一以JSON数组返回
+_MARSHALED_PROMPT_HEAD = (
+    "以下有 {count} 个相互独立的分析请求，以 ### ROW n 分隔。请逐个完成，互不参考。\n"
+    "只输出一个JSON数组，每个请求一个元素：[{{\"row\": n, \"analysis\": \"该请求的完整回答\"}}]"
+)
+
+# API key -> 共享的同步客户端（内部 httpx 连接池线程安全，保持长连接，避免每个实例重复TLS握手）
+_shared_clients: Dict[str, openai.OpenAI] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    在同步代码中运行协程并返回结果
+    
+    调用线程没有运行中的事件循环时直接 asyncio.run；已在事件循环内（如异步框架、Jupyter）
+    则放到独立线程的新事件循环中运行，避免 asyncio.run 抛出 RuntimeError
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='openrouter-run-sync') as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def _get_shared_client(api_key: str) -> openai.OpenAI:
+    """获取（首次时创建）该API key的共享OpenRouter客户端"""
+    client = _shared_clients.get(api_key)
+    if client is None:
+        with _shared_clients_lock:
+            client = _shared_clients.get(api_key)
+            if client is None:
+                client = _shared_clients[api_key] = openai.OpenAI(
+                    api_key=api_key,
+                    base_url=Settings.OPENROUTER_BASE_URL
+                )
+    return client
+
+
+class RateLimiter:
+    """
+    按模型的令牌桶限流 - 请求数(rpm)与输入token数(tpm)两个桶，按单调时钟匀速回填
+    
+    请求发出前主动等待额度，而不是发出后被429拒绝再重试。同一客户端的限流器可能被多个线程中的
+    事件循环共享（run_sync 在已有事件循环时改用工作线程），检查与扣减在锁内完成
+    
+    Args:
+        limits: 模型 -> {'rpm': 每分钟请求数, 'tpm': 每分钟token数}
+        clock: 单调时钟（秒），测试时可注入假时钟
+    """
+    
+    def __init__(self, limits: Dict[str, Dict[str, int]], clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 模型 -> [可用请求数, 可用token数, 上次回填时间]
+        self._buckets: Dict[str, List[float]] = {}
+    
+    async def acquire(self, model: str, tokens: int = 0):
+        """等待直到 model 有一次请求及 tokens 个token的额度，并扣减"""
+        limit = self.limits.get(model)
+        if not limit:
+            return
+        while True:
+            with self._lock:
+                delay = self._try_take(model, limit.get('rpm'), limit.get('tpm'), tokens)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+    
+    def _try_take(self, model: str, rpm: Optional[int], tpm: Optional[int], tokens: int) -> float:
+        """额度足够则扣减并返回0，否则返回还需等待的秒数（调用方需持有 _lock）"""
+        now = self._clock()
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            bucket = self._buckets[model] = [float(rpm or 0), float(tpm or 0), now]
+        
+        elapsed = now - bucket[2]
+        bucket[2] = now
+        if rpm:
+            bucket[0] = min(rpm, bucket[0] + elapsed * rpm / 60)
+        if tpm:
+            bucket[1] = min(tpm, bucket[1] + elapsed * tpm / 60)
+            tokens = min(tokens, tpm)  # 超过整桶的请求等满桶后放行，避免永远等待
+        
+        delay = 0.0
+        if rpm and bucket[0] < 1:
+            delay = (1 - bucket[0]) * 60 / rpm
+        if tpm and bucket[1] < tokens:
+            delay = max(delay, (tokens - bucket[1]) * 60 / tpm)
+        if delay > 0:
+            return delay
+        
+        if rpm:
+            bucket[0] -= 1
+        if tpm:
+            bucket[1] -= tokens
+        return 0.0
+
+
 class OpenRouterClient:
     """
     OpenRouter API客户端，支持多种LLM模型
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, enable_cache: Optional[bool] = None,
+                 cache_size: int = 128):
         self.api_key = api_key or Settings.OPENROUTER_API_KEY
         if not self.api_key:
             raise ValueError("OpenRouter API key is required")
         
-        # 使用OpenAI SDK访问OpenRouter
-        self.client = openai.OpenAI(
-            api_key=self.api_key,
-            base_url=Settings.OPENROUTER_BASE_URL
-        )
+        # 使用OpenAI SDK访问OpenRouter；同一API key的实例共用一个客户端及其连接池
+        self.client = _get_shared_client(self.api_key)
         
         self.models = Settings.MODELS
         self.token_limits = Settings.TOKEN_LIMITS
+        
+        # 响应缓存：同一模型+提示词+数据在TTL内直接复用，内存层在前、磁盘层在后
+        cache_config = Settings.VALIDATION_CONFIG
+        self.cache_enabled = cache_config.get('enable_response_cache', False) if enable_cache is None else enable_cache
+        self.cache_ttl = cache_config.get('cache_duration_minutes', 30) * 60
+        # 内存层为LRU，条目上限 cache_size，过期条目读取时移除
+        self._memory_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        
+        # 异步请求的按模型限流（同步请求不经过）
+        self.rate_limiter = RateLimiter(Settings.MODEL_RATE_LIMITS)
+    
+    @staticmethod
+    def _cache_key(*parts: str) -> str:
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的缓存响应"""
+        if not self.cache_enabled:
+            return None
+        
+        with self._cache_lock:
+            entry = self._memory_cache.get(key)
+            if entry is not None:
+                if time.time() - entry[0] < self.cache_ttl:
+                    self._memory_cache.move_to_end(key)
+                    return dict(entry[1], cached=True)
+                del self._memory_cache[key]
+        
+        path = RESPONSE_CACHE_DIR / key
+        try:
+            stored_at = path.stat().st_mtime
+            if time.time() - stored_at >= self.cache_ttl:
+                return None
+            result = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        
+        self._memory_remember(key, stored_at, result)
+        return dict(result, cached=True)
+    
+    def _memory_remember(self, key: str, stored_at: float, result: Dict[str, Any]):
+        """写入内存层，超出上限时淘汰最久未用的条目"""
+        with self._cache_lock:
+            self._memory_cache[key] = (stored_at, result)
+            self._memory_cache.move_to_end(key)
+            if len(self._memory_cache) > self._cache_size:
+                self._memory_cache.popitem(last=False)
+    
+    def _cache_put(self, key: str, result: Dict[str, Any]):
+        """缓存成功的响应"""
+        if not self.cache_enabled or not result.get('success'):
+            return
+        
+        # 存副本：调用方之后对 result 的修改不会写进缓存
+        self._memory_remember(key, time.time(), dict(result))
+        try:
+            RESPONSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # 先写唯一的临时文件再原子替换：并发写同一键或读到一半写入的文件都不会出错
+            fd, tmp_path = tempfile.mkstemp(dir=RESPONSE_CACHE_DIR, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False)
+                os.replace(tmp_path, RESPONSE_CACHE_DIR / key)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"写入响应缓存失败: {e}")
     
     def _estimate_tokens(self, text: str) -> int:
         """
@@ -53,19 +253,12 @@ class OpenRouterClient:
         根据当前模型获取降级备选方案
         按token容量从大到小排序
         """
-        model_capacities = [
-            ('gemini-25-pro', 2097152),
-            ('claude-opus-41', 200000), 
-            ('grok4', 131072),
-            ('gpt5-chat', 128000)
-        ]
-        
         # 找到当前模型的容量
         current_capacity = self.token_limits.get(current_model, 0)
         
         # 返回比当前模型容量更大的模型列表
         fallback_models = [
-            model for model, capacity in model_capacities 
+            model for model, capacity in _MODEL_CAPACITIES 
             if capacity > current_capacity and model in self.models
         ]
         
@@ -98,10 +291,9 @@ class OpenRouterClient:
                 )
                 
                 if result.get('success', False):
-                    result['fallback_from'] = original_model
-                    result['fallback_reason'] = str(original_error)
                     logger.info(f"成功使用降级模型 {fallback_model} 完成分析")
-                    return result
+                    # 返回副本：result 可能就是缓存中的对象，降级信息不应写回缓存
+                    return dict(result, fallback_from=original_model, fallback_reason=str(original_error))
                 
             except Exception as e:
                 logger.warning(f"降级模型 {fallback_model} 也失败: {e}")
@@ -110,6 +302,67 @@ class OpenRouterClient:
         logger.error("所有降级模型都失败")
         return None
     
+    @staticmethod
+    def _is_retryable_error(error: Exception) -> bool:
+        """请求超时(408)或限流(429)：换一个模型有望成功"""
+        if isinstance(error, (openai.APITimeoutError, openai.RateLimitError, TimeoutError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code in (408, 429)
+    
+    def _reroute(self, original_model: str, original_error: Exception,
+                 call: Callable[[str], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        超时/限流后沿 Settings.TIMEOUT_FALLBACK_CHAINS 逐个改派模型，链末端模型重试一次
+        
+        Args:
+            call: 以模型名称发起一次请求（不再触发降级）并返回结果字典
+            
+        Returns:
+            首个成功的结果（附 original_model 与 reroute_events）；全部失败返回 None
+        """
+        reroute_events = [{'model': original_model, 'error': str(original_error)}]
+        for candidate in self._reroute_chain(original_model):
+            logger.info(f"{reroute_events[-1]['model']} 超时/限流，改派模型: {candidate}")
+            result = call(candidate)
+            if self._reroute_settled(result, original_model, candidate, reroute_events):
+                break
+        return self._reroute_outcome(result, original_model, reroute_events)
+    
+    async def _areroute(self, original_model: str, original_error: Exception,
+                        call: Callable[[str], Awaitable[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """_reroute 的异步版本，call 返回协程"""
+        reroute_events = [{'model': original_model, 'error': str(original_error)}]
+        for candidate in self._reroute_chain(original_model):
+            logger.info(f"{reroute_events[-1]['model']} 超时/限流，改派模型: {candidate}")
+            result = await call(candidate)
+            if self._reroute_settled(result, original_model, candidate, reroute_events):
+                break
+        return self._reroute_outcome(result, original_model, reroute_events)
+    
+    def _reroute_chain(self, original_model: str) -> List[str]:
+        """改派顺序：降级链中可用的模型，末端模型（无链时为原模型）再重试一次"""
+        chain = [m for m in Settings.TIMEOUT_FALLBACK_CHAINS.get(original_model, []) if m in self.models]
+        chain.append(chain[-1] if chain else original_model)
+        return chain
+    
+    @staticmethod
+    def _reroute_settled(result: Dict[str, Any], original_model: str, candidate: str,
+                         reroute_events: List[Dict[str, Any]]) -> bool:
+        """成功或遇到换模型也无济于事的错误时结束改派；失败记入 reroute_events"""
+        if result.get('success', False):
+            return True
+        reroute_events.append({'model': candidate, 'error': result.get('error')})
+        return not result.get('retryable', False)
+    
+    @staticmethod
+    def _reroute_outcome(result: Dict[str, Any], original_model: str,
+                         reroute_events: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if result.get('success', False):
+            # 返回副本：result 可能就是缓存中的对象，改派信息不应写回缓存
+            return dict(result, original_model=original_model, reroute_events=reroute_events)
+        logger.error(f"降级链全部失败: {[event['model'] for event in reroute_events]}")
+        return None
+    
     def analyze_market_data(self, 
                           data: str, 
                           model_name: str = 'gpt4',
@@ -139,6 +392,12 @@ class OpenRouterClient:
             else:
                 system_prompt = self._get_system_prompt(analysis_type)
             
+            cache_key = self._cache_key('analyze', model_name, analysis_type, system_prompt, data)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"命中响应缓存: {model_name}/{analysis_type}")
+                return cached
+            
             # 改进的token估算 - 使用更精确的方法
             estimated_input_tokens = self._estimate_tokens(data) + self._estimate_tokens(system_prompt)
             max_model_tokens = self.token_limits.get(model_name, 32000)
@@ -151,16 +410,7 @@ class OpenRouterClient:
                 raise ValueError(f"输入token数量 ({estimated_input_tokens}) 超过模型安全限制 ({safe_model_limit})")
             
             # 根据分析类型动态分配响应空间比例，但更保守
-            response_ratios = {
-                'general': 0.25,
-                'vpa': 0.35,
-                'technical': 0.30,
-                'pattern': 0.30,
-                'perpetual_vpa': 0.40,  # VPA分析需要更多空间
-                'raw_vpa': 0.35,
-                'complete': 0.30  # 添加complete类型
-            }
-            response_ratio = response_ratios.get(analysis_type, 0.25)
+            response_ratio = _RESPONSE_RATIOS.get(analysis_type, 0.25)
             
             # 计算可用的响应token数，确保总和不超过安全限制
             available_response_tokens = safe_model_limit - estimated_input_tokens
@@ -205,6 +455,7 @@ class OpenRouterClient:
             
             logger.info(f"分析完成，耗时 {result['response_time']:.2f}秒，使用token: {result['usage']['total_tokens']}")
             
+            self._cache_put(cache_key, result)
             return result
             
         except Exception as e:
@@ -217,11 +468,27 @@ class OpenRouterClient:
                 if fallback_result:
                     return fallback_result
             
+            # 超时/限流：沿降级链改派其他模型
+            if not _is_fallback and self._is_retryable_error(e):
+                rerouted = self._reroute(
+                    model_name, e,
+                    lambda candidate: self.analyze_market_data(
+                        data=data,
+                        model_name=candidate,
+                        analysis_type=analysis_type,
+                        custom_prompt=system_prompt,
+                        _is_fallback=True
+                    )
+                )
+                if rerouted:
+                    return rerouted
+            
             return {
                 'success': False,
                 'model': model_name,
                 'error': error_message,
-                'analysis': None
+                'analysis': None,
+                'retryable': self._is_retryable_error(e)
             }
     
     
@@ -354,7 +621,8 @@ class OpenRouterClient:
         return self.models.copy()
     
     
-    def generate_response(self, prompt: str, model_name: str = 'gpt4o-mini') -> Dict[str, Any]:
+    def generate_response(self, prompt: str, model_name: str = 'gpt4o-mini',
+                          _is_fallback: bool = False) -> Dict[str, Any]:
         """
         生成通用响应 - 用于自定义提示的分析
         
@@ -366,57 +634,315 @@ class OpenRouterClient:
             包含响应结果的字典
         """
         try:
-            model_id = self.models.get(model_name)
-            if not model_id:
-                raise ValueError(f"Unknown model: {model_name}")
-            
-            # 估算token数量
-            estimated_tokens = len(prompt.split())
-            max_model_tokens = self.token_limits.get(model_name, 32000)
+            cache_key = self._cache_key('generate', model_name, prompt)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"命中响应缓存: {model_name}")
+                return cached
             
-            # 为通用响应分配50%的剩余空间
-            available_response_tokens = int((max_model_tokens - estimated_tokens) * 0.5)
-            max_response_tokens = max(1000, min(available_response_tokens, max_model_tokens - estimated_tokens - 500))
+            request = self._build_generate_request(prompt, model_name)
+            start_time = time.time()
+            response = self.client.chat.completions.create(**request)
+            return self._build_generate_result(response, model_name, request['model'], start_time, cache_key)
             
-            if estimated_tokens > max_model_tokens * 0.7:
-                logger.warning(f"输入token较多 ({estimated_tokens} > {max_model_tokens * 0.7})，响应空间: {max_response_tokens}")
+        except Exception as e:
+            logger.error(f"响应生成失败: {e}")
             
-            logger.info(f"使用模型 {model_id} 生成响应，输入token: {estimated_tokens}, 最大响应token: {max_response_tokens}")
+            # 超时/限流：沿降级链改派其他模型
+            if not _is_fallback and self._is_retryable_error(e):
+                rerouted = self._reroute(
+                    model_name, e,
+                    lambda candidate: self.generate_response(prompt, candidate, _is_fallback=True)
+                )
+                if rerouted:
+                    return rerouted
             
+            return self._generate_error(model_name, e)
+    
+    async def agenerate_response(self,
+                                 prompt: str,
+                                 model_name: str = 'gpt4o-mini',
+                                 client: Optional[openai.AsyncOpenAI] = None,
+                                 timeout: Optional[float] = None,
+                                 _is_fallback: bool = False) -> Dict[str, Any]:
+        """
+        generate_response 的异步版本 - 请求在事件循环中等待，不占用线程；结果结构与同步版本一致
+        
+        Args:
+            client: 共享的 AsyncOpenAI 客户端（连接池）；不传则临时创建并在返回前关闭
+            timeout: 单次请求超时（秒），默认 VALIDATION_CONFIG['timeout_per_request']；
+                超时按 TimeoutError 处理，沿降级链改派其他模型
+        """
+        if timeout is None:
+            timeout = Settings.VALIDATION_CONFIG.get('timeout_per_request', 60)
+        try:
+            cache_key = self._cache_key('generate', model_name, prompt)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"命中响应缓存: {model_name}")
+                return cached
+            
+            request = self._build_generate_request(prompt, model_name)
+            await self.rate_limiter.acquire(model_name, self._estimate_tokens(prompt))
             start_time = time.time()
+            try:
+                if client is None:
+                    async with self._new_async_client() as own_client:
+                        response = await asyncio.wait_for(own_client.chat.completions.create(**request), timeout)
+                else:
+                    response = await asyncio.wait_for(client.chat.completions.create(**request), timeout)
+            except asyncio.TimeoutError:
+                # Python 3.11 之前 asyncio.TimeoutError 不是内置 TimeoutError 的子类
+                raise TimeoutError(f"{model_name} 请求超时 ({timeout}秒)") from None
+            return self._build_generate_result(response, model_name, request['model'], start_time, cache_key)
             
-            response = self.client.chat.completions.create(
-                model=model_id,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # 低温度确保一致性
-                max_tokens=max_response_tokens,  # 动态分配响应空间
-            )
+        except Exception as e:
+            logger.error(f"响应生成失败: {e}")
             
-            end_time = time.time()
+            # 超时/限流：沿降级链改派其他模型
+            if not _is_fallback and self._is_retryable_error(e):
+                rerouted = await self._areroute(
+                    model_name, e,
+                    lambda candidate: self.agenerate_response(prompt, candidate, client, timeout, _is_fallback=True)
+                )
+                if rerouted:
+                    return rerouted
             
-            result = {
-                'success': True,
-                'model': model_name,
-                'model_id': model_id,
-                'analysis': response.choices[0].message.content,
-                'usage': {
-                    'prompt_tokens': response.usage.prompt_tokens if response.usage else 0,
-                    'completion_tokens': response.usage.completion_tokens if response.usage else 0,
-                    'total_tokens': response.usage.total_tokens if response.usage else 0
-                },
-                'response_time': end_time - start_time
-            }
+            return self._generate_error(model_name, e)
+    
+    def _generate_error(self, model_name: str, error: Exception) -> Dict[str, Any]:
+        """generate_response / agenerate_response 共用的失败结果"""
+        return {
+            'success': False,
+            'model': model_name,
+            'error': str(error),
+            'analysis': None,
+            'retryable': self._is_retryable_error(error)
+        }
+    
+    def _new_async_client(self) -> openai.AsyncOpenAI:
+        """创建访问OpenRouter的异步客户端（需在使用它的事件循环内创建和关闭）"""
+        return openai.AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=Settings.OPENROUTER_BASE_URL
+        )
+    
+    def _build_generate_request(self, prompt: str, model_name: str) -> Dict[str, Any]:
+        """解析模型并分配响应token，返回 chat.completions.create 的参数"""
+        model_id = self.models.get(model_name)
+        if not model_id:
+            raise ValueError(f"Unknown model: {model_name}")
+        
+        # 估算token数量
+        estimated_tokens = len(prompt.split())
+        max_model_tokens = self.token_limits.get(model_name, 32000)
+        
+        # 为通用响应分配50%的剩余空间
+        available_response_tokens = int((max_model_tokens - estimated_tokens) * 0.5)
+        max_response_tokens = max(1000, min(available_response_tokens, max_model_tokens - estimated_tokens - 500))
+        
+        if estimated_tokens > max_model_tokens * 0.7:
+            logger.warning(f"输入token较多 ({estimated_tokens} > {max_model_tokens * 0.7})，响应空间: {max_response_tokens}")
+        
+        logger.info(f"使用模型 {model_id} 生成响应，输入token: {estimated_tokens}, 最大响应token: {max_response_tokens}")
+        
+        return {
+            'model': model_id,
+            'messages': [
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.1,  # 低温度确保一致性
+            'max_tokens': max_response_tokens,  # 动态分配响应空间
+        }
+    
+    def _build_generate_result(self, response: Any, model_name: str, model_id: str,
+                               start_time: float, cache_key: str) -> Dict[str, Any]:
+        """整理模型响应为结果字典并写入缓存"""
+        end_time = time.time()
+        
+        result = {
+            'success': True,
+            'model': model_name,
+            'model_id': model_id,
+            'analysis': response.choices[0].message.content,
+            'usage': {
+                'prompt_tokens': response.usage.prompt_tokens if response.usage else 0,
+                'completion_tokens': response.usage.completion_tokens if response.usage else 0,
+                'total_tokens': response.usage.total_tokens if response.usage else 0
+            },
+            'response_time': end_time - start_time
+        }
+        
+        logger.info(f"响应生成完成，耗时 {result['response_time']:.2f}秒，使用token: {result['usage']['total_tokens']}")
+        
+        self._cache_put(cache_key, result)
+        return result
+    
+    def generate_responses_marshaled(self,
+                                     prompts: List[str],
+                                     model_name: str = 'gpt4o-mini',
+                                     batch_size: int = 4) -> List[Dict[str, Any]]:
+        """
+        行打包批量生成 - 每 batch_size 个提示合并为一次请求，按 ### ROW 分段，模型逐行返回JSON
+        
+        适合大量短小且相互独立的分析（如多个交易对的同类分析）：一次请求分摊网络与排队开销，
+        也更不容易触发按请求计数的限流。行数过多会拖慢单次响应，batch_size 以4左右为宜
+        
+        Args:
+            prompts: 相互独立的提示文本列表
+            model_name: 使用的模型名称
+            batch_size: 每次请求打包的行数
             
-            logger.info(f"响应生成完成，耗时 {result['response_time']:.2f}秒，使用token: {result['usage']['total_tokens']}")
+        Returns:
+            与 prompts 顺序一致的响应结果列表；usage 为所在批次的整体用量。
+            批量响应未能解析出的行单独调用 generate_response 补齐
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+        batch_size = max(1, batch_size)
+        
+        for start in range(0, len(prompts), batch_size):
+            rows = prompts[start:start + batch_size]
+            if len(rows) == 1:
+                results[start] = self.generate_response(rows[0], model_name)
+                continue
             
-            return result
+            batch_prompt = _MARSHALED_PROMPT_HEAD.format(count=len(rows)) + ''.join(
+                f"\n\n### ROW {i}\n{row}" for i, row in enumerate(rows, 1)
+            )
+            response = self.generate_response(batch_prompt, model_name)
+            analyses = self._parse_marshaled_rows(response.get('analysis') or '') if response.get('success') else {}
+            
+            for i in range(len(rows)):
+                analysis = analyses.get(i + 1)
+                if analysis is None:
+                    logger.warning(f"批量响应缺少第{start + i + 1}行，单独请求补齐")
+                    results[start + i] = self.generate_response(rows[i], model_name)
+                else:
+                    results[start + i] = dict(response, analysis=analysis, batch_size=len(rows))
+        
+        return results
+    
+    @staticmethod
+    def _parse_marshaled_rows(text: str) -> Dict[int, str]:
+        """从批量响应中解析 [{"row": n, "analysis": "..."}]，返回 {行号: 分析文本}"""
+        begin, end = text.find('['), text.rfind(']')
+        if begin < 0 or end <= begin:
+            return {}
+        try:
+            items = json.loads(text[begin:end + 1])
+        except ValueError:
+            return {}
+        
+        analyses = {}
+        for item in items if isinstance(items, list) else ():
+            if isinstance(item, dict) and isinstance(item.get('row'), int) and isinstance(item.get('analysis'), str):
+                analyses[item['row']] = item['analysis']
+        return analyses
+    
+    def generate_responses_batch(self,
+                                 requests: List[Tuple[str, str]],
+                                 concurrency_limit: int = 8,
+                                 output_jsonl: Optional[str] = None,
+                                 stop_when: Optional[Callable[[List[Optional[Dict[str, Any]]]], bool]] = None,
+                                 timeout: Optional[float] = None
+                                 ) -> List[Dict[str, Any]]:
+        """agenerate_responses_batch 的同步包装（可在事件循环内调用）"""
+        return run_sync(self.agenerate_responses_batch(requests, concurrency_limit, output_jsonl, stop_when, timeout))
+    
+    async def agenerate_responses_batch(self,
+                                        requests: List[Tuple[str, str]],
+                                        concurrency_limit: int = 8,
+                                        output_jsonl: Optional[str] = None,
+                                        stop_when: Optional[Callable[[List[Optional[Dict[str, Any]]]], bool]] = None,
+                                        timeout: Optional[float] = None
+                                        ) -> List[Dict[str, Any]]:
+        """
+        批量生成响应 - 多个 (prompt, model) 请求在同一事件循环中并发等待
+        
+        所有请求共用一个 AsyncOpenAI 连接池，不再为每个请求占用一个线程
+        
+        Args:
+            requests: (提示文本, 模型名称) 列表
+            concurrency_limit: 最大并发请求数
+            output_jsonl: 检查点文件；已成功的请求在中断后重跑时直接复用
+            stop_when: 提前结束条件；每完成一个请求以当前结果列表（未完成为 None）调用一次，
+                返回 True 时取消其余请求（如多个模型已达成一致时不再等待剩余模型）
+            timeout: 每个请求的超时（秒），见 agenerate_response；单个模型卡住不会拖住整批
             
-        except Exception as e:
-            logger.error(f"响应生成失败: {e}")
-            return {
-                'model': model_name,
-                'error': str(e),
-                'analysis': None
-            }
\ No newline at end of file
+        Returns:
+            与 requests 顺序一致的响应结果列表；被提前取消的请求结果带 cancelled=True
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        keys = [self._cache_key('generate', model, prompt) for prompt, model in requests]
+        
+        checkpoint = Path(output_jsonl) if output_jsonl else None
+        if checkpoint is not None and checkpoint.exists():
+            done = {}
+            with checkpoint.open(encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 中断时写了一半的行
+                    done[record['key']] = record['result']
+            for i, key in enumerate(keys):
+                if key in done:
+                    results[i] = done[key]
+            logger.info(f"从检查点恢复 {sum(r is not None for r in results)}/{len(requests)} 个响应")
+        
+        pending = [i for i, r in enumerate(results) if r is None]
+        if not pending or (stop_when is not None and stop_when(results)):
+            return self._fill_cancelled(requests, results)
+        
+        sink = None
+        if checkpoint is not None:
+            checkpoint.parent.mkdir(parents=True, exist_ok=True)
+            sink = checkpoint.open('a', encoding='utf-8')
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency_limit))
+        
+        async def run(i: int, client: openai.AsyncOpenAI):
+            async with semaphore:
+                results[i] = await self.agenerate_response(*requests[i], client=client, timeout=timeout)
+            # 每完成一个就落盘，进程中断后只需重跑未完成的请求
+            if sink is not None and results[i].get('success'):
+                sink.write(json.dumps({'key': keys[i], 'result': results[i]}, ensure_ascii=False) + '\n')
+                sink.flush()
+        
+        try:
+            async with self._new_async_client() as client:
+                tasks = [asyncio.ensure_future(run(i, client)) for i in pending]
+                try:
+                    if stop_when is None:
+                        await asyncio.gather(*tasks)
+                    else:
+                        for finished in asyncio.as_completed(tasks):
+                            await finished
+                            if stop_when(results):
+                                logger.info(f"满足提前结束条件，取消剩余 {sum(r is None for r in results)} 个请求")
+                                break
+                finally:
+                    # 取消未完成的请求（关闭其连接，不再等待生成）
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if sink is not None:
+                sink.close()
+        
+        return self._fill_cancelled(requests, results)
+    
+    @staticmethod
+    def _fill_cancelled(requests: List[Tuple[str, str]],
+                        results: List[Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """为提前结束而未完成的请求补上取消结果"""
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = {
+                    'success': False,
+                    'model': requests[i][1],
+                    'error': 'cancelled: 批量请求已提前结束',
+                    'analysis': None,
+                    'cancelled': True
+                }
+        return results
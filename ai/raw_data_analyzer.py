@@ -7,6 +7,7 @@
 import asyncio
 import time
 import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Dict, List, Any, Optional, Union
 import logging
 from datetime import datetime
@@ -14,11 +15,49 @@ from datetime import datetime
 from .openrouter_client import OpenRouterClient
 from .indicators import ema
 from .rr_utils import round_to_tick, rr_with_costs
+from config import Settings
 from formatters import DataFormatter
 from prompts import PromptManager
 
 logger = logging.getLogger(__name__)
 
+# 分析提示词在导入时拼好，各分析类型直接取用
+_BASE_ANALYSIS_PROMPT = """请分析以下ETH/USDT永续合约的原始K线数据，提供专业的VPA (Volume Price Analysis) 分析：
+
+请回答以下问题：
+1. **当前趋势方向是什么？**
+2. **最近的价格行为有什么特点？** 
+3. **成交量变化说明什么？**
+4. **有哪些关键支撑阻力位？**
+5. **给出简要的交易建议**
+
+请基于原始OHLCV数据进行分析，引用具体的价格数值和成交量数据来支持你的判断。"""
+
+# 质量评估关键词：趋势、成交量、技术位、交易建议四个维度
+_QUALITY_KEYWORD_GROUPS = (
+    ('上涨', '下跌', '震荡', '趋势', 'trend', 'bullish', 'bearish'),
+    ('成交量', '量', 'volume', '放量', '缩量'),
+    ('支撑', '阻力', '关键', '位置', 'support', 'resistance'),
+    ('建议', '买入', '卖出', '做多', '做空', '交易', 'buy', 'sell'),
+)
+
+_ANALYSIS_PROMPTS = {
+    'complete': _BASE_ANALYSIS_PROMPT + """
+
+请特别关注：
+- Anna Coulling VSA理论应用
+- 量价关系的专业分析
+- 市场阶段识别 (Accumulation/Distribution/Markup/Markdown)
+- Smart Money vs Dumb Money 行为识别""",
+    'enhanced': _BASE_ANALYSIS_PROMPT + """
+
+请提供增强分析：
+- 多时间框架视角
+- Wyckoff理论应用
+- 永续合约特有因素考虑
+- 具体的入场出场建议与风险控制""",
+}
+
 class RawDataAnalyzer:
     """
     原始数据AI分析器
@@ -33,13 +72,28 @@ class RawDataAnalyzer:
     - 支持多种数据格式和模型
     """
     
-    def __init__(self, api_key: Optional[str] = None):
-        """初始化原始数据分析器"""
+    def __init__(self, api_key: Optional[str] = None, formatter: Optional[DataFormatter] = None):
+        """初始化原始数据分析器（可传入共享的 formatter 以复用其格式化缓存）"""
         self.client = OpenRouterClient(api_key)
-        self.formatter = DataFormatter()
+        self.formatter = formatter or DataFormatter()
         self.prompt_manager = PromptManager()
+        # AI请求线程池：网络等待与本地交易方案计算重叠执行
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='raw-analyzer')
+        # 对冲请求单独的线程池：主请求占满上面的线程池时，对冲请求也能立即发出
+        self._hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='raw-analyzer-hedge')
         logger.info("✅ 原始数据AI分析器初始化完成")
     
+    def close(self):
+        """关闭AI请求线程池（等待在途请求结束）；关闭后不能再分析"""
+        self._executor.shutdown(wait=True)
+        self._hedge_executor.shutdown(wait=True)
+    
+    def __enter__(self) -> 'RawDataAnalyzer':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def analyze_raw_ohlcv(self, 
                          df: pd.DataFrame,
                          model: str = 'gpt5-chat',
@@ -63,30 +117,31 @@ class RawDataAnalyzer:
             分析结果字典
         """
         start_time = time.time()
+        api_future: Optional[Future] = None
         
         try:
             method_display = f", 方法: {analysis_method}" if analysis_method else ""
             logger.info(f"🚀 开始AI直接分析 - 模型: {model}, 类型: {analysis_type}{method_display}")
             
             # 数据验证
-            if df is None or len(df) == 0:
+            bars_analyzed = 0 if df is None else len(df)
+            if bars_analyzed == 0:
                 raise ValueError("数据为空")
             
             # Al Brooks方法需要足够的历史数据进行结构分析
             if analysis_method and ('al-brooks' in analysis_method or 'brooks' in analysis_method):
                 min_bars_needed = 120
-                if len(df) < min_bars_needed:
-                    logger.warning(f"⚠️ Al Brooks分析建议至少{min_bars_needed}根K线，当前仅{len(df)}根，可能影响分析质量")
+                if bars_analyzed < min_bars_needed:
+                    logger.warning(f"⚠️ Al Brooks分析建议至少{min_bars_needed}根K线，当前仅{bars_analyzed}根，可能影响分析质量")
                     # 不抛出异常，但记录警告
             elif analysis_method:
                 # 其他方法的最小数据量检查
                 min_bars_needed = 50
-                if len(df) < min_bars_needed:
-                    logger.warning(f"⚠️ {analysis_method}分析建议至少{min_bars_needed}根K线，当前仅{len(df)}根")
+                if bars_analyzed < min_bars_needed:
+                    logger.warning(f"⚠️ {analysis_method}分析建议至少{min_bars_needed}根K线，当前仅{bars_analyzed}根")
             
-            # 仅使用已关闭的K线（历史OHLCV均视为已闭合）
-            used_df = df.copy()
-            bars_analyzed = len(used_df)
+            # 仅使用已关闭的K线（历史OHLCV均视为已闭合）；下游只读，无需复制
+            used_df = df
 
             # 元数据与交易成本（从获取器/市场约定推断，测试环境中为常量）
             venue = 'Binance-Perp'
@@ -142,7 +197,7 @@ class RawDataAnalyzer:
                 ema_missing = True
 
             # 格式化原始数据 (CSV)
-            formatted_data = self.formatter.to_csv_format(used_df, include_volume=True)
+            formatted_data = self.formatter.format_cached(used_df, 'csv', include_volume=True)
             
             # 构建分析提示词
             if analysis_method:
@@ -162,71 +217,36 @@ class RawDataAnalyzer:
                 prompt = self._build_analysis_prompt(analysis_type) 
                 api_analysis_type = 'raw_vpa'
             
-            # AI分析 - 直接理解原始数据  
-            try:
-                if model == 'mock':
-                    raise RuntimeError('offline-mock')
-                if analysis_method:
-                    # 使用新的提示词管理系统
-                    api_result = self.client.generate_response(
-                        prompt=prompt,
-                        model_name=model
-                    )
-                else:
-                    # 使用传统方法
-                    api_result = self.client.analyze_market_data(
-                        data=formatted_data,
-                        model_name=model,
-                        analysis_type=api_analysis_type,
-                        custom_prompt=prompt
-                    )
-            except Exception:
-                # 离线/测试模式：提供最小可读分析文本，包含EMA引用
-                fallback = (
-                    f"Offline analysis summary: using {bars_analyzed} closed bars. "
-                    f"EMA20({timeframe}) magnet at {ema20_val}."
-                )
-                api_result = {'success': True, 'analysis': fallback}
-            
-            # 检查API调用是否成功；失败则切换离线回退
-            if not api_result.get('success'):
-                fallback = (
-                    f"Offline analysis summary: using {bars_analyzed} closed bars. "
-                    f"EMA20({timeframe}) magnet at {ema20_val}."
-                )
-                api_result = {'success': True, 'analysis': fallback}
-            
-            # 提取分析文本
-            analysis_result = api_result.get('analysis', '')
-            
-            # 计算时间和质量
-            analysis_time = time.time() - start_time
-            
-            # 评估分析质量 (基于验证成功的评估体系)
-            if analysis_method:
-                try:
-                    evaluator = self.prompt_manager.get_quality_evaluator(analysis_method)
-                    quality_score = evaluator(analysis_result, df)
-                except Exception as e:
-                    logger.warning(f"⚠️ 无法使用专用评估器 {analysis_method}: {e}, 使用默认评估器")
-                    quality_score = self._evaluate_analysis_quality(analysis_result, df)
-            else:
-                quality_score = self._evaluate_analysis_quality(analysis_result, df)
+            # AI分析 - 直接理解原始数据
+            # 网络请求放入线程池，等待响应期间在当前线程计算交易方案
+            api_future = self._executor.submit(
+                self._request_analysis, prompt, formatted_data, model, analysis_method, api_analysis_type
+            )
             
             # 规划交易方案（演示版，基于EMA与近期结构，含费用与滑点）
-            last_close = float(used_df['close'].iloc[-1])
+            # 各列只取一次底层 ndarray，后续切片/归约不再经过 Series 索引
+            close_arr = used_df['close'].to_numpy(dtype=float)
+            high_arr = used_df['high'].to_numpy(dtype=float)
+            low_arr = used_df['low'].to_numpy(dtype=float)
+            last_close = float(close_arr[-1])
+            
+            # 标准化 measured move 基准（最近20根高低差），计划调整与输出共用
+            rng_low = float(low_arr[-20:].min())
+            rng_high = float(high_arr[-20:].max())
+            height = round_to_tick(abs(rng_high - rng_low), effective_tick)
+            basis = f"range {round_to_tick(rng_low, effective_tick)}–{round_to_tick(rng_high, effective_tick)}"
             side = 'long' if last_close >= ema20_val else 'short'
 
             # 初始参数（仅使用已闭合K线信息）
             entry_raw = round_to_tick(last_close, effective_tick)
             if side == 'long':
-                recent_low = float(used_df['low'].tail(5).min())
+                recent_low = float(low_arr[-5:].min())
                 stop_raw = round_to_tick(recent_low, effective_tick)
                 # 初始T1设为保守（较小奖励，触发自动优化）
                 t1_raw = round_to_tick(entry_raw + max(effective_tick, abs(entry_raw - stop_raw) * 0.8), effective_tick)
                 t2_raw = round_to_tick(entry_raw + abs(entry_raw - stop_raw) * 1.6, effective_tick)
             else:
-                recent_high = float(used_df['high'].tail(5).max())
+                recent_high = float(high_arr[-5:].max())
                 stop_raw = round_to_tick(recent_high, effective_tick)
                 t1_raw = round_to_tick(entry_raw - max(effective_tick, abs(entry_raw - stop_raw) * 0.8), effective_tick)
                 t2_raw = round_to_tick(entry_raw - abs(entry_raw - stop_raw) * 1.6, effective_tick)
@@ -241,10 +261,10 @@ class RawDataAnalyzer:
             if rr_initial < 1.5:
                 # 尝试(a) 结构内更紧止损
                 if side == 'long':
-                    candidate = round_to_tick(used_df['low'].tail(5).max() + effective_tick, effective_tick)
+                    candidate = round_to_tick(low_arr[-5:].max() + effective_tick, effective_tick)
                     stop_tight = min(candidate, entry_raw - effective_tick)
                 else:
-                    candidate = round_to_tick(used_df['high'].tail(5).min() - effective_tick, effective_tick)
+                    candidate = round_to_tick(high_arr[-5:].min() - effective_tick, effective_tick)
                     stop_tight = max(candidate, entry_raw + effective_tick)
 
                 rr_tight = rr_with_costs(
@@ -253,18 +273,11 @@ class RawDataAnalyzer:
                 )
                 rr_tight = round(rr_tight, 2)
 
-                # 预计算标准化 measured move（最近20根高低差）
-                recent = used_df.tail(20)
-                rng_low = float(recent['low'].min())
-                rng_high = float(recent['high'].max())
-                height = round_to_tick(abs(rng_high - rng_low), effective_tick)
-                basis = f"range {round_to_tick(rng_low, effective_tick)}–{round_to_tick(rng_high, effective_tick)}"
+                # 标准化 measured move 目标
                 if side == 'long':
                     mm_target = round_to_tick(entry_raw + height, effective_tick)
-                    formula = f"target = entry + height"
                 else:
                     mm_target = round_to_tick(entry_raw - height, effective_tick)
-                    formula = f"target = entry - height"
 
                 # 尝试(b) 下调T1至最近磁吸/测量移动
                 t1_lower = None
@@ -302,6 +315,43 @@ class RawDataAnalyzer:
                         'option': 'lower_t1'
                     }
 
+            try:
+                api_result = self._collect_analysis(
+                    api_future, prompt, formatted_data, model, analysis_type, analysis_method, api_analysis_type
+                )
+            except Exception:
+                # 离线/测试模式：提供最小可读分析文本，包含EMA引用
+                fallback = (
+                    f"Offline analysis summary: using {bars_analyzed} closed bars. "
+                    f"EMA20({timeframe}) magnet at {ema20_val}."
+                )
+                api_result = {'success': True, 'analysis': fallback}
+            
+            # 检查API调用是否成功；失败则切换离线回退
+            if not api_result.get('success'):
+                fallback = (
+                    f"Offline analysis summary: using {bars_analyzed} closed bars. "
+                    f"EMA20({timeframe}) magnet at {ema20_val}."
+                )
+                api_result = {'success': True, 'analysis': fallback}
+            
+            # 提取分析文本
+            analysis_result = api_result.get('analysis', '')
+            
+            # 计算时间和质量
+            analysis_time = time.time() - start_time
+            
+            # 评估分析质量 (基于验证成功的评估体系)
+            if analysis_method:
+                try:
+                    evaluator = self.prompt_manager.get_quality_evaluator(analysis_method)
+                    quality_score = evaluator(analysis_result, df)
+                except Exception as e:
+                    logger.warning(f"⚠️ 无法使用专用评估器 {analysis_method}: {e}, 使用默认评估器")
+                    quality_score = self._evaluate_analysis_quality(analysis_result, df)
+            else:
+                quality_score = self._evaluate_analysis_quality(analysis_result, df)
+            
             # 负索引信号（-1为最后一根已闭合K线）
             signals = [
                 {
@@ -352,11 +402,6 @@ class RawDataAnalyzer:
             ]
 
             # 标准化测量移动（用于输出与计划引用）
-            recent = used_df.tail(20)
-            rng_low = float(recent['low'].min())
-            rng_high = float(recent['high'].max())
-            height = round_to_tick(abs(rng_high - rng_low), effective_tick)
-            basis = f"range {round_to_tick(rng_low, effective_tick)}–{round_to_tick(rng_high, effective_tick)}"
             measured_moves = [
                 {
                     'basis': basis,
@@ -375,7 +420,8 @@ class RawDataAnalyzer:
                     'data_points': bars_analyzed
                 },
                 'model_info': {
-                    'model_used': model,
+                    'model_used': api_result.get('model', model),
+                    'hedge_won': api_result.get('hedge_won', False),
                     'analysis_type': analysis_type,
                     'data_format': 'csv_raw'
                 },
@@ -403,10 +449,10 @@ class RawDataAnalyzer:
                 'timeframes': timeframes_info,
                 'market_context': {
                     'current_price': round_to_tick(last_close, effective_tick),
-                    'price_change': float(((used_df['close'].iloc[-1] / used_df['close'].iloc[0]) - 1) * 100),
+                    'price_change': float(((close_arr[-1] / close_arr[0]) - 1) * 100),
                     'data_range': {
-                        'start': str(used_df['datetime'].iloc[0]),
-                        'end': str(used_df['datetime'].iloc[-1])
+                        'start': str(used_df['datetime'].iat[0]),
+                        'end': str(used_df['datetime'].iat[-1])
                     }
                 },
                 'success': True
@@ -424,12 +470,78 @@ class RawDataAnalyzer:
             
         except Exception as e:
             logger.error(f"❌ AI分析失败: {e}")
+            # 交易方案计算出错时AI请求可能仍在途：未开始则取消，已在执行则等它结束（响应写入缓存），不留孤儿请求
+            if api_future is not None and not api_future.cancel():
+                wait([api_future])
             return {
                 'error': str(e),
                 'success': False,
                 'analysis_time': time.time() - start_time
             }
     
+    def _request_analysis(self,
+                          prompt: str,
+                          formatted_data: str,
+                          model: str,
+                          analysis_method: Optional[str],
+                          api_analysis_type: str) -> Dict[str, Any]:
+        """调用AI模型（在线程池中执行）；mock 模型直接抛错以触发离线回退"""
+        if model == 'mock':
+            raise RuntimeError('offline-mock')
+        if analysis_method:
+            # 使用新的提示词管理系统
+            return self.client.generate_response(
+                prompt=prompt,
+                model_name=model
+            )
+        # 使用传统方法
+        return self.client.analyze_market_data(
+            data=formatted_data,
+            model_name=model,
+            analysis_type=api_analysis_type,
+            custom_prompt=prompt
+        )
+    
+    def _collect_analysis(self,
+                          api_future: Future,
+                          prompt: str,
+                          formatted_data: str,
+                          model: str,
+                          analysis_type: str,
+                          analysis_method: Optional[str],
+                          api_analysis_type: str) -> Dict[str, Any]:
+        """
+        等待AI响应；主模型超过对冲延迟仍未返回时，并发请求该分析类型的备用模型，取先成功者
+        
+        备用模型来自 Settings.ANALYSIS_MODES[analysis_type]['fallback_model']，
+        由 VALIDATION_CONFIG['enable_hedged_requests'] 开启（会产生额外的模型调用费用）
+        """
+        config = Settings.VALIDATION_CONFIG
+        fallback_model = Settings.ANALYSIS_MODES.get(analysis_type, {}).get('fallback_model')
+        if (not config.get('enable_hedged_requests', False) or model == 'mock'
+                or not fallback_model or fallback_model == model):
+            return api_future.result()
+        
+        hedge_delay = config.get('hedge_delay_ms', 1500) / 1000
+        if wait([api_future], timeout=hedge_delay).done:
+            return api_future.result()
+        
+        logger.info(f"⏱️ {model} 超过{hedge_delay:.1f}秒未响应，对冲请求备用模型 {fallback_model}")
+        hedge_future = self._hedge_executor.submit(
+            self._request_analysis, prompt, formatted_data, fallback_model, analysis_method, api_analysis_type
+        )
+        
+        # 取先成功的响应；两者都失败时返回主模型的结果（由调用方走离线回退）
+        pending = {api_future, hedge_future}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().get('success'):
+                    for loser in pending:
+                        loser.cancel()
+                    return dict(future.result(), hedge_won=future is hedge_future)
+        return api_future.result()
+    
     def analyze_raw_ohlcv_sync(self, 
                               df: pd.DataFrame,
                               model: str = 'gpt5-chat',
@@ -445,36 +557,7 @@ class RawDataAnalyzer:
         """
         构建分析提示词 (基于验证成功的原始测试套件提示词)
         """
-        base_prompt = """请分析以下ETH/USDT永续合约的原始K线数据，提供专业的VPA (Volume Price Analysis) 分析：
-
-请回答以下问题：
-1. **当前趋势方向是什么？**
-2. **最近的价格行为有什么特点？** 
-3. **成交量变化说明什么？**
-4. **有哪些关键支撑阻力位？**
-5. **给出简要的交易建议**
-
-请基于原始OHLCV数据进行分析，引用具体的价格数值和成交量数据来支持你的判断。"""
-
-        if analysis_type == 'complete':
-            base_prompt += """
-
-请特别关注：
-- Anna Coulling VSA理论应用
-- 量价关系的专业分析
-- 市场阶段识别 (Accumulation/Distribution/Markup/Markdown)
-- Smart Money vs Dumb Money 行为识别"""
-
-        elif analysis_type == 'enhanced':
-            base_prompt += """
-
-请提供增强分析：
-- 多时间框架视角
-- Wyckoff理论应用
-- 永续合约特有因素考虑
-- 具体的入场出场建议与风险控制"""
-
-        return base_prompt
+        return _ANALYSIS_PROMPTS.get(analysis_type, _BASE_ANALYSIS_PROMPT)
     
     def _evaluate_analysis_quality(self, analysis_text: str, df: pd.DataFrame) -> int:
         """
@@ -486,25 +569,10 @@ class RawDataAnalyzer:
         if any(str(round(price, 2)) in analysis_text for price in df['close'].values[-5:]):
             score += 20
         
-        # 2. 分析趋势 (20分)
-        trend_keywords = ['上涨', '下跌', '震荡', '趋势', 'trend', 'bullish', 'bearish']
-        if any(keyword in analysis_text for keyword in trend_keywords):
-            score += 20
-        
-        # 3. 成交量分析 (20分)
-        volume_keywords = ['成交量', '量', 'volume', '放量', '缩量']
-        if any(keyword in analysis_text for keyword in volume_keywords):
-            score += 20
-        
-        # 4. 技术位识别 (20分)
-        support_keywords = ['支撑', '阻力', '关键', '位置', 'support', 'resistance']
-        if any(keyword in analysis_text for keyword in support_keywords):
-            score += 20
-            
-        # 5. 交易建议 (20分)
-        trading_keywords = ['建议', '买入', '卖出', '做多', '做空', '交易', 'buy', 'sell']
-        if any(keyword in analysis_text for keyword in trading_keywords):
-            score += 20
+        # 2-5. 趋势 / 成交量 / 技术位 / 交易建议 (各20分)，命中任一关键词即得分
+        for keywords in _QUALITY_KEYWORD_GROUPS:
+            if any(keyword in analysis_text for keyword in keywords):
+                score += 20
         
         return score
     
@@ -5,22 +5,32 @@
 """
 
 import time
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Tuple
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
 from threading import Lock
+from types import MappingProxyType
 import queue
 import threading
 
+import numpy as np
+
 from .multi_timeframe_analyzer import MultiTimeframeAnalyzer, AnalysisScenario, MultiTimeframeResult
 from .analysis_context import AnalysisContext, ContextPriority
-from data.binance_websocket import BinanceWebSocketClient, StreamConfig, KlineData, ConnectionState
+from data.binance_websocket import BinanceWebSocketClient, StreamConfig, KlineData, ConnectionState, ANY_TIMEFRAME
 from data import BinanceFetcher
+from utils import slotted
 
 logger = logging.getLogger(__name__)
 
+# 时间框架优先级（越长越高），每个K线事件都会查询，提升为只读模块常量
+_TIMEFRAME_PRIORITIES = MappingProxyType({
+    '1m': 1, '5m': 2, '15m': 3, '30m': 4,
+    '1h': 5, '4h': 7, '1d': 9, '1w': 10
+})
+
 class AnalysisFrequency(Enum):
     """分析频率级别"""
     REALTIME = "realtime"      # 实时分析（每个K线完成）
@@ -50,9 +60,10 @@ class RealtimeConfig:
     volume_threshold: float = 2.0       # 成交量异常倍数
     max_analysis_per_hour: int = 20     # 每小时最大分析次数
 
+@slotted
 @dataclass
 class AnalysisEvent:
-    """分析事件"""
+    """分析事件（每根收盘K线构造一个，使用 __slots__ 去掉实例 __dict__）"""
     timestamp: datetime
     trigger_type: str           # 触发类型：kline_complete, volatility_spike, volume_surge, manual
     timeframe: str
@@ -67,7 +78,7 @@ class FrequencyAdaptor:
         self.config = config
         self.analysis_count = 0
         self.hour_start = datetime.now().hour
-        self.recent_analyses = []
+        self.recent_analyses: List[float] = []  # time.monotonic() 时间戳，不受系统时钟调整影响
         self._lock = Lock()
     
     def should_analyze(self, event: AnalysisEvent) -> bool:
@@ -95,28 +106,17 @@ class FrequencyAdaptor:
     
     def _check_base_frequency(self, event: AnalysisEvent) -> bool:
         """检查基础频率"""
-        now = datetime.now()
-        
         if self.config.base_frequency == AnalysisFrequency.REALTIME:
             return event.trigger_type == "kline_complete"
         elif self.config.base_frequency == AnalysisFrequency.HIGH:
             # 5分钟内最多一次分析
-            return not any(
-                (now - analysis_time).total_seconds() < 300 
-                for analysis_time in self.recent_analyses
-            )
+            return self._interval_elapsed(300)
         elif self.config.base_frequency == AnalysisFrequency.NORMAL:
             # 15分钟内最多一次分析
-            return not any(
-                (now - analysis_time).total_seconds() < 900 
-                for analysis_time in self.recent_analyses
-            )
+            return self._interval_elapsed(900)
         elif self.config.base_frequency == AnalysisFrequency.LOW:
             # 1小时内最多一次分析
-            return not any(
-                (now - analysis_time).total_seconds() < 3600 
-                for analysis_time in self.recent_analyses
-            )
+            return self._interval_elapsed(3600)
         else:
             return False
     
@@ -143,68 +143,90 @@ class FrequencyAdaptor:
             min_interval = 1800  # 30分钟
         
         # 检查是否满足时间间隔
-        now = datetime.now()
-        return not any(
-            (now - analysis_time).total_seconds() < min_interval 
-            for analysis_time in self.recent_analyses
-        )
+        return self._interval_elapsed(min_interval)
+    
+    def _interval_elapsed(self, min_interval: float) -> bool:
+        """距最近一次分析是否已过 min_interval 秒（recent_analyses 按时间顺序追加，只需检查最后一条）"""
+        return not self.recent_analyses or time.monotonic() - self.recent_analyses[-1] >= min_interval
     
     def record_analysis(self):
         """记录分析执行"""
         with self._lock:
-            now = datetime.now()
+            now = time.monotonic()
             self.recent_analyses.append(now)
             self.analysis_count += 1
             
             # 保持最近24小时的记录
-            cutoff = now - timedelta(hours=24)
+            cutoff = now - 86400
             self.recent_analyses = [t for t in self.recent_analyses if t > cutoff]
 
+class _KlineRing:
+    """
+    定长环形缓冲区（列式存储）：收盘价与成交量各占一个 ndarray
+    追加为 O(1) 覆盖写，不像 list.pop(0) 那样整体搬移，也不为每根K线创建字典
+    每个值同时写入 i 与 i+capacity 两处（镜像），最近 n 根总是一段连续切片，读取无需拷贝
+    """
+    __slots__ = ('close', 'volume', 'capacity', 'head', 'count')
+    
+    def __init__(self, capacity: int):
+        self.close = np.zeros(2 * capacity, dtype=np.float64)
+        self.volume = np.zeros(2 * capacity, dtype=np.float64)
+        self.capacity = capacity
+        self.head = 0   # 下一次写入位置
+        self.count = 0
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def push(self, close: float, volume: float):
+        i = self.head
+        j = i + self.capacity
+        self.close[i] = self.close[j] = close
+        self.volume[i] = self.volume[j] = volume
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+    
+    def tail(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """按时间顺序返回最近 n 根K线的 (收盘价, 成交量) 视图"""
+        n = min(n, self.count)
+        end = self.head + self.capacity
+        return self.close[end - n:end], self.volume[end - n:end]
+
 class MarketConditionDetector:
     """市场状况检测器"""
     
     def __init__(self):
-        self.price_history = []
-        self.volume_history = []
         self.max_history = 100
+        self.history = _KlineRing(self.max_history)
         self._lock = Lock()
     
     def update_data(self, kline: KlineData):
         """更新市场数据"""
         with self._lock:
-            self.price_history.append({
-                'timestamp': kline.close_time,
-                'price': kline.close_price,
-                'volume': kline.volume
-            })
-            
-            # 保持历史数据大小
-            if len(self.price_history) > self.max_history:
-                self.price_history.pop(0)
+            self.history.push(kline.close_price, kline.volume)
     
     def detect_condition(self, kline: KlineData) -> MarketCondition:
         """检测市场状况"""
-        if len(self.price_history) < 10:
+        if len(self.history) < 10:
             return MarketCondition.QUIET
             
         with self._lock:
-            recent_prices = [p['price'] for p in self.price_history[-20:]]
-            recent_volumes = [p['volume'] for p in self.price_history[-20:]]
+            recent_prices, recent_volumes = self.history.tail(20)
             
-            # 计算价格波动率
-            price_changes = [
-                abs(recent_prices[i] - recent_prices[i-1]) / recent_prices[i-1]
-                for i in range(1, len(recent_prices))
-            ]
-            avg_volatility = sum(price_changes) / len(price_changes) if price_changes else 0
+            # 计算价格波动率（窗口仅约20根，sum()/n 比 ndarray.mean() 的调度开销小）
+            price_changes = recent_prices[1:] - recent_prices[:-1]
+            np.abs(price_changes, out=price_changes)
+            price_changes /= recent_prices[:-1]
+            avg_volatility = float(price_changes.sum()) / len(price_changes) if len(price_changes) else 0
             
             # 计算成交量比率
-            avg_volume = sum(recent_volumes) / len(recent_volumes)
+            avg_volume = float(recent_volumes.sum()) / len(recent_volumes)
             current_volume_ratio = kline.volume / avg_volume if avg_volume > 0 else 1
             
             # 趋势检测（简化版）
             if len(recent_prices) >= 10:
-                trend_strength = self._calculate_trend_strength(recent_prices[-10:])
+                trend_strength = self._calculate_trend_strength(recent_prices[-10:].tolist())
             else:
                 trend_strength = 0
             
@@ -263,7 +285,10 @@ class RealtimeAnalysisEngine:
         # 核心组件
         self.multi_analyzer = MultiTimeframeAnalyzer(api_key)
         self.analysis_context = AnalysisContext()
+        # 共用同一个 BinanceFetcher：ccxt 实例持有 requests.Session（连接保活）与已加载的市场信息，
+        # 避免分析器再创建第二个实例重复 load_markets 和 TLS 握手
         self.fetcher = BinanceFetcher()
+        self.multi_analyzer.fetcher = self.fetcher
         
         # WebSocket客户端
         ws_config = StreamConfig(
@@ -312,8 +337,9 @@ class RealtimeAnalysisEngine:
             """K线完成回调"""
             try:
                 # 更新市场状况检测器
-                self.condition_detector.update_data(kline)
-                market_condition = self.condition_detector.detect_condition(kline)
+                detector = self.condition_detector
+                detector.update_data(kline)
+                market_condition = detector.detect_condition(kline)
                 
                 # 创建分析事件
                 event = AnalysisEvent(
@@ -327,7 +353,7 @@ class RealtimeAnalysisEngine:
                 
                 # 检查是否需要分析
                 if self.frequency_adaptor.should_analyze(event):
-                    logger.info(f"📊 触发分析事件: {kline.symbol} {kline.timeframe} - {market_condition.value}")
+                    logger.info("📊 触发分析事件: %s %s - %s", kline.symbol, kline.timeframe, market_condition.value)
                     self.analysis_queue.put(event)
                     
             except Exception as e:
@@ -353,9 +379,8 @@ class RealtimeAnalysisEngine:
                     priority=ContextPriority.HIGH
                 )
         
-        # 为所有监控的时间框架添加回调
-        for timeframe in self.config.timeframes:
-            self.ws_client.add_kline_callback(timeframe, on_kline_complete)
+        # 所有监控的时间框架共用同一处理函数（按 kline.timeframe 区分），注册一次通配回调
+        self.ws_client.add_kline_callback(ANY_TIMEFRAME, on_kline_complete)
         
         self.ws_client.add_connection_callback(on_connection_state_change)
     
@@ -372,11 +397,7 @@ class RealtimeAnalysisEngine:
             priority -= 2
         
         # 基于时间框架调整优先级（更长的时间框架优先级更高）
-        timeframe_priorities = {
-            '1m': 1, '5m': 2, '15m': 3, '30m': 4,
-            '1h': 5, '4h': 7, '1d': 9, '1w': 10
-        }
-        tf_priority = timeframe_priorities.get(kline.timeframe, 5)
+        tf_priority = _TIMEFRAME_PRIORITIES.get(kline.timeframe, 5)
         priority = max(1, min(10, priority + (tf_priority - 5)))
         
         return priority
@@ -431,7 +452,7 @@ class RealtimeAnalysisEngine:
     
     def _execute_analysis(self, event: AnalysisEvent):
         """执行分析任务"""
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
             logger.info(f"🔍 执行分析: {self.config.symbol} - 触发类型: {event.trigger_type}")
@@ -476,7 +497,7 @@ class RealtimeAnalysisEngine:
                 # 通知回调函数
                 self._notify_analysis_callbacks(result)
                 
-                logger.info(f"✅ 实时分析完成 - 信号: {result.overall_signal}, 耗时: {time.time() - start_time:.2f}秒")
+                logger.info(f"✅ 实时分析完成 - 信号: {result.overall_signal}, 耗时: {time.monotonic() - start_time:.2f}秒")
             else:
                 self.stats['failed_analyses'] += 1
                 logger.error(f"❌ 分析失败 - 错误: {result.risk_warnings}")
@@ -522,17 +543,18 @@ class RealtimeAnalysisEngine:
             return self.latest_results.get(self.config.symbol)
     
     def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        stats = dict(self.stats)
+        """获取统计信息（一次性构造结果字典，不先复制再逐键追加）"""
+        stats = self.stats
+        total = stats['total_analyses']
+        snapshot = {
+            **stats,
+            'success_rate': stats['successful_analyses'] / total if total > 0 else 0,
+            'is_running': self.is_running,
+            'queue_size': self.analysis_queue.qsize(),
+        }
         if stats['start_time']:
-            stats['running_time'] = (datetime.now() - stats['start_time']).total_seconds()
-        stats['success_rate'] = (
-            stats['successful_analyses'] / stats['total_analyses'] 
-            if stats['total_analyses'] > 0 else 0
-        )
-        stats['is_running'] = self.is_running
-        stats['queue_size'] = self.analysis_queue.qsize()
-        return stats
+            snapshot['running_time'] = (datetime.now() - stats['start_time']).total_seconds()
+        return snapshot
     
     def add_analysis_callback(self, callback: Callable[[MultiTimeframeResult], None]):
         """添加分析结果回调"""
@@ -559,7 +581,7 @@ class RealtimeAnalysisEngine:
                 logger.error(f"❌ 错误回调执行失败: {e}")
     
     async def stop(self):
-        """停止实时分析"""
+        """停止实时分析，并释放分析线程池与历史数据库连接（停止后不可再次启动）"""
         if not self.is_running:
             return
             
@@ -574,6 +596,10 @@ class RealtimeAnalysisEngine:
         # 等待队列清空
         self.analysis_queue.join()
         
+        # 关闭分析器线程池；写入缓冲中的上下文事件并关闭数据库连接
+        self.multi_analyzer.close()
+        self.analysis_context.close()
+        
         logger.info("✅ 实时分析引擎已停止")
     
     def __del__(self):
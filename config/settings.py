@@ -17,6 +17,23 @@ class Settings:
         'grok4': 'x-ai/grok-4',                              # Grok 4
     }
     
+    # 超时/限流(408/429)时的降级链：按顺序改派，链末端模型重试一次
+    TIMEOUT_FALLBACK_CHAINS = {
+        'claude-opus-41': ['gpt5-chat', 'grok4'],
+        'gemini-25-pro': ['gpt5-chat', 'grok4'],
+        'gpt5-chat': ['grok4'],
+        'grok4': [],
+    }
+    
+    # 各模型请求速率上限（异步批量请求发出前主动限流，按账户实际额度调整）
+    # rpm: 每分钟请求数, tpm: 每分钟输入token数
+    MODEL_RATE_LIMITS = {
+        'gpt5-chat': {'rpm': 60, 'tpm': 1000000},
+        'claude-opus-41': {'rpm': 50, 'tpm': 400000},
+        'gemini-25-pro': {'rpm': 60, 'tpm': 2000000},
+        'grok4': {'rpm': 60, 'tpm': 1000000},
+    }
+    
     # Binance API (optional)
     BINANCE_API_KEY = os.getenv('BINANCE_API_KEY')
     BINANCE_SECRET_KEY = os.getenv('BINANCE_SECRET_KEY')
@@ -47,6 +64,8 @@ class Settings:
         # 性能控制
         'enable_optimization': True,     # 启用性能优化
         'timeout_per_request': 60,       # 单个请求超时时间(秒)
+        'enable_hedged_requests': False, # 主模型迟迟未返回时并发请求备用模型
+        'hedge_delay_ms': 1500,          # 发出对冲请求前的等待时间(毫秒)
         
         # 质量控制
         'minimum_models_for_consensus': 2, # 最少模型数量
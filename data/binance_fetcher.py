@@ -1,13 +1,21 @@
 import ccxt
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 import time
-from typing import Optional, List, Dict, Any
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# K线磁盘缓存目录（项目根目录下，与启动目录无关）：每个 交易对/周期 一个CSV文件，重启后只补拉缺失的K线
+OHLCV_CACHE_DIR = Path(__file__).resolve().parent.parent / '.cache' / 'ohlcv'
+
+# 交易所原始K线列，缓存文件只保存这些列（timestamp 为毫秒）
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
 class BinanceFetcher:
     """
     Binance永续合约数据获取器
@@ -66,16 +74,10 @@ class BinanceFetcher:
                     since=since
                     )
                 
-                # 转换为DataFrame
-                df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                df = self._ohlcv_frame(pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS))
                 
-                # 转换时间戳
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-                df['datetime'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S UTC')
-                
-                # 确保数值类型
-                numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-                df[numeric_columns] = df[numeric_columns].astype(float)
+                for issue in self.validate_ohlcv(df):
+                    logger.warning(f"⚠️ K线数据异常: {issue}")
                 
                 logger.info(f"成功获取 {len(df)} 条数据")
                 logger.info(f"时间范围: {df['datetime'].iloc[0]} 至 {df['datetime'].iloc[-1]}")
@@ -95,6 +97,130 @@ class BinanceFetcher:
         # 理论上不应该到达这里，但为了类型检查器
         raise RuntimeError("获取数据失败：超出最大重试次数")
     
+    @staticmethod
+    def _ohlcv_frame(raw: pd.DataFrame) -> pd.DataFrame:
+        """由原始K线（毫秒时间戳 + OHLCV）构造 get_ohlcv 的标准格式"""
+        df = raw[OHLCV_COLUMNS].copy()
+        
+        # 转换时间戳
+        df['timestamp'] = pd.to_datetime(df['timestamp'].astype('int64'), unit='ms', utc=True)
+        df['datetime'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+        
+        # 确保数值类型
+        numeric_columns = ['open', 'high', 'low', 'close', 'volume']
+        df[numeric_columns] = df[numeric_columns].astype(float)
+        return df
+    
+    @staticmethod
+    def _read_ohlcv_cache(path: Path) -> Optional[pd.DataFrame]:
+        """读取K线缓存；文件不存在、损坏或列不符时返回 None"""
+        try:
+            raw = pd.read_csv(path)
+            if list(raw.columns) != OHLCV_COLUMNS:
+                raise ValueError(f"列不符: {list(raw.columns)}")
+            return BinanceFetcher._ohlcv_frame(raw)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"K线缓存损坏，忽略并完整获取: {path.name} ({e})")
+            return None
+    
+    @staticmethod
+    def _write_ohlcv_cache(path: Path, df: pd.DataFrame):
+        """原子写入K线缓存（先写临时文件再替换）"""
+        raw = df[OHLCV_COLUMNS].copy()
+        raw['timestamp'] = (raw['timestamp'] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            raw.to_csv(tmp_path, index=False)
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"写入K线缓存失败: {e}")
+    
+    @staticmethod
+    def validate_ohlcv(df: pd.DataFrame) -> List[str]:
+        """
+        OHLCV合理性检查（整列向量化，一次遍历全部K线）
+        
+        检查项：价格/成交量为有限值、high 不低于 open/close/low、low 不高于 open/close/high、
+        成交量非负、时间戳严格递增（无重复、无乱序）
+        
+        Returns:
+            问题描述列表，空列表表示通过
+        """
+        if len(df) == 0:
+            return []
+        
+        issues = []
+        o, h, l, c, v = (df[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close', 'volume'))
+        
+        non_finite = ~(np.isfinite(o) & np.isfinite(h) & np.isfinite(l) & np.isfinite(c) & np.isfinite(v))
+        inconsistent = (h < np.maximum(np.maximum(o, c), l)) | (l > np.minimum(np.minimum(o, c), h)) | (v < 0)
+        bad = np.flatnonzero(non_finite | inconsistent)
+        if len(bad):
+            issues.append(f"{len(bad)}根K线OHLCV不合理 (行: {bad[:5].tolist()})")
+        
+        timestamps = df['timestamp']
+        if not (timestamps.is_monotonic_increasing and timestamps.is_unique):
+            issues.append("时间戳未严格递增（存在重复或乱序K线）")
+        
+        return issues
+    
+    def get_ohlcv_incremental(self, symbol: str = 'ETH/USDT', timeframe: str = '1h',
+                              limit: int = 50) -> pd.DataFrame:
+        """
+        带磁盘缓存的增量OHLCV获取
+        
+        以上次保存的K线为基线，从其最后一根（可能尚未收盘，需要刷新）开始补拉；
+        缓存不足 limit 根、或缺口一次请求补不齐时退回完整获取
+        
+        Returns:
+            与 get_ohlcv 相同格式的最近 limit 根K线
+        """
+        path = OHLCV_CACHE_DIR / f"{symbol.replace('/', '')}_{timeframe}.csv"
+        cached = self._read_ohlcv_cache(path)
+        
+        if cached is not None and len(cached) >= limit:
+            since = int(cached['timestamp'].iat[-1].timestamp() * 1000)
+            fresh = self.get_ohlcv(symbol, timeframe, limit, since=since)
+            if len(fresh) == 0:
+                df = cached
+            elif len(fresh) < limit:
+                df = pd.concat([cached[cached['timestamp'] < fresh['timestamp'].iat[0]], fresh],
+                               ignore_index=True)
+            else:
+                # 缺口不少于 limit 根，增量结果可能仍未到达最新K线
+                df = self.get_ohlcv(symbol, timeframe, limit)
+        else:
+            df = self.get_ohlcv(symbol, timeframe, limit)
+        
+        df = df.tail(limit).reset_index(drop=True)
+        if self.validate_ohlcv(df):
+            # 拼接结果不连续（重复/乱序K线等），不信任缓存，重新完整获取
+            df = self.get_ohlcv(symbol, timeframe, limit)
+        self._write_ohlcv_cache(path, df)
+        return df
+    
+    def get_latest_ohlcv_row(self, symbol: str = 'ETH/USDT', timeframe: str = '1h') -> Tuple[int, float, float, float, float, float]:
+        """
+        获取最新一根K线的原始数值
+
+        只需要最后一根K线时直接读取交易所返回的列表，不构造DataFrame
+
+        Returns:
+            (timestamp毫秒, open, high, low, close, volume)
+        """
+        try:
+            ohlcv = self.exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, limit=1)
+            if not ohlcv:
+                raise ValueError(f"{symbol} {timeframe} 未返回K线数据")
+            ts, o, h, l, c, v = ohlcv[-1][:6]
+            return int(ts), float(o), float(h), float(l), float(c), float(v)
+        except Exception as e:
+            logger.error(f"获取最新K线失败: {e}")
+            raise
+
     def get_latest_price(self, symbol: str = 'ETH/USDT') -> Dict[str, Any]:
         """获取最新价格信息"""
         try:
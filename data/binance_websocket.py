@@ -14,15 +14,20 @@ import asyncio
 import websockets
 import json
 import logging
+import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Callable, Any, Union, Awaitable
+from typing import Dict, List, Optional, Callable, Any, Union, Awaitable, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
-import time
 import traceback
 
+from utils import slotted
+
 logger = logging.getLogger(__name__)
 
+# add_kline_callback 的通配时间框架：回调接收所有已订阅时间框架的K线
+ANY_TIMEFRAME = '*'
+
 class ConnectionState(Enum):
     """WebSocket连接状态"""
     DISCONNECTED = "disconnected"
@@ -31,9 +36,10 @@ class ConnectionState(Enum):
     RECONNECTING = "reconnecting"
     CLOSED = "closed"
 
+@slotted
 @dataclass
 class KlineData:
-    """K线数据结构"""
+    """K线数据结构（每条WebSocket推送都会构造一个实例，使用 __slots__ 去掉实例 __dict__）"""
     symbol: str
     timeframe: str
     open_time: datetime
@@ -101,9 +107,16 @@ class BinanceWebSocketClient:
         
         # 回调函数 - 支持同步和异步回调
         self.kline_callbacks: Dict[str, List[Union[Callable[[KlineData], None], Callable[[KlineData], Awaitable[None]]]]] = {}
+        # 注册时即判定是否为协程函数，分发时不再逐次 iscoroutinefunction 检查：timeframe -> [(callback, is_async)]
+        self._kline_dispatch: Dict[str, List[Tuple[Callable[[KlineData], Any], bool]]] = {}
+        # 以 ANY_TIMEFRAME 注册的回调：所有已订阅时间框架共用，分发时不做按时间框架查找
+        self._any_kline_dispatch: List[Tuple[Callable[[KlineData], Any], bool]] = []
         self.connection_callbacks: List[Union[Callable[[ConnectionState], None], Callable[[ConnectionState], Awaitable[None]]]] = []
         self.error_callbacks: List[Callable] = []
         
+        # 连接建立事件：wait_for_connection 等待它而不是轮询状态；首次等待时在事件循环内创建
+        self._connected_event: Optional[asyncio.Event] = None
+        
         # 连接管理
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 10
@@ -116,7 +129,7 @@ class BinanceWebSocketClient:
             'messages_received': 0,
             'klines_processed': 0,
             'reconnect_count': 0,
-            'last_message_time': None,
+            'last_message_time': None,     # 每条消息更新，存 time.time() 浮点数，get_stats 时再转为 datetime
             'connection_start_time': None
         }
         
@@ -125,10 +138,13 @@ class BinanceWebSocketClient:
         logger.info(f"💱 监控交易对: {self.config.symbol}")
     
     def add_kline_callback(self, timeframe: str, callback: Union[Callable[[KlineData], None], Callable[[KlineData], Awaitable[None]]]):
-        """添加K线数据回调函数"""
-        if timeframe not in self.kline_callbacks:
-            self.kline_callbacks[timeframe] = []
-        self.kline_callbacks[timeframe].append(callback)
+        """添加K线数据回调函数（timeframe 传 ANY_TIMEFRAME 则接收所有已订阅时间框架的K线）"""
+        self.kline_callbacks.setdefault(timeframe, []).append(callback)
+        entry = (callback, asyncio.iscoroutinefunction(callback))
+        if timeframe == ANY_TIMEFRAME:
+            self._any_kline_dispatch.append(entry)
+        else:
+            self._kline_dispatch.setdefault(timeframe, []).append(entry)
         logger.info(f"📋 添加K线回调: {timeframe}")
     
     def add_connection_callback(self, callback: Union[Callable[[ConnectionState], None], Callable[[ConnectionState], Awaitable[None]]]):
@@ -224,16 +240,17 @@ class BinanceWebSocketClient:
     async def _handle_message(self, message: str):
         """处理WebSocket消息"""
         try:
-            self.stats['messages_received'] += 1
-            self.stats['last_message_time'] = datetime.now()
+            # 每条推送都会经过这里，统计字典与解析结果先绑定到局部变量
+            stats = self.stats
+            stats['messages_received'] += 1
+            stats['last_message_time'] = time.time()
             
             data = json.loads(message)
             
             # 处理Kline数据
-            if 'stream' in data and 'data' in data:
-                stream_name = data['stream']
-                stream_data = data['data']
-                
+            stream_name = data.get('stream')
+            stream_data = data.get('data')
+            if stream_name is not None and stream_data is not None:
                 if '@kline_' in stream_name and stream_data.get('e') == 'kline':
                     await self._handle_kline_data(stream_data)
             
@@ -246,28 +263,38 @@ class BinanceWebSocketClient:
     async def _handle_kline_data(self, data: Dict[str, Any]):
         """处理K线数据"""
         try:
-            kline = KlineData.from_binance_data(data)
-            
             # 只处理已完成的K线 (关键：Al Brooks分析需要完整K线)
-            if kline.is_closed:
+            # 未收盘的推送占绝大多数，先看收盘标志，避免为其构造 KlineData（含两次时间戳转换）
+            if data['k']['x']:
+                kline = KlineData.from_binance_data(data)
                 self.stats['klines_processed'] += 1
                 
-                logger.info(f"📊 K线完成: {kline.timeframe} | "
-                          f"价格: {kline.close_price:.2f} | "
-                          f"成交量: {kline.volume:.0f} | "
-                          f"时间: {kline.close_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                # 每根收盘K线一条日志：级别关闭时连同 strftime 一起跳过
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("📊 K线完成: %s | 价格: %.2f | 成交量: %.0f | 时间: %s",
+                                kline.timeframe, kline.close_price, kline.volume,
+                                kline.close_time.strftime('%Y-%m-%d %H:%M:%S'))
+                
+                # 触发回调：先通配回调（无需查找），再对应时间框架的回调
+                # 按时间框架单次查找；未注册的时间框架落到空元组，不向字典插入新键
+                # 同步回调依次执行；异步回调并发调度，耗时取最慢者而非总和
+                dispatch = self._any_kline_dispatch
+                if self._kline_dispatch:
+                    dispatch = dispatch + self._kline_dispatch.get(kline.timeframe, [])
+                coroutines = []
+                for callback, is_async in dispatch:
+                    if is_async:
+                        coroutines.append(callback(kline))
+                        continue
+                    try:
+                        callback(kline)
+                    except Exception as e:
+                        logger.error(f"❌ K线回调执行错误: {e}")
                 
-                # 触发对应时间框架的回调
-                if kline.timeframe in self.kline_callbacks:
-                    for callback in self.kline_callbacks[kline.timeframe]:
-                        try:
-                            # 异步调用回调函数
-                            if asyncio.iscoroutinefunction(callback):
-                                await callback(kline)
-                            else:
-                                callback(kline)
-                        except Exception as e:
-                            logger.error(f"❌ K线回调执行错误: {e}")
+                if coroutines:
+                    for outcome in await asyncio.gather(*coroutines, return_exceptions=True):
+                        if isinstance(outcome, Exception):
+                            logger.error(f"❌ K线回调执行错误: {outcome}")
             
         except Exception as e:
             logger.error(f"❌ K线数据处理错误: {e}")
@@ -303,6 +330,12 @@ class BinanceWebSocketClient:
             
             logger.info(f"🔄 连接状态变更: {old_state.value} -> {state.value}")
             
+            if self._connected_event is not None:
+                if state == ConnectionState.CONNECTED:
+                    self._connected_event.set()
+                else:
+                    self._connected_event.clear()
+            
             # 触发连接状态回调
             for callback in self.connection_callbacks:
                 try:
@@ -323,28 +356,36 @@ class BinanceWebSocketClient:
                 logger.error(f"❌ 错误回调执行错误: {e}")
     
     def get_stats(self) -> Dict[str, Any]:
-        """获取连接统计信息"""
-        stats = self.stats.copy()
-        stats['connection_state'] = self.connection_state.value
-        stats['reconnect_attempts'] = self.reconnect_attempts
+        """获取连接统计信息（一次性构造结果字典，不先复制再逐键追加）"""
+        stats = self.stats
+        last_message_time = stats['last_message_time']
+        snapshot = {
+            **stats,
+            'last_message_time': datetime.fromtimestamp(last_message_time) if last_message_time is not None else None,
+            'connection_state': self.connection_state.value,
+            'reconnect_attempts': self.reconnect_attempts,
+        }
         
         if stats['connection_start_time']:
-            stats['uptime_seconds'] = (datetime.now() - stats['connection_start_time']).total_seconds()
+            snapshot['uptime_seconds'] = (datetime.now() - stats['connection_start_time']).total_seconds()
         
-        return stats
+        return snapshot
     
     def is_connected(self) -> bool:
         """检查是否已连接"""
         return self.connection_state == ConnectionState.CONNECTED
     
     async def wait_for_connection(self, timeout: float = 30.0) -> bool:
-        """等待连接建立"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.is_connected():
-                return True
-            await asyncio.sleep(0.1)
-        return False
+        """等待连接建立（由状态变更事件唤醒，不再每0.1秒轮询）"""
+        if self.is_connected():
+            return True
+        if self._connected_event is None:
+            self._connected_event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._connected_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.is_connected()
 
 # 使用示例和测试功能
 async def example_kline_handler(kline: KlineData):
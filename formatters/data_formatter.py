@@ -1,5 +1,8 @@
+import hashlib
 import pandas as pd
 import json
+from collections import OrderedDict
+from threading import Lock
 from typing import Dict, List, Any, Optional
 import numpy as np
 
@@ -8,6 +11,87 @@ class DataFormatter:
     数据格式化器，提供4种不同的LLM输入格式
     """
     
+    # format_cached 支持的格式类型 -> 格式化方法名
+    FORMAT_METHODS = {
+        'csv': 'to_csv_format',
+        'text': 'to_text_narrative',
+        'json': 'to_structured_json',
+        'pattern': 'to_pattern_description',
+    }
+    
+    def __init__(self, cache_size: int = 32):
+        """
+        Args:
+            cache_size: format_cached 的LRU缓存条目上限
+        """
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = Lock()
+    
+    def format_cached(self, df: pd.DataFrame, format_type: str = 'csv', **kwargs) -> str:
+        """
+        带LRU缓存的格式化入口
+        
+        以 (格式, 参数, 列名, 行数, 数据内容哈希) 作为缓存键：窗口内任一K线被修正都会换键，
+        同一窗口在多次分析中重复格式化时直接返回缓存结果
+        """
+        method = getattr(self, self.FORMAT_METHODS[format_type])
+        if len(df) == 0:
+            return method(df, **kwargs)
+        
+        key = (
+            format_type, tuple(sorted(kwargs.items())), tuple(df.columns), len(df),
+            # 逐行哈希按行序拼接后再摘要：行顺序不同的窗口得到不同的键
+            hashlib.blake2b(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).digest()
+        )
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        
+        formatted = method(df, **kwargs)
+        with self._cache_lock:
+            self._cache[key] = formatted
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return formatted
+    
+    @staticmethod
+    def _market_summary(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        一次性计算各格式共用的市场概况（首尾价格、区间高低、成交量统计）
+        直接在底层 ndarray 上归约，避免各格式重复扫描同一列
+        """
+        volume = df['volume'].to_numpy(dtype=float)
+        datetimes = df['datetime']
+        return {
+            'first_open': df['open'].iat[0],
+            'first_close': df['close'].iat[0],
+            'last_close': df['close'].iat[-1],
+            'high': df['high'].to_numpy().max(),
+            'low': df['low'].to_numpy().min(),
+            'volume_total': volume.sum(),
+            'volume_mean': volume.mean(),
+            'volume_max': volume.max(),
+            'volume_head_mean': volume[:10].mean(),
+            'volume_tail_mean': volume[-10:].mean(),
+            'start': datetimes.iat[0],
+            'end': datetimes.iat[-1],
+        }
+    
+    @staticmethod
+    def _datetime_strings(datetimes: pd.Series) -> np.ndarray:
+        """
+        整列一次性生成时间字符串，供逐行输出直接索引
+        获取器已输出字符串列时原样返回；datetime64 列按获取器的格式统一格式化
+        """
+        if pd.api.types.is_datetime64_any_dtype(datetimes):
+            if datetimes.dt.tz is not None:
+                return datetimes.dt.tz_convert('UTC').dt.strftime('%Y-%m-%d %H:%M:%S UTC').to_numpy()
+            return datetimes.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+        return datetimes.astype(str).to_numpy()
+    
     @staticmethod
     def to_csv_format(df: pd.DataFrame, include_volume: bool = True) -> str:
         """
@@ -19,21 +103,12 @@ class DataFormatter:
         if include_volume:
             columns.append('volume')
         
-        # 转换为CSV字符串
-        selected_df = df[columns].copy()
-        
-        # 格式化数值，减少小数位以节省token
-        numeric_cols = ['open', 'high', 'low', 'close']
+        selected_df = df[columns]
         if include_volume:
-            numeric_cols.append('volume')
-        
-        for col in numeric_cols:
-            if col == 'volume':
-                selected_df[col] = selected_df[col].astype(int)  # 成交量取整
-            else:
-                selected_df[col] = selected_df[col].round(2)  # 价格保留2位小数
+            selected_df = selected_df.astype({'volume': int})  # 成交量取整
         
-        return selected_df.to_csv(index=False, lineterminator='\\n')
+        # 价格保留2位小数：交由 pandas 的C实现CSV写出器格式化，不再先生成一份 round 后的副本
+        return selected_df.to_csv(index=False, float_format='%.2f', lineterminator='\n')
     
     @staticmethod
     def to_text_narrative(df: pd.DataFrame, window_size: int = 5) -> str:
@@ -41,19 +116,22 @@ class DataFormatter:
         格式B: 文本化描述格式
         将数值转化为自然语言描述
         """
-        lines = ["# ETH/USDT 永续合约市场分析数据\\n"]
+        lines = ["# ETH/USDT 永续合约市场分析数据\n"]
+        if df.empty:
+            return lines[0]  # 无K线时只输出标题，避免概况统计在空列上取首尾值
         
         # 市场概况
-        start_price = df['close'].iloc[0]
-        end_price = df['close'].iloc[-1]
-        high_price = df['high'].max()
-        low_price = df['low'].min()
-        total_volume = df['volume'].sum()
+        summary = DataFormatter._market_summary(df)
+        start_price = summary['first_close']
+        end_price = summary['last_close']
+        high_price = summary['high']
+        low_price = summary['low']
+        total_volume = summary['volume_total']
         
         change_pct = ((end_price / start_price) - 1) * 100
         
         lines.append(f"## 市场概况")
-        lines.append(f"时间范围: {df['datetime'].iloc[0]} 至 {df['datetime'].iloc[-1]}")
+        lines.append(f"时间范围: {summary['start']} 至 {summary['end']}")
         lines.append(f"价格变化: 从 ${start_price:.2f} 至 ${end_price:.2f} ({change_pct:+.2f}%)")
         lines.append(f"区间高低: ${high_price:.2f} / ${low_price:.2f}")
         lines.append(f"总成交量: {total_volume:,.0f}")
@@ -62,21 +140,21 @@ class DataFormatter:
         # 关键价格行为描述
         lines.append("## 关键价格行为")
         
-        for i in range(1, len(df)):
-            current = df.iloc[i]
-            previous = df.iloc[i-1]
-            
+        # 相邻K线两两配对，itertuples(name=None) 直接产出元组，省去逐行构造 Series
+        rows = list(df[['high', 'low', 'close', 'volume']].itertuples(index=False, name=None))
+        dt_strs = DataFormatter._datetime_strings(df['datetime'])
+        for (_, _, prev_close, prev_volume), (high, low, close, volume), dt in zip(rows, rows[1:], dt_strs[1:]):
             # 价格变化
-            price_change = current['close'] - previous['close']
-            price_change_pct = (price_change / previous['close']) * 100
+            price_change = close - prev_close
+            price_change_pct = (price_change / prev_close) * 100
             
             # 成交量变化
-            volume_change = current['volume'] - previous['volume']
-            volume_change_pct = (volume_change / previous['volume']) * 100 if previous['volume'] > 0 else 0
+            volume_change = volume - prev_volume
+            volume_change_pct = (volume_change / prev_volume) * 100 if prev_volume > 0 else 0
             
             # 波动幅度
-            range_size = current['high'] - current['low']
-            range_pct = (range_size / current['low']) * 100 if current['low'] > 0 else 0
+            range_size = high - low
+            range_pct = (range_size / low) * 100 if low > 0 else 0
             
             # 生成描述
             direction = "上涨" if price_change > 0 else "下跌" if price_change < 0 else "平盘"
@@ -85,9 +163,9 @@ class DataFormatter:
             volume_desc = "成交量激增" if volume_change_pct > 50 else "成交量增加" if volume_change_pct > 20 else "成交量萎缩" if volume_change_pct < -20 else "成交量平稳"
             
             if abs(price_change_pct) > 0.5 or abs(volume_change_pct) > 30:  # 只描述重要的变化
-                lines.append(f"{current['datetime']}: {intensity}{direction} {price_change_pct:+.2f}%, {volume_desc} {volume_change_pct:+.1f}%, 波幅 {range_pct:.2f}%")
+                lines.append(f"{dt}: {intensity}{direction} {price_change_pct:+.2f}%, {volume_desc} {volume_change_pct:+.1f}%, 波幅 {range_pct:.2f}%")
         
-        return "\\n".join(lines)
+        return "\n".join(lines)
     
     @staticmethod 
     def to_structured_json(df: pd.DataFrame, include_analysis: bool = True) -> str:
@@ -95,7 +173,13 @@ class DataFormatter:
         格式C: 结构化JSON + 关键指标预计算
         包含原始数据和预处理分析
         """
+        if df.empty:
+            return json.dumps({"metadata": {"symbol": "ETH/USDT", "contract_type": "perpetual",
+                                            "timeframe": "1h", "total_bars": 0}},
+                              indent=2, ensure_ascii=False)
+        
         # 基础数据结构
+        summary = DataFormatter._market_summary(df)
         data = {
             "metadata": {
                 "symbol": "ETH/USDT",
@@ -103,67 +187,87 @@ class DataFormatter:
                 "timeframe": "1h",
                 "total_bars": len(df),
                 "time_range": {
-                    "start": str(df['datetime'].iloc[0]),
-                    "end": str(df['datetime'].iloc[-1])
+                    "start": str(summary['start']),
+                    "end": str(summary['end'])
                 }
             },
             "market_summary": {
                 "price_action": {
-                    "open": float(df['open'].iloc[0]),
-                    "close": float(df['close'].iloc[-1]),
-                    "high": float(df['high'].max()),
-                    "low": float(df['low'].min()),
-                    "change_percent": float(((df['close'].iloc[-1] / df['open'].iloc[0]) - 1) * 100)
+                    "open": float(summary['first_open']),
+                    "close": float(summary['last_close']),
+                    "high": float(summary['high']),
+                    "low": float(summary['low']),
+                    "change_percent": float(((summary['last_close'] / summary['first_open']) - 1) * 100)
                 },
                 "volume_profile": {
-                    "total_volume": float(df['volume'].sum()),
-                    "average_volume": float(df['volume'].mean()),
-                    "max_volume_bar": float(df['volume'].max()),
-                    "volume_trend": "increasing" if df['volume'].tail(10).mean() > df['volume'].head(10).mean() else "decreasing"
+                    "total_volume": float(summary['volume_total']),
+                    "average_volume": float(summary['volume_mean']),
+                    "max_volume_bar": float(summary['volume_max']),
+                    "volume_trend": "increasing" if summary['volume_tail_mean'] > summary['volume_head_mean'] else "decreasing"
                 }
             },
             "candlestick_data": []
         }
         
-        # 添加蜡烛图数据
-        for _, row in df.iterrows():
-            candle = {
-                "timestamp": str(row['datetime']),
-                "ohlcv": {
-                    "open": float(row['open']),
-                    "high": float(row['high']),
-                    "low": float(row['low']),
-                    "close": float(row['close']),
-                    "volume": float(row['volume'])
+        # 添加蜡烛图数据（按列向量化计算衍生字段，避免逐行 iterrows 装箱）
+        open_arr = df['open'].to_numpy(dtype=float)
+        high_arr = df['high'].to_numpy(dtype=float)
+        low_arr = df['low'].to_numpy(dtype=float)
+        close_arr = df['close'].to_numpy(dtype=float)
+        volume_arr = df['volume'].to_numpy(dtype=float)
+        
+        total_range = high_arr - low_arr
+        body_size = np.abs(close_arr - open_arr)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            body_size_percent = np.where(total_range > 0, body_size / total_range * 100, 0.0)
+        candle_type = np.where(close_arr > open_arr, "bullish",
+                               np.where(close_arr < open_arr, "bearish", "doji"))
+        upper_shadow = high_arr - np.maximum(open_arr, close_arr)
+        lower_shadow = np.minimum(open_arr, close_arr) - low_arr
+        
+        data["candlestick_data"] = [
+            {
+                "timestamp": ts,
+                "ohlcv": {"open": o, "high": h, "low": l, "close": c, "volume": v},
+                "analysis": {
+                    "candle_type": ctype,
+                    "body_size_percent": body_pct,
+                    "upper_shadow": upper,
+                    "lower_shadow": lower
                 }
             }
+            for ts, o, h, l, c, v, ctype, body_pct, upper, lower in zip(
+                DataFormatter._datetime_strings(df['datetime']).tolist(),
+                open_arr.tolist(), high_arr.tolist(), low_arr.tolist(),
+                close_arr.tolist(), volume_arr.tolist(),
+                candle_type.tolist(), body_size_percent.tolist(),
+                upper_shadow.tolist(), lower_shadow.tolist()
+            )
+        ]
+        
+        # 添加技术指标（如果数据中存在）：列存在性只检查一次
+        if include_analysis:
+            columns = set(df.columns)
+            indicators = {}
             
-            # 添加计算字段
-            body_size = abs(row['close'] - row['open'])
-            total_range = row['high'] - row['low']
+            if 'rsi' in columns:
+                rsi = df['rsi'].to_numpy(dtype=float)
+                indicators.update({
+                    "rsi_current": None if np.isnan(rsi[-1]) else float(rsi[-1]),
+                    "rsi_overbought": int((rsi > 70).sum()),
+                    "rsi_oversold": int((rsi < 30).sum())
+                })
             
-            candle["analysis"] = {
-                "candle_type": "bullish" if row['close'] > row['open'] else "bearish" if row['close'] < row['open'] else "doji",
-                "body_size_percent": float((body_size / total_range * 100) if total_range > 0 else 0),
-                "upper_shadow": float(row['high'] - max(row['open'], row['close'])),
-                "lower_shadow": float(min(row['open'], row['close']) - row['low'])
-            }
+            if 'macd' in columns:
+                macd_current = float(df['macd'].iat[-1])
+                macd_signal = float(df['macd_signal'].iat[-1]) if 'macd_signal' in columns else float('nan')
+                indicators["macd"] = {
+                    "current": None if np.isnan(macd_current) else macd_current,
+                    "signal": None if np.isnan(macd_signal) else macd_signal
+                }
             
-            data["candlestick_data"].append(candle)
-        
-        # 添加技术指标（如果数据中存在）
-        if include_analysis and 'rsi' in df.columns:
-            data["technical_indicators"] = {
-                "rsi_current": float(df['rsi'].iloc[-1]) if not pd.isna(df['rsi'].iloc[-1]) else None,
-                "rsi_overbought": (df['rsi'] > 70).sum(),
-                "rsi_oversold": (df['rsi'] < 30).sum()
-            }
-        
-        if include_analysis and 'macd' in df.columns:
-            data["technical_indicators"]["macd"] = {
-                "current": float(df['macd'].iloc[-1]) if not pd.isna(df['macd'].iloc[-1]) else None,
-                "signal": float(df['macd_signal'].iloc[-1]) if 'macd_signal' in df.columns and not pd.isna(df['macd_signal'].iloc[-1]) else None
-            }
+            if indicators:
+                data["technical_indicators"] = indicators
         
         return json.dumps(data, indent=2, ensure_ascii=False)
     
@@ -179,16 +283,19 @@ class DataFormatter:
             include_vsa: 是否包含价格行为分析
             include_perpetual_context: 是否包含永续合约背景
         """
-        lines = ["# ETH/USDT 永续合约Al Brooks价格行为分析\\n"]
+        lines = ["# ETH/USDT 永续合约Al Brooks价格行为分析\n"]
+        if df.empty:
+            return lines[0]
         
         # 市场概况
         lines.append("## 🎯 市场概况")
-        start_price = df['close'].iloc[0]
-        end_price = df['close'].iloc[-1]
-        high_price = df['high'].max()
-        low_price = df['low'].min()
-        total_volume = df['volume'].sum()
-        avg_volume = df['volume'].mean()
+        summary = DataFormatter._market_summary(df)
+        start_price = summary['first_close']
+        end_price = summary['last_close']
+        high_price = summary['high']
+        low_price = summary['low']
+        total_volume = summary['volume_total']
+        avg_volume = summary['volume_mean']
         
         price_change = (end_price - start_price) / start_price * 100
         lines.append(f"- 价格区间: {low_price:.2f} - {high_price:.2f} USDT")
@@ -220,7 +327,7 @@ class DataFormatter:
         lines.append("- **Markdown(下跌)**: 价格下降阶段，关注Volume Climax")
         lines.append("")
         
-        return "\\n".join(lines)
+        return "\n".join(lines)
     
     @staticmethod
     def _format_vsa_analysis(df: pd.DataFrame) -> List[str]:
@@ -232,15 +339,23 @@ class DataFormatter:
         recent_bars = df.tail(10)
         vsa_highlights = []
         
-        for i, (_, row) in enumerate(recent_bars.iterrows()):
+        # 循环不变量提前计算：价差分位数与成交量数组
+        # 两个分位数一次求出（只排序一次），nanquantile 与 Series.quantile 一样跳过 NaN
+        recent_spreads = recent_bars['high'].to_numpy(dtype=float) - recent_bars['low'].to_numpy(dtype=float)
+        wide_spread_threshold, narrow_spread_threshold = np.nanquantile(recent_spreads, (0.7, 0.3)).tolist()
+        volumes = recent_bars['volume'].to_numpy(dtype=float)
+        dt_strs = DataFormatter._datetime_strings(recent_bars['datetime'])
+        
+        # itertuples 返回命名元组，避免 iterrows 为每行构造 Series
+        for i, row in enumerate(recent_bars.itertuples(index=False)):
             bar_analysis = []
             
             # 计算VSA指标
-            open_price = row['open']
-            high_price = row['high'] 
-            low_price = row['low']
-            close_price = row['close']
-            volume = row['volume']
+            open_price = row.open
+            high_price = row.high
+            low_price = row.low
+            close_price = row.close
+            volume = row.volume
             
             spread = high_price - low_price
             body_size = abs(close_price - open_price)
@@ -248,24 +363,24 @@ class DataFormatter:
             
             # Volume比较 (与平均值)
             if i >= 5:  # 有足够历史数据
-                recent_avg_vol = recent_bars['volume'].iloc[max(0, i-5):i].mean()
+                recent_avg_vol = volumes[max(0, i-5):i].mean()
                 vol_ratio = volume / recent_avg_vol if recent_avg_vol > 0 else 1.0
             else:
                 vol_ratio = 1.0
             
             # VSA信号识别
-            datetime_str = row['datetime']
+            datetime_str = dt_strs[i]
             is_up = close_price > open_price
             
             # Wide Spread + High Volume
-            if spread > recent_bars['high'].subtract(recent_bars['low']).quantile(0.7) and vol_ratio > 1.5:
+            if spread > wide_spread_threshold and vol_ratio > 1.5:
                 if close_position > 0.7:
                     bar_analysis.append(f"✅ **{datetime_str}**: Wide Spread + 高量收高位 → Professional Buying")
                 elif close_position < 0.3:
                     bar_analysis.append(f"⚠️ **{datetime_str}**: Wide Spread + 高量收低位 → Selling Pressure")
             
             # Narrow Spread + Low Volume  
-            elif spread < recent_bars['high'].subtract(recent_bars['low']).quantile(0.3) and vol_ratio < 0.8:
+            elif spread < narrow_spread_threshold and vol_ratio < 0.8:
                 if is_up:
                     bar_analysis.append(f"🔴 **{datetime_str}**: No Demand → 上涨缺乏成交量支持")
                 else:
@@ -302,107 +417,99 @@ class DataFormatter:
     @staticmethod  
     def _identify_key_patterns(df: pd.DataFrame) -> List[str]:
         """识别关键K线形态"""
-        patterns_found = []
-        
-        for i in range(len(df)):
-            row = df.iloc[i]
-            patterns = []
-            
-            # 基础形态识别
-            open_price = row['open']
-            high_price = row['high']
-            low_price = row['low']
-            close_price = row['close']
-            volume = row['volume']
-            
-            body_size = abs(close_price - open_price)
-            upper_shadow = high_price - max(open_price, close_price)
-            lower_shadow = min(open_price, close_price) - low_price
-            total_range = high_price - low_price
-            
-            # 蜡烛线类型
-            if close_price > open_price:
-                candle_type = "阳线"
-            elif close_price < open_price:
-                candle_type = "阴线"
-            else:
-                candle_type = "十字线"
-            
-            # VPA相关形态识别 (结合成交量)
-            if total_range > 0:
-                body_ratio = body_size / total_range
-                upper_shadow_ratio = upper_shadow / total_range
-                lower_shadow_ratio = lower_shadow / total_range
-                
-                # 计算成交量比率 (与前10根平均比较)
-                if i >= 10:
-                    avg_volume = df['volume'].iloc[max(0, i-10):i].mean()
-                    vol_ratio = volume / avg_volume if avg_volume > 0 else 1.0
-                else:
-                    vol_ratio = 1.0
-                
-                # VPA关键形态识别
-                
-                # 1. Climax Bar (Volume Climax)
-                if vol_ratio > 2.0 and total_range > df['high'].subtract(df['low']).iloc[max(0, i-20):i].quantile(0.8):
-                    if close_price > open_price:
-                        patterns.append(f"📈 Buying Climax (量比{vol_ratio:.1f})")
-                    else:
-                        patterns.append(f"📉 Selling Climax (量比{vol_ratio:.1f})")
-                
-                # 2. No Demand (上涨但成交量低)
-                elif close_price > open_price and vol_ratio < 0.7 and body_ratio > 0.3:
-                    patterns.append("🔴 No Demand (无量上涨)")
-                
-                # 3. No Supply (下跌但成交量低)  
-                elif close_price < open_price and vol_ratio < 0.7 and body_ratio > 0.3:
-                    patterns.append("🟢 No Supply (无量下跌)")
-                
-                # 4. Upthrust (高位长上影大量)
-                elif (upper_shadow_ratio > 0.6 and vol_ratio > 1.5 and 
-                      close_price < (high_price + low_price) / 2):
-                    patterns.append("⚠️ Upthrust (高位假突破)")
-                
-                # 5. Spring (低位长下影后收回)  
-                elif (lower_shadow_ratio > 0.6 and vol_ratio > 1.2 and
-                      close_price > (high_price + low_price) / 2):
-                    patterns.append("✅ Spring (低位测试成功)")
-                
-                # 6. Wide Spread + Close Position分析
-                elif total_range > df['high'].subtract(df['low']).iloc[max(0, i-20):i].quantile(0.7):
-                    close_position = (close_price - low_price) / total_range
-                    if close_position > 0.8 and vol_ratio > 1.2:
-                        patterns.append("💪 Wide Spread收高位 (Professional Buying)")
-                    elif close_position < 0.2 and vol_ratio > 1.2:
-                        patterns.append("😰 Wide Spread收低位 (Selling Pressure)")
-                
-                # 7. Narrow Spread分析
-                elif total_range < df['high'].subtract(df['low']).iloc[max(0, i-20):i].quantile(0.3):
-                    if vol_ratio < 0.8:
-                        patterns.append("😴 Narrow Spread低量 (缺乏兴趣)")
-            
-            # 多根K线VPA组合形态
-            if i > 0:
-                prev_row = df.iloc[i-1]
-                prev_close = prev_row['close']
-                prev_volume = prev_row['volume']
-                
-                # Test Bar (测试前期低点/高点)
-                if abs(low_price - df['low'].iloc[max(0, i-20):i].min()) / low_price < 0.01:
-                    if vol_ratio < 0.8:
-                        patterns.append("🧪 Test (低量测试低点)")
-                
-                # Stopping Volume (阻止性成交量)
-                if (close_price > prev_close and vol_ratio > 2.0 and 
-                    body_ratio < 0.3):  # 高量但实体小
-                    patterns.append("🛑 Stopping Volume (阻止性成交量)")
-            
-            # 只记录有VPA意义的形态
-            if patterns:
-                datetime_str = row['datetime']
-                pattern_desc = f"**{datetime_str}**: {candle_type} - {', '.join(patterns)}"
-                pattern_desc += f" (价格:{close_price:.2f}, 量:{volume:,.0f})"
-                patterns_found.append(pattern_desc)
+        open_arr = df['open'].to_numpy(dtype=float)
+        high_arr = df['high'].to_numpy(dtype=float)
+        low_arr = df['low'].to_numpy(dtype=float)
+        close_arr = df['close'].to_numpy(dtype=float)
+        volume_arr = df['volume'].to_numpy(dtype=float)
+        datetimes = DataFormatter._datetime_strings(df['datetime'])
+        
+        # 逐K线的几何量与蜡烛线类型一次性向量化计算
+        candle_types = np.select([close_arr > open_arr, close_arr < open_arr], ["阳线", "阴线"], "十字线")
+        body_size = np.abs(close_arr - open_arr)
+        upper_shadow = high_arr - np.maximum(open_arr, close_arr)
+        lower_shadow = np.minimum(open_arr, close_arr) - low_arr
+        total_range = high_arr - low_arr
+        has_range = total_range > 0
+        safe_range = np.where(has_range, total_range, 1.0)
+        body_ratio = body_size / safe_range
+        upper_shadow_ratio = upper_shadow / safe_range
+        lower_shadow_ratio = lower_shadow / safe_range
+        close_position = (close_arr - low_arr) / safe_range
+        
+        # 前10根平均成交量 / 前20根振幅分位数与最低价（均不含当前K线）
+        volume_series = pd.Series(volume_arr)
+        avg_volume = volume_series.rolling(10).mean().shift(1).to_numpy()
+        vol_ratio = np.ones(len(df))
+        valid_volume = avg_volume > 0
+        vol_ratio[valid_volume] = volume_arr[valid_volume] / avg_volume[valid_volume]
+        
+        range_window = pd.Series(total_range).rolling(20, min_periods=1)
+        range_q80 = range_window.quantile(0.8).shift(1).to_numpy()
+        range_q70 = range_window.quantile(0.7).shift(1).to_numpy()
+        range_q30 = range_window.quantile(0.3).shift(1).to_numpy()
+        prior_low = pd.Series(low_arr).rolling(20, min_periods=1).min().shift(1).to_numpy()
+        
+        is_up = close_arr > open_arr
+        is_down = close_arr < open_arr
+        mid_price = (high_arr + low_arr) / 2
+        climax_tags = np.char.add(
+            np.char.add(np.where(is_up, "📈 Buying Climax (量比", "📉 Selling Climax (量比"),
+                        np.char.mod('%.1f', vol_ratio)),
+            ")"
+        )
+        wide_spread_tags = np.select(
+            [(close_position > 0.8) & (vol_ratio > 1.2), (close_position < 0.2) & (vol_ratio > 1.2)],
+            ["💪 Wide Spread收高位 (Professional Buying)", "😰 Wide Spread收低位 (Selling Pressure)"],
+            ""
+        )
+        narrow_spread_tags = np.where(vol_ratio < 0.8, "😴 Narrow Spread低量 (缺乏兴趣)", "")
+        
+        # VPA单K线形态：按优先级取第一个命中的条件（等价于逐行 if/elif 链）
+        vpa_tags = np.select(
+            [
+                has_range & (vol_ratio > 2.0) & (total_range > range_q80),                    # 1. Climax Bar
+                has_range & is_up & (vol_ratio < 0.7) & (body_ratio > 0.3),                   # 2. No Demand
+                has_range & is_down & (vol_ratio < 0.7) & (body_ratio > 0.3),                 # 3. No Supply
+                has_range & (upper_shadow_ratio > 0.6) & (vol_ratio > 1.5) & (close_arr < mid_price),  # 4. Upthrust
+                has_range & (lower_shadow_ratio > 0.6) & (vol_ratio > 1.2) & (close_arr > mid_price),  # 5. Spring
+                has_range & (total_range > range_q70),                                        # 6. Wide Spread
+                has_range & (total_range < range_q30),                                        # 7. Narrow Spread
+            ],
+            [
+                climax_tags,
+                "🔴 No Demand (无量上涨)",
+                "🟢 No Supply (无量下跌)",
+                "⚠️ Upthrust (高位假突破)",
+                "✅ Spring (低位测试成功)",
+                wide_spread_tags,
+                narrow_spread_tags,
+            ],
+            ""
+        )
+        
+        # 多根K线VPA组合形态（首根K线无前值）
+        has_prev = np.arange(len(df)) > 0
+        prev_close = np.concatenate(([np.nan], close_arr[:-1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            near_prior_low = np.abs(low_arr - prior_low) / low_arr < 0.01
+        test_tags = np.where(has_prev & near_prior_low & (vol_ratio < 0.8), ", 🧪 Test (低量测试低点)", "")
+        stopping_tags = np.where(
+            has_prev & (close_arr > prev_close) & (vol_ratio > 2.0) & (body_ratio < 0.3),  # 高量但实体小
+            ", 🛑 Stopping Volume (阻止性成交量)", ""
+        )
+        
+        # 整列拼接形态描述，只记录有VPA意义的K线
+        tags = pd.Series(vpa_tags).str.cat([pd.Series(test_tags), pd.Series(stopping_tags)]).str.lstrip(', ')
+        found = (tags != '').to_numpy()
+        
+        patterns_found = [
+            f"**{dt}**: {candle_type} - {desc} (价格:{close_price:.2f}, 量:{volume:,.0f})"
+            for dt, candle_type, desc, close_price, volume in zip(
+                datetimes[found], candle_types[found], tags.to_numpy()[found],
+                close_arr[found], volume_arr[found]
+            )
+        ]
         
         return patterns_found
     
@@ -411,24 +518,22 @@ class DataFormatter:
         """
         估算不同格式的token使用量
         """
-        formatter = DataFormatter()
-        
         estimates = {}
         
         # CSV格式
-        csv_data = formatter.to_csv_format(df)
+        csv_data = DataFormatter.to_csv_format(df)
         estimates['csv'] = len(csv_data.split()) + len(csv_data) // 4  # 粗略估算
         
         # 文本格式
-        text_data = formatter.to_text_narrative(df)
+        text_data = DataFormatter.to_text_narrative(df)
         estimates['text'] = len(text_data.split())
         
         # JSON格式
-        json_data = formatter.to_structured_json(df)
+        json_data = DataFormatter.to_structured_json(df)
         estimates['json'] = len(json_data.split()) + len(json_data) // 3  # JSON的token密度更高
         
         # 模式描述格式
-        pattern_data = formatter.to_pattern_description(df)
+        pattern_data = DataFormatter.to_pattern_description(df)
         estimates['pattern'] = len(pattern_data.split())
         
         return estimates
\ No newline at end of file
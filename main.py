@@ -47,7 +47,7 @@ def analyze(
     symbol: Annotated[str, typer.Option("--symbol", "-s", help="交易对符号")] = "ETHUSDT",
     timeframe: Annotated[str, typer.Option("--timeframe", "-t", help="时间周期")] = "1h", 
     limit: Annotated[int, typer.Option("--limit", "-l", help="K线数据数量")] = 120,
-    model: Annotated[str, typer.Option("--model", "-m", help="AI模型")] = "gpt5-chat",
+    model: Annotated[str, typer.Option("--model", "-m", help="AI模型（--no-raw 时可逗号分隔多个模型并发分析）")] = "gpt5-chat",
     analysis_type: Annotated[str, typer.Option("--analysis-type", "-a", help="分析类型")] = "complete",
     analysis_method: Annotated[Optional[str], typer.Option("--method", help="分析方法")] = None,
     raw_analysis: Annotated[bool, typer.Option("--raw", help="使用原始数据分析器")] = True,
@@ -72,6 +72,12 @@ def analyze(
     # 显示分析参数
     _show_analysis_params(symbol, timeframe, limit, model, analysis_type, analysis_method)
     
+    # 非原始数据分析时 --model 可用逗号分隔多个模型并发分析（重复的模型只请求一次，保持顺序）
+    models = list(dict.fromkeys(m.strip() for m in model.split(',') if m.strip())) or [model]
+    if raw_analysis and len(models) > 1:
+        console.print("❌ 多模型并发分析需配合 --no-raw 使用", style="red")
+        raise typer.Exit(1)
+    
     # 获取数据
     with Progress(
         SpinnerColumn(),
@@ -117,26 +123,34 @@ def analyze(
         try:
             # 选择分析器
             if raw_analysis:
-                analyzer = RawDataAnalyzer()
-                progress.update(task, advance=20, description="🔧 初始化原始数据分析器...")
-                
-                result = analyzer.analyze_raw_ohlcv(
-                    df=df,
-                    model=model,
-                    analysis_type=analysis_type,
-                    analysis_method=analysis_method
-                )
+                with RawDataAnalyzer() as analyzer:
+                    progress.update(task, advance=20, description="🔧 初始化原始数据分析器...")
+                    
+                    results = {model: analyzer.analyze_raw_ohlcv(
+                        df=df,
+                        model=model,
+                        analysis_type=analysis_type,
+                        analysis_method=analysis_method
+                    )}
                 progress.update(task, advance=70, description="📊 分析完成...")
                 
             else:
                 engine = AnalysisEngine()
                 progress.update(task, advance=20, description="🔧 初始化分析引擎...")
                 
-                result = engine.raw_data_analysis(
-                    df=df,
-                    analysis_type=analysis_type,
-                    model=model
-                )
+                if len(models) > 1:
+                    # 多个模型：同一份数据并发请求，总耗时约为最慢模型的响应时间
+                    results = engine.multi_model_analysis(
+                        df=df,
+                        models=models,
+                        analysis_type=analysis_type
+                    )
+                else:
+                    results = {model: engine.raw_data_analysis(
+                        df=df,
+                        analysis_type=analysis_type,
+                        model=model
+                    )}
                 progress.update(task, advance=70, description="📊 分析完成...")
             
             progress.update(task, advance=10, description="✅ 处理结果...")
@@ -146,7 +160,8 @@ def analyze(
             raise typer.Exit(1)
     
     # 显示分析结果
-    _show_analysis_results(result, symbol, model, analysis_method)
+    for result_model, result in results.items():
+        _show_analysis_results(result, symbol, result_model, analysis_method)
 
 
 @app.command()
@@ -341,18 +356,18 @@ def multi_analyze(
         task = progress.add_task("🔄 执行多时间周期分析...", total=100)
         
         try:
-            analyzer = MultiTimeframeAnalyzer()
-            progress.update(task, advance=20, description="🔧 初始化多时间周期分析器...")
-            
-            result = analyzer.analyze_multi_timeframe(
-                symbol=symbol,
-                model=model,
-                analysis_type=analysis_type,
-                analysis_method=analysis_method,
-                scenario=scenario_enum,
-                custom_timeframes=timeframe_list,
-                user_intent=user_intent
-            )
+            with MultiTimeframeAnalyzer() as analyzer:
+                progress.update(task, advance=20, description="🔧 初始化多时间周期分析器...")
+                
+                result = analyzer.analyze_multi_timeframe(
+                    symbol=symbol,
+                    model=model,
+                    analysis_type=analysis_type,
+                    analysis_method=analysis_method,
+                    scenario=scenario_enum,
+                    custom_timeframes=timeframe_list,
+                    user_intent=user_intent
+                )
             progress.update(task, advance=70, description="📊 分析完成...")
             
         except Exception as e:
@@ -634,14 +649,12 @@ def _test_data_connection():
         
         try:
             fetcher = BinanceFetcher()
-            df = fetcher.get_ohlcv('ETH/USDT', '1h', 5)
+            # 只需验证连通性和最新收盘价，直接取最后一根K线的原始数值，无需构造DataFrame
+            _, _, _, _, close, _ = fetcher.get_latest_ohlcv_row('ETH/USDT', '1h')
             
-            if df is not None and len(df) > 0:
-                progress.update(task, description="✅ 数据连接测试成功")
-                console.print(f"✅ 成功获取 {len(df)} 条测试数据", style="green")
-                console.print(f"💰 最新价格: ${df.iloc[-1]['close']:.2f}", style="yellow")
-            else:
-                console.print("❌ 数据连接测试失败", style="red")
+            progress.update(task, description="✅ 数据连接测试成功")
+            console.print("✅ 成功获取最新K线数据", style="green")
+            console.print(f"💰 最新价格: ${close:.2f}", style="yellow")
                 
         except Exception as e:
             console.print(f"❌ 数据连接错误: {e}", style="red")
@@ -5,6 +5,7 @@
 
 import os
 import logging
+from itertools import islice
 from typing import Dict, List, Any, Callable, Optional
 from pathlib import Path
 import json
@@ -47,6 +48,41 @@ BROOKS_TERM_MAPPING = {
     ]
 }
 
+# 术语表预先转为小写元组：评估时只对全文 lower() 一次，不再逐词 lower()
+_BROOKS_TERMS_LOWER = {
+    category: tuple(term.lower() for term in terms)
+    for category, terms in BROOKS_TERM_MAPPING.items()
+}
+_LEVEL_KEYWORDS = ('support', '支撑', 'resistance', '阻力')
+_RISK_DETAIL_TERMS = ('structural stop', 'measured move', 'magnet')
+_GENERAL_KEYWORDS = ('分析', '建议', '趋势', '支撑', '阻力', '成交量')
+
+# Al Brooks 价格行为分析方法映射（模块常量，get_method_info 不再每次调用都重建）
+_METHOD_MAPPING = {
+    'al-brooks': {
+        'category': 'price_action',
+        'method': 'al_brooks_analysis',
+        'display_name': 'Al Brooks价格行为分析',
+        'requires_metadata': True
+    },
+    'price-action-al-brooks-analysis': {
+        'category': 'price_action',
+        'method': 'al_brooks_analysis',
+        'display_name': 'Al Brooks价格行为分析',
+        'requires_metadata': True
+    }
+}
+
+
+def _count_terms(terms: tuple, text_lower: str, limit: Optional[int] = None) -> int:
+    """
+    统计文本中出现的不同术语个数
+    limit 为该项得分封顶所需的命中数，达到后不再扫描剩余术语
+    """
+    hits = (1 for term in terms if term in text_lower)
+    return sum(islice(hits, limit))
+
+
 class PromptManager:
     """
     提示词管理器 - Al Brooks价格行为分析专用版本
@@ -148,29 +184,14 @@ class PromptManager:
         Returns:
             {'category': 'volume_analysis', 'method': 'vpa_classic', 'display_name': 'VPA经典分析'}
         """
-        # ==== Al Brooks 价格行为分析方法映射 ====
-        method_mapping = {
-            'al-brooks': {
-                'category': 'price_action',
-                'method': 'al_brooks_analysis',
-                'display_name': 'Al Brooks价格行为分析',
-                'requires_metadata': True
-            },
-            'price-action-al-brooks-analysis': {
-                'category': 'price_action',
-                'method': 'al_brooks_analysis',
-                'display_name': 'Al Brooks价格行为分析',
-                'requires_metadata': True
-            }
-        }
-        
-        if full_method not in method_mapping:
-            available_methods = list(method_mapping.keys())
+        method_info = _METHOD_MAPPING.get(full_method)
+        if method_info is None:
+            available_methods = list(_METHOD_MAPPING.keys())
             raise ValueError(f"\n❌ 系统仅支持Al Brooks分析方法。\n" +
                            f"🔍 可用方法: {available_methods}\n" +
                            f"📝 请使用: --method al-brooks 或 --method price-action-al-brooks-analysis")
         
-        return method_mapping[full_method]
+        return dict(method_info)
 
     def get_required_metadata_fields(self) -> List[str]:
         """需要传递到分析器/输出的元数据字段。禁止Unknown/Unspecified。"""
@@ -205,32 +226,25 @@ class PromptManager:
         # 1. 结构分析深度 (30分) - 提高权重
         structure_score = 0
         # Always In状态分析
-        always_in_terms = BROOKS_TERM_MAPPING['always_in_concepts']
-        if any(term.lower() in text_lower for term in always_in_terms):
+        if any(term in text_lower for term in _BROOKS_TERMS_LOWER['always_in_concepts']):
             structure_score += 15
         
         # 结构识别 (swing points, H1/H2等)
-        structure_terms = BROOKS_TERM_MAPPING['structure_analysis']
-        structure_count = sum(1 for term in structure_terms if term.lower() in text_lower)
+        structure_count = _count_terms(_BROOKS_TERMS_LOWER['structure_analysis'], text_lower, limit=5)
         structure_score += min(15, structure_count * 3)
         score += min(30, structure_score)
         
         # 2. 交易计划完整性 (20分) - 提高权重
-        plan_score = 0
-        risk_terms = BROOKS_TERM_MAPPING['risk_management']
-        plan_count = sum(1 for term in risk_terms if term.lower() in text_lower)
+        plan_count = _count_terms(_BROOKS_TERMS_LOWER['risk_management'], text_lower, limit=5)
         plan_score = min(20, plan_count * 4)
         score += plan_score
         
         # 3. Brooks概念应用 (10分) - 概念深度
-        concept_terms = BROOKS_TERM_MAPPING['brooks_concepts']
-        concept_count = sum(1 for term in concept_terms if term.lower() in text_lower)
+        concept_count = _count_terms(_BROOKS_TERMS_LOWER['brooks_concepts'], text_lower, limit=5)
         score += min(10, concept_count * 2)
         
         # 4. Brooks术语准确性 (25分) - 使用映射表
-        term_score = 0
-        bar_patterns = BROOKS_TERM_MAPPING['bar_patterns']
-        pattern_count = sum(1 for pattern in bar_patterns if pattern.lower() in text_lower)
+        pattern_count = _count_terms(_BROOKS_TERMS_LOWER['bar_patterns'], text_lower, limit=9)
         term_score = min(25, pattern_count * 3)
         score += term_score
         
@@ -243,7 +257,7 @@ class PromptManager:
         price_score += price_matches * 5
         
         # 检查关键价位（支撑阻力）的数值引用
-        if any(keyword in text_lower for keyword in ['support', '支撑', 'resistance', '阻力']):
+        if any(keyword in text_lower for keyword in _LEVEL_KEYWORDS):
             price_score += 5
         
         score += min(15, price_score)
@@ -254,7 +268,7 @@ class PromptManager:
             score += 5
             
         # 风险管理细节奖励 (额外5分)
-        if any(term in text_lower for term in ['structural stop', 'measured move', 'magnet']):
+        if any(term in text_lower for term in _RISK_DETAIL_TERMS):
             score += 5
         
         return min(100, score)
@@ -269,8 +283,7 @@ class PromptManager:
         if any(str(round(price, 2)) in analysis_text for price in df['close'].values[-5:]):
             score += 30
         
-        general_keywords = ['分析', '建议', '趋势', '支撑', '阻力', '成交量']
-        keyword_count = sum(1 for kw in general_keywords if kw in analysis_text)
+        keyword_count = _count_terms(_GENERAL_KEYWORDS, analysis_text, limit=5)
         score += min(50, keyword_count * 10)
         
         return min(100, score)
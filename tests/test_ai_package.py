@@ -0,0 +1,36 @@
+"""
+Pytest checks for the lazy ai package exports.
+
+Assumptions:
+- `import ai` must not load optional heavy submodules until a name is accessed.
+- Every name advertised in `ai.__all__` resolves to a real object (no placeholders).
+"""
+
+import os, sys, subprocess
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def test_import_ai_is_lazy():
+    code = (
+        "import sys, ai; "
+        "loaded = [m for m in sys.modules if m.startswith('ai.')]; "
+        "print(','.join(loaded))"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ''
+
+
+def test_all_exports_resolve():
+    import ai
+    for name in ai.__all__:
+        obj = getattr(ai, name)
+        assert getattr(obj, '__name__', None) == name
+    assert sorted(dir(ai)) == sorted(ai.__all__)
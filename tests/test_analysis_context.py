@@ -0,0 +1,123 @@
+"""
+Pytest checks for multi-timeframe context aggregation and history storage.
+
+Assumptions:
+- History is stored in a throwaway sqlite file under pytest's tmp_path.
+- Analysis results mimic RawDataAnalyzer output (success/analysis_text/quality_score).
+"""
+
+import os, sqlite3, subprocess, sys
+from datetime import datetime, timezone
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pytest
+
+from ai import analysis_context
+from ai.analysis_context import AnalysisContext, SignalStrength, _json_dumps
+
+
+RESULTS = {
+    '1h': {'success': True, 'analysis_text': '趋势 支撑 波动', 'quality_score': 72},
+    '4h': {'success': True, 'analysis_text': '突破', 'quality_score': 55},
+    '1d': {'success': False},
+    '15m': {'success': True, 'analysis_text': '阻力 不确定', 'quality_score': 88},
+}
+
+
+def test_context_aggregates(tmp_path):
+    ctx = AnalysisContext(str(tmp_path / 'history.db'))
+    try:
+        context = ctx.create_multi_timeframe_context('ETHUSDT', '1h', RESULTS)
+    finally:
+        ctx.close()
+
+    assert set(context.timeframe_contexts) == {'1h', '4h', '15m'}
+    assert context.overall_signal == SignalStrength.STRONG
+    assert round(context.consistency_score, 4) == 75.2462
+    assert round(context.confidence_level, 4) == 73.7652
+    assert context.timeframe_contexts['1h'].key_insights == ['发现重要支撑位', '趋势方向分析']
+    assert context.timeframe_contexts['15m'].risk_factors == ['市场不确定性风险']
+
+
+def test_history_roundtrip(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    ctx = AnalysisContext(db_path)
+    context = ctx.create_multi_timeframe_context('ETHUSDT', '1h', RESULTS)
+    for i in range(3):
+        ctx.add_context_event('ETHUSDT', 'test', f'event {i}')
+    ctx.close()
+
+    ctx = AnalysisContext(db_path)
+    try:
+        full = ctx.get_analysis_history('ETHUSDT')
+        summary = ctx.get_analysis_history('ETHUSDT', include_data=False)
+        events = ctx.history_manager._conn.execute('SELECT COUNT(*) FROM context_events').fetchone()[0]
+    finally:
+        ctx.close()
+
+    assert len(full) == 1 and 'analysis_data' in full[0]
+    assert full[0]['timestamp'] == context.analysis_timestamp.isoformat()
+    assert set(summary[0]) == {'timestamp', 'overall_signal', 'consistency_score', 'confidence_level'}
+    assert events == 3
+
+
+def test_recent_queries_release_read_connections(tmp_path):
+    ctx = AnalysisContext(str(tmp_path / 'history.db'))
+    try:
+        ctx.create_multi_timeframe_context('ETHUSDT', '1h', RESULTS)
+        manager = ctx.history_manager
+        # 结果全部保留（超过只读连接池大小）也不能占住连接
+        held = [manager.get_recent_analysis('ETHUSDT') for _ in range(10)]
+        held += [manager.get_recent_full('ETHUSDT') for _ in range(10)]
+    finally:
+        ctx.close()
+
+    assert all(len(rows) == 1 for rows in held)
+    assert 'analysis_data' in held[-1][0] and 'analysis_data' not in held[0][0]
+
+
+def test_buffered_events_written_at_exit_without_close(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from ai.analysis_context import AnalysisContext\n"
+        "ctx = AnalysisContext(sys.argv[2])\n"
+        "for i in range(3):\n"
+        "    ctx.add_context_event('ETHUSDT', 'test', f'event {i}')\n"
+    )
+    # 进程直接退出：既未 close() 也未等到 flush 定时器
+    subprocess.run([sys.executable, '-c', script, REPO_ROOT, db_path], check=True, timeout=60)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM context_events').fetchone()[0] == 3
+    finally:
+        conn.close()
+
+
+def test_close_is_idempotent(tmp_path):
+    ctx = AnalysisContext(str(tmp_path / 'history.db'))
+    ctx.add_context_event('ETHUSDT', 'test', 'event')
+    ctx.close()
+    ctx.close()
+    ctx.history_manager.flush()  # 定时器已取消，缓冲为空时不再访问已关闭的连接
+
+
+def test_json_dumps_stdlib_fallback_matches_orjson(monkeypatch):
+    pytest.importorskip('orjson')
+    payload = {
+        '1h': {'quality': np.float64(72.5), 'bars': np.int64(120), 'levels': np.array([4300.5, 4420.0])},
+        1: [True, None, '支撑'],
+        2.5: {'at': datetime(2025, 1, 1, 8, 30, tzinfo=timezone.utc), 'signal': SignalStrength.STRONG},
+    }
+    fast = _json_dumps(payload)
+    monkeypatch.setattr(analysis_context, 'orjson', None)
+    assert _json_dumps(payload) == fast
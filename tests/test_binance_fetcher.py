@@ -0,0 +1,89 @@
+"""
+Pytest checks for BinanceFetcher.get_ohlcv_incremental disk caching.
+
+Assumptions:
+- The ccxt exchange is replaced by an in-memory fake; no network access.
+- The OHLCV cache directory is redirected to pytest's tmp_path.
+"""
+
+import os, sys
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+from data import binance_fetcher
+from data.binance_fetcher import BinanceFetcher
+
+HOUR_MS = 3600 * 1000
+START_MS = 1735689600000  # 2025-01-01 00:00 UTC
+
+
+class _FakeExchange:
+    """按小时生成K线的交易所替身：close 为 100 + 序号 + revision"""
+
+    markets = {'ETH/USDT': {}}
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.revision = 0.0
+        self.calls = []
+
+    def fetch_ohlcv(self, symbol, timeframe, limit, since=None):
+        self.calls.append(since)
+        rows = [
+            [START_MS + i * HOUR_MS, 100.0 + i, 101.0 + i + self.revision, 99.0 + i,
+             100.0 + i + self.revision, 10.0 + i]
+            for i in range(self.bars)
+        ]
+        if since is None:
+            return rows[-limit:]
+        return [row for row in rows if row[0] >= since][:limit]
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(binance_fetcher, 'OHLCV_CACHE_DIR', tmp_path)
+    fetcher = BinanceFetcher.__new__(BinanceFetcher)  # 跳过 __init__ 中的联网 load_markets
+    fetcher.exchange = _FakeExchange(bars=10)
+    return fetcher
+
+
+def test_incremental_splices_short_gap(fetcher):
+    first = fetcher.get_ohlcv_incremental('ETH/USDT', '1h', limit=5)
+    assert first['close'].tolist() == [105.0, 106.0, 107.0, 108.0, 109.0]
+
+    # 新增3根K线，缓存中最后一根（当时未收盘）的收盘价也被修正
+    fetcher.exchange.bars = 13
+    fetcher.exchange.revision = 0.5
+    df = fetcher.get_ohlcv_incremental('ETH/USDT', '1h', limit=5)
+
+    assert fetcher.exchange.calls == [None, START_MS + 9 * HOUR_MS]
+    assert df['close'].tolist() == [108.0, 109.5, 110.5, 111.5, 112.5]
+    assert df['datetime'].iat[-1] == '2025-01-01 12:00:00 UTC'
+    assert fetcher.validate_ohlcv(df) == []
+
+
+def test_incremental_falls_back_to_full_fetch_on_long_gap(fetcher):
+    fetcher.get_ohlcv_incremental('ETH/USDT', '1h', limit=5)
+    fetcher.exchange.bars = 30
+    df = fetcher.get_ohlcv_incremental('ETH/USDT', '1h', limit=5)
+
+    assert fetcher.exchange.calls == [None, START_MS + 9 * HOUR_MS, None]
+    assert df['close'].tolist() == [125.0, 126.0, 127.0, 128.0, 129.0]
+
+
+def test_incremental_ignores_corrupt_cache(fetcher, tmp_path):
+    (tmp_path / 'ETHUSDT_1h.csv').write_bytes(b'\x80\x04garbage,not,a,csv\n1,2\n')
+    df = fetcher.get_ohlcv_incremental('ETH/USDT', '1h', limit=5)
+
+    assert fetcher.exchange.calls == [None]
+    assert len(df) == 5
+    # 损坏的缓存被新数据覆盖，下次可增量获取
+    assert len(BinanceFetcher._read_ohlcv_cache(tmp_path / 'ETHUSDT_1h.csv')) == 5
@@ -0,0 +1,48 @@
+"""
+Pytest checks for utils.slotted (dataclass __slots__ on Python 3.8).
+
+Assumptions:
+- Pure-Python dataclasses; no external services.
+"""
+
+import os, sys
+from dataclasses import dataclass, field
+from typing import List
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+from utils import slotted
+
+
+@slotted
+@dataclass
+class _Bar:
+    close: float
+    volume: float = 0.0
+    tags: List[str] = field(default_factory=list)
+
+
+def test_slotted_instances_have_no_dict():
+    bar = _Bar(1.0)
+    assert _Bar.__slots__ == ('close', 'volume', 'tags')
+    assert not hasattr(bar, '__dict__')
+    with pytest.raises(AttributeError):
+        bar.extra = 1
+
+
+def test_slotted_keeps_defaults_and_dataclass_behaviour():
+    a, b = _Bar(1.0), _Bar(2.0, volume=5.0)
+    a.tags.append('x')
+
+    assert (a.volume, b.volume) == (0.0, 5.0)
+    assert b.tags == []  # default_factory 每个实例独立
+    assert _Bar(1.0, tags=['x']) == a
+    assert repr(b) == "_Bar(close=2.0, volume=5.0, tags=[])"
@@ -0,0 +1,59 @@
+"""
+Pytest checks for DataFormatter.format_cached keying.
+
+Assumptions:
+- Small synthetic OHLCV frames; the cache key is a content hash of the whole window.
+"""
+
+import os, sys
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+
+from formatters import DataFormatter
+
+
+def _bars(n=5):
+    return pd.DataFrame({
+        'datetime': [f'2025-01-01 {h:02d}:00:00 UTC' for h in range(n)],
+        'open': [100.0 + i for i in range(n)],
+        'high': [101.0 + i for i in range(n)],
+        'low': [99.0 + i for i in range(n)],
+        'close': [100.5 + i for i in range(n)],
+        'volume': [10.0 + i for i in range(n)],
+    })
+
+
+def test_format_cached_sees_mid_window_correction():
+    formatter = DataFormatter()
+    df = _bars()
+    first = formatter.format_cached(df, 'csv')
+    assert formatter.format_cached(_bars(), 'csv') is first
+
+    corrected = _bars()
+    corrected.loc[2, 'volume'] = 999.0  # 首尾K线与收盘价不变，仅中间K线被修正
+    assert '999' in formatter.format_cached(corrected, 'csv')
+
+
+def test_format_cached_sees_row_reordering():
+    formatter = DataFormatter()
+    df = _bars()
+    original = formatter.format_cached(df, 'csv')
+
+    swapped = df.iloc[[0, 2, 1, 3, 4]]
+    assert formatter.format_cached(swapped, 'csv') == DataFormatter.to_csv_format(swapped)
+    assert formatter.format_cached(swapped, 'csv') != original
+
+
+def test_format_cached_key_without_datetime_column():
+    formatter = DataFormatter()
+    formatter.FORMAT_METHODS = dict(DataFormatter.FORMAT_METHODS, csv='_market_close')
+    formatter._market_close = lambda df: str(df['close'].iat[-1])
+    assert formatter.format_cached(_bars().drop(columns='datetime'), 'csv') == '104.5'
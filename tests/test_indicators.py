@@ -0,0 +1,56 @@
+"""
+Pytest checks for the EMA helpers in ai.indicators.
+
+Assumptions:
+- pandas ewm(span=period, adjust=False) is the reference implementation.
+"""
+
+import os, sys
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai.indicators import StreamingEMA, ema
+
+
+def test_ema_matches_pandas_ewm():
+    closes = pd.Series(4300 + np.cumsum(np.random.default_rng(7).normal(0, 8, 200)))
+    expected = closes.ewm(span=20, adjust=False).mean()
+
+    assert ema(closes, period=20) == pytest.approx(expected.iloc[-1], rel=1e-12)
+    assert ema(closes.to_numpy(), period=20) == ema(closes.tolist(), period=20) == ema(closes, period=20)
+
+    stream = StreamingEMA(period=20)
+    values = [stream.update(x) for x in closes]
+    assert values == pytest.approx(expected.tolist(), rel=1e-12)
+
+
+def test_ema_requires_data():
+    with pytest.raises(ValueError):
+        ema([], period=20)
+
+
+def test_ema_skips_nan_like_pandas():
+    closes = pd.Series(4300 + np.cumsum(np.random.default_rng(11).normal(0, 8, 120)))
+    closes.iloc[[0, 1, 30, 55, 56, 57, 119]] = np.nan
+    expected = closes.ewm(span=20, adjust=False).mean()
+
+    assert ema(closes, period=20) == pytest.approx(expected.iloc[-1], rel=1e-12)
+    assert ema(closes.tolist(), period=20) == pytest.approx(expected.iloc[-1], rel=1e-12)
+
+    stream = StreamingEMA(period=20)
+    values = [stream.update(x) for x in closes]
+    assert values[2:] == pytest.approx(expected.tolist()[2:], rel=1e-12)
+    assert values[:2] == [None, None]
+
+    with pytest.raises(ValueError):
+        ema([np.nan, np.inf], period=20)
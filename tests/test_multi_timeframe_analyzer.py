@@ -0,0 +1,52 @@
+"""
+Pytest checks for MultiTimeframeAnalyzer helpers that need no network access.
+
+Assumptions:
+- Only static helpers are exercised; no analyzer (and no API client) is constructed.
+"""
+
+import os, sys
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+from ai.multi_timeframe_analyzer import MultiTimeframeAnalyzer
+
+
+def _texts(*texts):
+    return [{'analysis_text': text} for text in texts]
+
+
+def test_text_consistency_compares_direction_not_numbers():
+    score = MultiTimeframeAnalyzer._calculate_text_consistency
+
+    # 价位、日期各不相同但方向一致：高一致性
+    agree = _texts('1h 看多，支撑 4300.5，目标 4420', '4h 多头结构，2025-01-03 突破后买入，支撑 4250')
+    assert score(agree) == 100.0
+
+    assert score(_texts('看多，买入', '看空，卖出')) == 0.0
+    assert score(_texts('看多', '看空', '看多')) == pytest.approx(100 / 3)
+    assert score(_texts('看多', '上涨与下跌力量均衡')) == 50.0
+
+
+def test_text_consistency_ignores_negated_and_conditional_direction():
+    score = MultiTimeframeAnalyzer._calculate_text_consistency
+
+    # 否定的看多词不算看多：两者都偏空
+    assert score(_texts('趋势向下，不建议做多，不宜买入', '看空，卖出')) == 100.0
+    # 条件分句中的看空只是假设情形：两者都偏多
+    assert score(_texts('若跌破4300则转为看空；目前看多', '看多')) == 100.0
+    assert score(_texts('如果跌破4300，则转为看空。目前看多', '看多')) == 100.0
+
+
+def test_text_consistency_defaults_without_direction_words():
+    score = MultiTimeframeAnalyzer._calculate_text_consistency
+    assert score(_texts('价格 4300，成交量 1200', '价格 4310')) == 70.0
+    assert score(_texts('看多', '')) == 70.0
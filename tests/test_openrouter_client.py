@@ -0,0 +1,293 @@
+"""
+Pytest checks for OpenRouterClient response caching and the async request path.
+
+Assumptions:
+- The OpenAI SDK clients (sync and async) are replaced by stubs; no network access.
+- The disk cache layer is redirected to pytest's tmp_path.
+"""
+
+import asyncio, os, sys, time
+from types import SimpleNamespace
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+from ai import openrouter_client
+from ai.openrouter_client import OpenRouterClient, RateLimiter
+
+
+def _stub_client(replies):
+    """chat.completions.create 依次返回 replies 中的文本；元素为异常时抛出"""
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs['model'])
+        reply = replies[min(len(calls), len(replies)) - 1]
+        if isinstance(reply, Exception):
+            raise reply
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), calls
+
+
+class _AsyncStub:
+    """AsyncOpenAI 替身：包装 _stub_client 的 create，并可作为 async with 使用"""
+
+    def __init__(self, replies):
+        sync_client, self.calls = _stub_client(replies)
+        sync_create = sync_client.chat.completions.create
+
+        async def create(**kwargs):
+            return sync_create(**kwargs)
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(openrouter_client, 'RESPONSE_CACHE_DIR', tmp_path / 'llm')
+    return OpenRouterClient(api_key='test', enable_cache=True, cache_size=2)
+
+
+def test_cache_hit_returns_copy(client):
+    client.client, calls = _stub_client(['first', 'second'])
+
+    fresh = client.generate_response('prompt', 'grok4')
+    fresh['analysis'] = 'mutated by caller'
+    hit = client.generate_response('prompt', 'grok4')
+    hit['extra'] = True
+
+    assert calls == ['x-ai/grok-4']
+    assert hit['analysis'] == 'first' and hit['cached'] is True
+    assert 'extra' not in client.generate_response('prompt', 'grok4')
+
+
+def test_cache_ttl_expiry_and_disk_layer(client):
+    client.client, calls = _stub_client(['first', 'second'])
+    client.generate_response('prompt', 'grok4')
+
+    client._memory_cache.clear()
+    assert client.generate_response('prompt', 'grok4')['analysis'] == 'first'  # disk layer
+    assert len(calls) == 1
+
+    client.cache_ttl = 0
+    assert client.generate_response('prompt', 'grok4')['analysis'] == 'second'
+    assert len(calls) == 2
+
+
+def test_failures_not_cached_and_memory_bounded(client):
+    client.client, calls = _stub_client([RuntimeError('boom'), 'ok'])
+
+    assert 'error' in client.generate_response('prompt', 'grok4')
+    assert client.generate_response('prompt', 'grok4')['analysis'] == 'ok'
+    assert len(calls) == 2
+
+    for prompt in ('a', 'b', 'c'):
+        client.generate_response(prompt, 'grok4')
+    assert len(client._memory_cache) == 2
+
+
+def test_async_result_shape_matches_sync(client):
+    client.client, _ = _stub_client([RuntimeError('boom')])
+    sync_result = client.generate_response('prompt', 'grok4')
+    async_result = asyncio.run(client.agenerate_response('prompt', 'grok4', client=_AsyncStub([RuntimeError('boom')])))
+
+    assert async_result == sync_result
+    assert async_result['success'] is False and async_result['retryable'] is False
+
+
+def test_async_timeout_reroutes_like_sync(client):
+    client.client, sync_calls = _stub_client([TimeoutError('slow'), 'ok'])
+    stub = _AsyncStub([TimeoutError('slow'), 'ok'])
+
+    sync_result = client.generate_response('prompt', 'gpt5-chat')
+    client.cache_enabled = False  # 两条路径都须真正发起请求
+    async_result = asyncio.run(client.agenerate_response('prompt', 'gpt5-chat', client=stub))
+
+    assert stub.calls == sync_calls == ['openai/gpt-5-chat', 'x-ai/grok-4']
+    for result in (sync_result, async_result):
+        assert result['success'] is True and result['model'] == 'grok4'
+        assert result['original_model'] == 'gpt5-chat'
+        assert [event['model'] for event in result['reroute_events']] == ['gpt5-chat']
+
+
+def test_batch_wrapper_runs_inside_event_loop(client):
+    client._new_async_client = lambda: _AsyncStub(['a', 'b'])
+
+    async def caller():
+        return client.generate_responses_batch([('p1', 'grok4'), ('p2', 'grok4')])
+
+    results = asyncio.run(caller())
+    assert [r['analysis'] for r in results] == ['a', 'b']
+
+
+def _stub_generate(batch_reply):
+    """替换 generate_response：打包请求返回 batch_reply，单行请求回显提示文本"""
+    calls = []
+
+    def generate_response(prompt, model_name):
+        calls.append(prompt)
+        if '### ROW' in prompt:
+            return {'success': True, 'model': model_name, 'analysis': batch_reply}
+        return {'success': True, 'model': model_name, 'analysis': f'single:{prompt}'}
+
+    return generate_response, calls
+
+
+def test_marshaled_rows_split_and_order(client):
+    client.generate_response, calls = _stub_generate(
+        '结果如下：[{"row": 2, "analysis": "B"}, {"row": 1, "analysis": "A"}, {"row": 3, "analysis": "C"}]'
+    )
+    results = client.generate_responses_marshaled(['a', 'b', 'c', 'd'], 'grok4', batch_size=3)
+
+    assert [r['analysis'] for r in results] == ['A', 'B', 'C', 'single:d']
+    assert results[0]['batch_size'] == 3
+    assert len(calls) == 2
+
+
+def test_marshaled_partial_rows_backfilled(client):
+    client.generate_response, calls = _stub_generate(
+        '[{"row": 1, "analysis": "A"}, {"row": 2, "analysis": 42}, {"row": 9, "analysis": "X"}]'
+    )
+    results = client.generate_responses_marshaled(['a', 'b', 'c'], 'grok4', batch_size=3)
+
+    assert [r['analysis'] for r in results] == ['A', 'single:b', 'single:c']
+    assert calls[1:] == ['b', 'c']
+
+
+@pytest.mark.parametrize('reply', ['抱歉，无法按JSON输出', '[{"row": 1, "analysis": "A"', '{"row": 1}'])
+def test_marshaled_non_json_falls_back_per_row(client, reply):
+    client.generate_response, calls = _stub_generate(reply)
+    results = client.generate_responses_marshaled(['a', 'b'], 'grok4', batch_size=2)
+
+    assert [r['analysis'] for r in results] == ['single:a', 'single:b']
+    assert len(calls) == 3
+
+
+def test_marshaled_failed_batch_falls_back_per_row(client):
+    def generate_response(prompt, model_name):
+        if '### ROW' in prompt:
+            return {'success': False, 'model': model_name, 'error': 'boom', 'analysis': '[{"row": 1, "analysis": "A"}]'}
+        return {'success': True, 'model': model_name, 'analysis': prompt}
+
+    client.generate_response = generate_response
+    results = client.generate_responses_marshaled(['a', 'b'], 'grok4', batch_size=2)
+    assert [r['analysis'] for r in results] == ['a', 'b']
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def test_rate_limiter_waits_for_refill(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(openrouter_client.asyncio, 'sleep', clock.sleep)
+    limiter = RateLimiter({'grok4': {'rpm': 2, 'tpm': 1000}}, clock=clock)
+
+    async def acquire_all():
+        for tokens in (100, 100, 100):
+            await limiter.acquire('grok4', tokens)
+
+    asyncio.run(acquire_all())
+    # 两次请求用完 rpm 桶，第三次等 30 秒回填一个请求额度
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+    clock.now += 60
+    assert limiter._try_take('grok4', 2, 1000, 5000) == 0.0  # 超过整桶的请求在满桶时放行
+    assert limiter._try_take('grok4', 2, 1000, 10) == pytest.approx(0.6)
+    asyncio.run(limiter.acquire('unknown-model', 10 ** 9))  # 未配置的模型不限流
+
+
+class _DelayedAsyncStub(_AsyncStub):
+    """按模型设定响应延迟的 AsyncOpenAI 替身，记录被取消的请求"""
+
+    def __init__(self, delays):
+        super().__init__(['ok'])
+        self.cancelled = []
+
+        async def create(**kwargs):
+            self.calls.append(kwargs['model'])
+            try:
+                await asyncio.sleep(delays[kwargs['model']])
+            except asyncio.CancelledError:
+                self.cancelled.append(kwargs['model'])
+                raise
+            message = SimpleNamespace(content=kwargs['model'])
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+def test_batch_stop_when_cancels_pending_and_keeps_order(client, tmp_path):
+    client.cache_enabled = False
+    stub = _DelayedAsyncStub({'x-ai/grok-4': 0.01, 'openai/gpt-5-chat': 0.02, 'anthropic/claude-opus-4.1': 5})
+    client._new_async_client = lambda: stub
+    requests = [('p', 'claude-opus-41'), ('p', 'grok4'), ('p', 'gpt5-chat')]
+    checkpoint = tmp_path / 'batch.jsonl'
+
+    def two_done(results):
+        return sum(r is not None for r in results) >= 2
+
+    results = client.generate_responses_batch(requests, output_jsonl=str(checkpoint), stop_when=two_done)
+
+    assert [r['model'] for r in results] == ['claude-opus-41', 'grok4', 'gpt5-chat']
+    assert results[0]['cancelled'] is True and results[0]['success'] is False
+    assert [r['analysis'] for r in results[1:]] == ['x-ai/grok-4', 'openai/gpt-5-chat']
+    assert stub.cancelled == ['anthropic/claude-opus-4.1']
+    # 检查点只记录成功的请求，取消结果不落盘
+    assert len(checkpoint.read_text(encoding='utf-8').splitlines()) == 2
+
+    # 重跑时从检查点恢复，已满足条件则不再发起请求
+    stub.calls.clear()
+    rerun = client.generate_responses_batch(requests, output_jsonl=str(checkpoint), stop_when=two_done)
+    assert stub.calls == []
+    assert [r['analysis'] for r in rerun] == [None, 'x-ai/grok-4', 'openai/gpt-5-chat']
+    assert rerun[0]['cancelled'] is True
+
+
+def test_async_timeout_per_request_triggers_reroute(client):
+    client.cache_enabled = False
+    stub = _DelayedAsyncStub({'openai/gpt-5-chat': 5, 'x-ai/grok-4': 0.01})
+
+    start = time.monotonic()
+    result = asyncio.run(client.agenerate_response('p', 'gpt5-chat', client=stub, timeout=0.05))
+    assert time.monotonic() - start < 1
+    assert result['success'] is True and result['model'] == 'grok4'
+    assert '超时' in result['reroute_events'][0]['error']
+    assert stub.cancelled == ['openai/gpt-5-chat']
+
+
+def test_batch_hung_model_does_not_stall(client):
+    client.cache_enabled = False
+    stub = _DelayedAsyncStub({'x-ai/grok-4': 5, 'openai/gpt-5-chat': 0.01})
+    client._new_async_client = lambda: stub
+
+    start = time.monotonic()
+    results = client.generate_responses_batch([('p', 'grok4'), ('p', 'gpt5-chat')], timeout=0.05)
+    assert time.monotonic() - start < 1
+    # grok4 无降级链：末端重试一次后仍超时，以可重试错误返回
+    assert results[0]['success'] is False and results[0]['retryable'] is True
+    assert results[1]['analysis'] == 'openai/gpt-5-chat'
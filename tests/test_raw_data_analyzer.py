@@ -0,0 +1,89 @@
+"""
+Pytest checks for RawDataAnalyzer request scheduling (hedging, shutdown, error path).
+
+Assumptions:
+- `_request_analysis` is replaced by a fake with fixed latencies; no network access.
+- Hedging settings are patched per test and restored by monkeypatch.
+"""
+
+import os, sys, time
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+
+from ai.raw_data_analyzer import RawDataAnalyzer
+from config import Settings
+
+
+def _closed_bars(n=60):
+    closes = [4300.0 + i for i in range(n)]
+    df = pd.DataFrame({
+        'timestamp': pd.date_range("2025-01-01", periods=n, freq="h", tz="UTC"),
+        'open': [c - 0.5 for c in closes],
+        'high': [c + 1.0 for c in closes],
+        'low': [c - 1.0 for c in closes],
+        'close': closes,
+        'volume': [100.0 + i for i in range(n)],
+    })
+    df['datetime'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+    return df
+
+
+def _slow_primary_request(prompt, formatted_data, model, analysis_method, api_analysis_type):
+    time.sleep(1.0 if model == 'gpt5-chat' else 0.05)
+    return {'success': True, 'model': model, 'analysis': model}
+
+
+def test_hedge_not_starved_by_busy_primaries(monkeypatch):
+    monkeypatch.setitem(Settings.VALIDATION_CONFIG, 'enable_hedged_requests', True)
+    monkeypatch.setitem(Settings.VALIDATION_CONFIG, 'hedge_delay_ms', 100)
+
+    analyzer = RawDataAnalyzer(api_key='test')
+    analyzer._request_analysis = _slow_primary_request
+    try:
+        # 4个并行周期的主请求占满主线程池
+        primaries = [
+            analyzer._executor.submit(_slow_primary_request, 'p', 'd', 'gpt5-chat', None, 'raw_vpa')
+            for _ in range(4)
+        ]
+        start = time.monotonic()
+        result = analyzer._collect_analysis(primaries[0], 'p', 'd', 'gpt5-chat', 'complete', None, 'raw_vpa')
+        elapsed = time.monotonic() - start
+    finally:
+        analyzer.close()
+
+    assert result['hedge_won'] is True
+    assert result['model'] == Settings.ANALYSIS_MODES['complete']['fallback_model']
+    assert elapsed < 0.6
+
+
+
+def test_close_shuts_down_executors():
+    with RawDataAnalyzer(api_key='test') as analyzer:
+        future = analyzer._executor.submit(time.sleep, 0)
+    assert future.done()
+    assert analyzer._executor._shutdown and analyzer._hedge_executor._shutdown
+
+
+def test_error_after_submit_does_not_orphan_request(monkeypatch):
+    finished = []
+
+    def request(*args):
+        time.sleep(0.2)
+        finished.append(True)
+        return {'success': True, 'analysis': ''}
+
+    with RawDataAnalyzer(api_key='test') as analyzer:
+        analyzer._request_analysis = request
+        # AI请求发出后，交易方案计算阶段出错
+        monkeypatch.setattr('ai.raw_data_analyzer.rr_with_costs', lambda *a, **k: 1 / 0)
+        result = analyzer.analyze_raw_ohlcv(_closed_bars(), model='grok4', tick_size=0.01)
+        assert result['success'] is False
+        assert finished == [True]
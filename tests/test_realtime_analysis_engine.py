@@ -0,0 +1,46 @@
+"""
+Pytest checks for RealtimeAnalysisEngine shutdown.
+
+Assumptions:
+- The engine is built without __init__ (no Binance or WebSocket connection);
+  its components are stubs that record close() calls.
+"""
+
+import asyncio, os, queue, sys
+
+# Repository root
+CURRENT_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+pytest.importorskip('websockets')
+
+from ai.realtime_analysis_engine import RealtimeAnalysisEngine
+
+
+class _Closable:
+    def __init__(self, closed, name):
+        self._closed, self._name = closed, name
+
+    def close(self):
+        self._closed.append(self._name)
+
+
+def test_stop_releases_analyzer_pools_and_history_db():
+    closed = []
+    engine = RealtimeAnalysisEngine.__new__(RealtimeAnalysisEngine)
+    engine.is_running = True
+    engine.ws_client = None
+    engine.analysis_queue = queue.Queue()
+    engine.multi_analyzer = _Closable(closed, 'multi_analyzer')
+    engine.analysis_context = _Closable(closed, 'analysis_context')
+
+    asyncio.run(engine.stop())
+
+    assert closed == ['multi_analyzer', 'analysis_context']
+    assert engine.is_running is False
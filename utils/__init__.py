@@ -0,0 +1,3 @@
+from .compat import slotted
+
+__all__ = ['slotted']
@@ -0,0 +1,21 @@
+"""
+Python 3.8 兼容工具
+"""
+
+from dataclasses import fields
+
+
+def slotted(cls):
+    """
+    以字段名为 __slots__ 重建 dataclass（等价于 3.10+ 的 dataclass(slots=True)）
+    
+    用法：@slotted 置于 @dataclass 之上。带默认值的字段无法手写 __slots__（会与类属性冲突），
+    默认值与 default_factory 已由生成的 __init__ 持有，重建后的类不再保留这些类属性
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {
+        key: value for key, value in cls.__dict__.items()
+        if key not in names and key not in ('__dict__', '__weakref__')
+    }
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)